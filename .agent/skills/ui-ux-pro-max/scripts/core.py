@@ -99,11 +99,11 @@ class BM25:
     def __init__(self, k1=1.5, b=0.75):
         self.k1 = k1
         self.b = b
-        self.corpus = []
         self.doc_lengths = []
         self.avgdl = 0
         self.idf = {}
         self.doc_freqs = defaultdict(int)
+        self.postings = {}
         self.N = 0
 
     def tokenize(self, text):
@@ -112,69 +112,79 @@ class BM25:
         return [w for w in text.split() if len(w) > 2]
 
     def fit(self, documents):
-        """Build BM25 index from documents"""
-        self.corpus = [self.tokenize(doc) for doc in documents]
-        self.N = len(self.corpus)
+        """Build BM25 index from documents: term -> [(doc index, term weight)]"""
+        corpus = [self.tokenize(doc) for doc in documents]
+        self.N = len(corpus)
         if self.N == 0:
             return
-        self.doc_lengths = [len(doc) for doc in self.corpus]
+        self.doc_lengths = [len(doc) for doc in corpus]
         self.avgdl = sum(self.doc_lengths) / self.N
 
-        for doc in self.corpus:
-            seen = set()
+        term_freqs = []
+        for doc in corpus:
+            freqs = defaultdict(int)
             for word in doc:
-                if word not in seen:
-                    self.doc_freqs[word] += 1
-                    seen.add(word)
+                freqs[word] += 1
+            term_freqs.append(freqs)
+            for word in freqs:
+                self.doc_freqs[word] += 1
 
         for word, freq in self.doc_freqs.items():
             self.idf[word] = log((self.N - freq + 0.5) / (freq + 0.5) + 1)
 
+        # Each posting carries its document's full contribution for the term,
+        # so scoring a query is one addition per (query term, matching doc)
+        postings = defaultdict(list)
+        for idx, freqs in enumerate(term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[idx] / self.avgdl)
+            for word, tf in freqs.items():
+                postings[word].append((idx, self.idf[word] * (tf * (self.k1 + 1)) / (tf + norm)))
+        self.postings = dict(postings)
+
     def score(self, query):
         """Score all documents against query"""
-        query_tokens = self.tokenize(query)
-        scores = []
-
-        for idx, doc in enumerate(self.corpus):
-            score = 0
-            doc_len = self.doc_lengths[idx]
-            term_freqs = defaultdict(int)
-            for word in doc:
-                term_freqs[word] += 1
+        scores = [0] * self.N
+        for token in self.tokenize(query):
+            for idx, weight in self.postings.get(token, ()):
+                scores[idx] += weight
+        return sorted(enumerate(scores), key=lambda x: x[1], reverse=True)
 
-            for token in query_tokens:
-                if token in self.idf:
-                    tf = term_freqs[token]
-                    idf = self.idf[token]
-                    numerator = tf * (self.k1 + 1)
-                    denominator = tf + self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
-                    score += idf * numerator / denominator
 
-            scores.append((idx, score))
-
-        return sorted(scores, key=lambda x: x[1], reverse=True)
+# ============ SEARCH FUNCTIONS ============
+_index_cache = {}  # (path, search cols) -> (mtime_ns, size, rows, BM25)
 
 
-# ============ SEARCH FUNCTIONS ============
 def _load_csv(filepath):
     """Load CSV and return list of dicts"""
     with open(filepath, 'r', encoding='utf-8') as f:
         return list(csv.DictReader(f))
 
 
-def _search_csv(filepath, search_cols, output_cols, query, max_results):
-    """Core search function using BM25"""
-    if not filepath.exists():
-        return []
+def _load_index(filepath, search_cols):
+    """CSV rows and their BM25 index, built once per process and rebuilt when the file changes"""
+    key = (str(filepath), tuple(search_cols))
+    st = filepath.stat()
+    cached = _index_cache.get(key)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2], cached[3]
 
     data = _load_csv(filepath)
 
     # Build documents from search columns
     documents = [" ".join(str(row.get(col, "")) for col in search_cols) for row in data]
-
-    # BM25 search
     bm25 = BM25()
     bm25.fit(documents)
+
+    _index_cache[key] = (st.st_mtime_ns, st.st_size, data, bm25)
+    return data, bm25
+
+
+def _search_csv(filepath, search_cols, output_cols, query, max_results):
+    """Core search function using BM25"""
+    if not filepath.exists():
+        return []
+
+    data, bm25 = _load_index(filepath, search_cols)
     ranked = bm25.score(query)
 
     # Get top results with score > 0
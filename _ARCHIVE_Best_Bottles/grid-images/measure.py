@@ -7,9 +7,16 @@ Usage:
   python measure.py reference/cylinder/          # Measure all images in a family dir
   python measure.py reference/cylinder/image.png  # Measure a single image
   python measure.py reference/                    # Measure all families
+  python measure.py reference/ --workers 4        # Measure 4 images at a time (default: 1 per core)
+
+Measurements are numpy array operations over the decoded image (no per-pixel
+Python loops), so measuring a 2400x2400 reference costs little more than
+decoding it.
 """
 
-import sys, os, json, glob
+import sys, os, json, glob, argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from PIL import Image
 
 try:
@@ -29,34 +36,75 @@ def extract_psd_preview(psd_path, output_path):
     return composite.size
 
 
+def foreground_mask(rgba, background):
+    """True where a pixel is bottle, not background (rgba: H x W x 4 uint8 array)."""
+    if background == "white":
+        r, g, b = rgba[..., 0], rgba[..., 1], rgba[..., 2]
+        is_bg = ((r > 240) & (g > 240) & (b > 240)) | (rgba[..., 3] < 20)
+    else:
+        is_bg = rgba[..., 3] < 20
+    return ~is_bg
+
+
+def detect_background(rgba):
+    """'transparent' if the four corners are mostly see-through, else 'white'."""
+    corners = rgba[[0, 0, -1, -1], [0, -1, 0, -1], 3]
+    return "transparent" if corners.sum() / 4 < 50 else "white"
+
+
+def bounds(mask):
+    """(top, bottom, left, right) of the True pixels, inclusive; (h, 0, w, 0) if there are none."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        h, w = mask.shape
+        return h, 0, w, 0
+    return int(rows[0]), int(rows[-1]), int(cols[0]), int(cols[-1])
+
+
+def width_at(mask, y, left, right):
+    """Width of the bottle on row y, between columns left and right (inclusive)."""
+    cols = np.flatnonzero(mask[y, left:right + 1])
+    return int(cols[-1] - cols[0]) if len(cols) > 1 else 0
+
+
+def width_profile(mask, heights, left, right):
+    """{label: width} for each (label, row) in heights."""
+    return {label: width_at(mask, y, left, right) for label, y in heights}
+
+
+def brightness_jump(column, window=5, limit=None):
+    """
+    (index, magnitude) of the largest change in mean brightness between the
+    `window` pixels before and from each index of a 1-D brightness profile,
+    for indexes window..limit; (None, 0) if there are none. Window sums come
+    from one cumulative sum, so the scan is O(n) whatever the window.
+    """
+    n = len(column)
+    stop = min(n - window, n if limit is None else limit)
+    if stop <= window:
+        return None, 0
+    sums = np.concatenate(([0], np.cumsum(column, dtype=np.int64)))
+    idx = np.arange(window, stop)
+    # column holds R+G+B, so |Δ sum| / (3 * window) is the jump in mean brightness
+    delta = np.abs((sums[idx + window] - sums[idx]) - (sums[idx] - sums[idx - window]))
+    best = int(np.argmax(delta))
+    if delta[best] == 0:
+        return None, 0
+    return window + best, float(delta[best] / (3 * window))
+
+
 def measure_bottle(image_path, background="auto"):
-    img = Image.open(image_path).convert("RGBA")
-    w, h = img.size
-    pixels = img.load()
+    img = Image.open(image_path)
+    rgba = np.asarray(img if img.mode == "RGBA" else img.convert("RGBA"))
+    h, w = rgba.shape[:2]
 
     # Auto-detect background type
     if background == "auto":
-        corners = [pixels[0, 0], pixels[w-1, 0], pixels[0, h-1], pixels[w-1, h-1]]
-        avg_alpha = sum(c[3] for c in corners) / 4
-        if avg_alpha < 50:
-            background = "transparent"
-        else:
-            background = "white"
-
-    top, bottom, left, right = h, 0, w, 0
-    for y in range(h):
-        for x in range(w):
-            r, g, b, a = pixels[x, y]
-            if background == "white":
-                is_bg = (r > 240 and g > 240 and b > 240) or a < 20
-            else:
-                is_bg = a < 20
+        background = detect_background(rgba)
 
-            if not is_bg:
-                top = min(top, y)
-                bottom = max(bottom, y)
-                left = min(left, x)
-                right = max(right, x)
+    mask = foreground_mask(rgba, background)
+    top, bottom, left, right = bounds(mask)
 
     bottle_w = right - left
     bottle_h = bottom - top
@@ -66,47 +114,21 @@ def measure_bottle(image_path, background="auto"):
 
     hw_ratio = bottle_h / bottle_w
 
-    # Find cap-body boundary via brightness transition
+    # Find cap-body boundary via brightness transition down the center column
+    # (in the top half of the bottle)
     center_x = (left + right) // 2
-    brightness_profile = []
-    for y in range(top, bottom):
-        r, g, b, a = pixels[center_x, y]
-        brightness = (r + g + b) / 3
-        brightness_profile.append((y, brightness))
-
-    half_point = len(brightness_profile) // 2
-    max_jump = 0
-    jump_y = None
-    window = 5
-
-    for i in range(window, min(half_point, len(brightness_profile) - window)):
-        avg_before = sum(b for _, b in brightness_profile[i-window:i]) / window
-        avg_after = sum(b for _, b in brightness_profile[i:i+window]) / window
-        jump = abs(avg_after - avg_before)
-        if jump > max_jump:
-            max_jump = jump
-            jump_y = brightness_profile[i][0]
+    column = rgba[top:bottom, center_x, :3].astype(np.int32).sum(axis=1)
+    jump_i, max_jump = brightness_jump(column, window=5, limit=len(column) // 2)
+    jump_y = top + jump_i if jump_i is not None else None
 
     cap_boundary = jump_y
     cap_h = cap_boundary - top if cap_boundary else bottle_h * 0.3
     body_h = bottom - cap_boundary if cap_boundary else bottle_h * 0.7
 
     # Measure width at multiple points to detect taper
-    widths = {}
-    for label, y_pos in [("top_quarter", top + bottle_h // 4),
-                          ("mid", top + bottle_h // 2),
-                          ("bottom_quarter", bottom - bottle_h // 4)]:
-        row_left, row_right = w, 0
-        for x in range(left, right + 1):
-            r, g, b, a = pixels[x, y_pos]
-            if background == "white":
-                is_bg = (r > 240 and g > 240 and b > 240) or a < 20
-            else:
-                is_bg = a < 20
-            if not is_bg:
-                row_left = min(row_left, x)
-                row_right = max(row_right, x)
-        widths[label] = row_right - row_left if row_right > row_left else 0
+    widths = width_profile(mask, [("top_quarter", top + bottle_h // 4),
+                                  ("mid", top + bottle_h // 2),
+                                  ("bottom_quarter", bottom - bottle_h // 4)], left, right)
 
     return {
         "image_file": os.path.basename(image_path),
@@ -127,8 +149,19 @@ def measure_bottle(image_path, background="auto"):
     }
 
 
-def process_directory(dir_path):
-    """Process a single family directory: extract PSD previews, measure all images."""
+def _measure(img_path):
+    """measure_bottle() for a worker process: (result, None) or (None, error message)."""
+    try:
+        return measure_bottle(img_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def process_directory(dir_path, pool=None):
+    """
+    Process a single family directory: extract PSD previews, measure all images
+    (on pool, a process pool, when given).
+    """
     family = os.path.basename(dir_path.rstrip('/'))
     print(f"\n{'='*50}")
     print(f"  FAMILY: {family}")
@@ -159,18 +192,19 @@ def process_directory(dir_path):
         print("  No images found to measure.")
         return {}
 
+    images = sorted(images)
+    results = pool.map(_measure, images) if pool else map(_measure, images)
+
     measurements = {}
-    for img_path in sorted(images):
+    for img_path, (m, error) in zip(images, results):
         fname = os.path.basename(img_path)
-        try:
-            m = measure_bottle(img_path)
-            if "error" in m:
-                print(f"  ⚠ {fname}: {m['error']}")
-            else:
-                measurements[fname] = m
-                print(f"  ✓ {fname}: H:W={m['height_width_ratio']}:1, cap={m['cap_percent']}%, body={m['body_percent']}%")
-        except Exception as e:
-            print(f"  ✗ {fname}: {e}")
+        if error is not None:
+            print(f"  ✗ {fname}: {error}")
+        elif "error" in m:
+            print(f"  ⚠ {fname}: {m['error']}")
+        else:
+            measurements[fname] = m
+            print(f"  ✓ {fname}: H:W={m['height_width_ratio']}:1, cap={m['cap_percent']}%, body={m['body_percent']}%")
 
     # Write measurements
     out_path = os.path.join(dir_path, "_measurements.json")
@@ -182,12 +216,13 @@ def process_directory(dir_path):
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python measure.py <path>")
-        print("  path = single image, family dir, or parent reference dir")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Measure bottle geometry in reference images")
+    parser.add_argument("path", help="single image, family dir, or parent reference dir")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="images measured at once (default: one per core)")
+    args = parser.parse_args()
 
-    target = sys.argv[1]
+    target = args.path
 
     if os.path.isfile(target):
         # Single image
@@ -199,14 +234,19 @@ def main():
         direct_images = glob.glob(os.path.join(target, "*.png")) + glob.glob(os.path.join(target, "*.jpg"))
         direct_psds = glob.glob(os.path.join(target, "**/*.psd"), recursive=True)
 
-        if direct_images or direct_psds:
-            process_directory(target)
-        else:
-            # Parent directory — process each subdirectory as a family
-            for entry in sorted(os.listdir(target)):
-                subdir = os.path.join(target, entry)
-                if os.path.isdir(subdir) and not entry.startswith('.'):
-                    process_directory(subdir)
+        pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+        try:
+            if direct_images or direct_psds:
+                process_directory(target, pool)
+            else:
+                # Parent directory — process each subdirectory as a family
+                for entry in sorted(os.listdir(target)):
+                    subdir = os.path.join(target, entry)
+                    if os.path.isdir(subdir) and not entry.startswith('.'):
+                        process_directory(subdir, pool)
+        finally:
+            if pool:
+                pool.shutdown()
     else:
         print(f"Not found: {target}")
         sys.exit(1)
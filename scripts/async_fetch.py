@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Async page fetching for bestbottles.com with adaptive (AIMD) politeness.
+
+Instead of sleeping a fixed delay between serial requests, ``fetch_all``
+runs a bounded pool of aiohttp workers that share an ``AimdRate`` pacer:
+
+  - additive increase: every clean response nudges the request rate up by
+    ``increase / rate``, i.e. roughly +``increase`` req/s per second of
+    clean traffic, capped at ``maximum``;
+  - multiplicative decrease: a 429 / 5xx, a connection error, or latency
+    drifting above ``latency_factor`` × the best latency seen cuts the rate
+    by ``decrease``. A Retry-After header also pauses every worker;
+  - only one cut per congestion event: responses to requests sent before the
+    last cut do not cut again.
+
+Throttled or failed requests are retried (``max_retries``) after the pacer
+has backed off. Pages go through ``page_cache.PageCache`` the same way
+``FetchClient.get_page`` does: fresh hits skip the network and the pacer,
+stale entries are revalidated with conditional headers.
+
+Usage:
+    from async_fetch import AimdRate, fetch_all
+
+    results = asyncio.run(fetch_all(urls, headers=HEADERS, workers=8,
+                                    rate=AimdRate(initial=1.0), handle=parse))
+
+Requirements:
+    pip install aiohttp
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from typing import Any, Callable
+
+try:
+    import aiohttp
+except ImportError:
+    print("Missing: pip install aiohttp")
+    sys.exit(1)
+
+from fetch_client import DEFAULT_USER_AGENT, Page
+from page_cache import PageCache
+
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+DEFAULT_WORKERS = 8
+
+
+class AimdRate:
+    """Shared request pacer: additive increase on success, multiplicative decrease on congestion."""
+
+    def __init__(
+        self,
+        initial: float = 1.0,
+        minimum: float = 0.2,
+        maximum: float = 10.0,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+        latency_factor: float = 4.0,
+    ) -> None:
+        self.rate = min(max(initial, minimum), maximum)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.best_latency: float | None = None
+        self.cuts = 0
+        self._next_slot = 0.0
+        self._last_cut = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait_turn(self) -> float:
+        """Sleep until this caller's send slot; returns the send time (monotonic)."""
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        return slot
+
+    def on_success(self, sent_at: float, latency: float) -> None:
+        if self.best_latency is None or latency < self.best_latency:
+            self.best_latency = latency
+        if latency > self.best_latency * self.latency_factor and latency > 1.0:
+            self.on_congestion(sent_at)
+            return
+        self.rate = min(self.maximum, self.rate + self.increase / self.rate)
+
+    def on_congestion(self, sent_at: float, retry_after: float | None = None) -> None:
+        now = time.monotonic()
+        if retry_after:
+            self._next_slot = max(self._next_slot, now + retry_after)
+        if sent_at < self._last_cut:
+            return  # already backed off for this episode
+        self._last_cut = now
+        self.cuts += 1
+        self.rate = max(self.minimum, self.rate * self.decrease)
+        self._next_slot = max(self._next_slot, now + 1.0 / self.rate)
+
+
+def _retry_after(headers) -> float | None:
+    value = headers.get("Retry-After")
+    try:
+        return min(float(value), 120.0) if value else None
+    except ValueError:
+        return None  # HTTP-date form; the multiplicative cut is enough
+
+
+def _decode(body: bytes, charset: str | None) -> str:
+    # Same rule as fetch_client._decode: UTF-8 unless the response declares a charset.
+    try:
+        return body.decode(charset or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+async def fetch_page(
+    session: aiohttp.ClientSession,
+    url: str,
+    rate: AimdRate,
+    cache: PageCache | None = None,
+    timeout: float = 15,
+    max_retries: int = 3,
+) -> Page:
+    """Async counterpart of FetchClient.get_page, paced and retried through ``rate``."""
+    entry = cache.lookup(url) if cache else None
+    if cache and entry and cache.is_fresh(entry):
+        return Page(url, 200, cache.read_body(entry), from_cache=True)
+    headers = cache.conditional_headers(entry) if cache else {}
+
+    attempt = 0
+    while True:
+        sent_at = await rate.wait_turn()
+        try:
+            async with session.get(
+                url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout), allow_redirects=True
+            ) as resp:
+                if resp.status in RETRY_STATUSES:
+                    rate.on_congestion(sent_at, _retry_after(resp.headers))
+                    if attempt < max_retries:
+                        attempt += 1
+                        continue
+                    return Page(url, resp.status, "")
+                body = await resp.read()
+                rate.on_success(sent_at, time.monotonic() - sent_at)
+                if cache and entry and resp.status == 304:
+                    cache.touch(entry)
+                    return Page(url, 200, cache.read_body(entry), from_cache=True)
+                text = _decode(body, resp.charset)
+                if cache and resp.status == 200:
+                    cache.store(
+                        url, text, etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified")
+                    )
+                return Page(url, resp.status, text)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            rate.on_congestion(sent_at)
+            if attempt >= max_retries:
+                raise
+            attempt += 1
+
+
+async def fetch_all(
+    urls: list[str],
+    *,
+    headers: dict[str, str] | None = None,
+    workers: int = DEFAULT_WORKERS,
+    rate: AimdRate | None = None,
+    cache: PageCache | None = None,
+    timeout: float = 15,
+    max_retries: int = 3,
+    handle: Callable[[str, Page | None, BaseException | None], Any] | None = None,
+    on_done: Callable[[int], None] | None = None,
+) -> list[Any]:
+    """Fetch ``urls`` with ``workers`` concurrent workers; results come back in input order.
+
+    Each result is ``handle(url, page, error)`` (run in a worker thread so
+    parsing overlaps the network), or the Page / exception itself when no
+    handler is given. ``on_done(n_completed)`` is called after every URL.
+    """
+    rate = rate or AimdRate()
+    results: list[Any] = [None] * len(urls)
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for index in range(len(urls)):
+        queue.put_nowait(index)
+    completed = 0
+
+    session_headers = {"User-Agent": DEFAULT_USER_AGENT, **(headers or {})}
+    connector = aiohttp.TCPConnector(limit_per_host=workers)
+    async with aiohttp.ClientSession(headers=session_headers, connector=connector) as session:
+
+        async def worker() -> None:
+            nonlocal completed
+            while True:
+                try:
+                    index = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                url = urls[index]
+                page: Page | None = None
+                error: BaseException | None = None
+                try:
+                    page = await fetch_page(session, url, rate, cache, timeout, max_retries)
+                except Exception as exc:  # noqa: BLE001
+                    error = exc
+                if handle is not None:
+                    results[index] = await asyncio.to_thread(handle, url, page, error)
+                else:
+                    results[index] = page if error is None else error
+                completed += 1
+                if on_done is not None:
+                    on_done(completed)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    return results
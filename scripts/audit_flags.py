@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Per-SKU data-quality flags for the audit workbook.
+
+Two flags compare a product against the rest of the catalog (how often its
+bottle color occurs, which threads its family+capacity uses). Instead of
+rescanning the catalog for every row, ``CatalogAggregates`` collects those
+facts in one pass, and each rule in ``FLAG_RULES`` then evaluates a row in
+O(1), so flagging the whole catalog is linear in its size.
+
+Usage:
+    from audit_flags import CatalogAggregates, flag_product
+
+    aggregates = CatalogAggregates(products)
+    flag_count, severity, flag_str, detail_str = flag_product(products[0], aggregates)
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from typing import Any, Callable, NamedTuple
+
+# Threading: mm-based names → standard equivalents
+THREAD_STANDARDIZATION = {
+    "13mm": "13-415",
+    "16mm": "16-415",
+    "16.5mm": "16-415",
+    "18mm": "18-415",
+}
+
+# Suspect single-count colors (across the catalog)
+SUSPECT_COLORS = {
+    "Shiny", "Matte Shiny Silver", "Gold Silver", "Matte Red",
+    "Copper Red", "Gold Ivory", "Gold Lavender Pink", "Copper Gold",
+    "Black Copper", "Shiny Black Copper", "Shiny Copper Pink",
+    "Shiny Black White", "Clear Gold", "Clear Silver",
+}
+
+RARE_COLOR_COUNT = 5  # bottle colors on fewer SKUs than this are flagged
+
+# Component families legitimately span several threads per capacity
+MULTI_THREAD_EXEMPT = {
+    "Component", "Cap", "Cap/Closure", "Dropper", "Sprayer",
+    "Roll-On Cap", "Lotion Pump",
+}
+
+
+class CatalogAggregates:
+    """Catalog-wide facts the flag rules need, gathered in a single pass."""
+
+    def __init__(self, products: list[dict[str, Any]]) -> None:
+        self.color_counts: Counter = Counter()
+        self.group_threads: dict[tuple[Any, Any], set[str]] = defaultdict(set)
+        for p in products:
+            self.color_counts[str(p.get("color", ""))] += 1
+            t = str(p.get("neckThreadSize", ""))
+            group = self.group_threads[(p.get("family"), p.get("capacityMl"))]
+            if t and t != "None":
+                group.add(t)
+
+    def threads_for(self, family: Any, cap_ml: Any) -> set[str]:
+        return self.group_threads.get((family, cap_ml), set())
+
+
+class Row(NamedTuple):
+    """The fields of one product the rules look at (with flag_product's defaults)."""
+
+    family: Any
+    cap_ml: Any
+    color: str
+    thread: str
+    applicator: Any
+    cap_color: Any
+
+
+class FlagRule(NamedTuple):
+    flag: str
+    severity: str | None  # None: the flag doesn't raise the row's severity
+    check: Callable[[Row, CatalogAggregates], str | None]  # detail text when the flag applies
+
+
+def _thread_nonstandard(row: Row, agg: CatalogAggregates) -> str | None:
+    if row.thread in THREAD_STANDARDIZATION:
+        return f'Thread "{row.thread}" should be "{THREAD_STANDARDIZATION[row.thread]}"'
+    return None
+
+
+def _rare_color(row: Row, agg: CatalogAggregates) -> str | None:
+    color_count = agg.color_counts[row.color]
+    if row.color and color_count < RARE_COLOR_COUNT:
+        return f'Color "{row.color}" only appears in {color_count} SKU(s)'
+    return None
+
+
+def _missing_applicator(row: Row, agg: CatalogAggregates) -> str | None:
+    return "No applicator specified" if not row.applicator or row.applicator == "None" else None
+
+
+def _missing_cap_color(row: Row, agg: CatalogAggregates) -> str | None:
+    return "No cap color specified" if not row.cap_color or row.cap_color == "None" else None
+
+
+def _missing_thread(row: Row, agg: CatalogAggregates) -> str | None:
+    return "No thread size specified" if not row.thread or row.thread == "None" else None
+
+
+def _suspect_color(row: Row, agg: CatalogAggregates) -> str | None:
+    if row.color in SUSPECT_COLORS:
+        return f'Color "{row.color}" looks like a data entry error'
+    return None
+
+
+def _suspect_cap_color(row: Row, agg: CatalogAggregates) -> str | None:
+    if row.cap_color and str(row.cap_color) in SUSPECT_COLORS:
+        return f'Cap color "{row.cap_color}" looks like a data entry error'
+    return None
+
+
+def _multi_thread(row: Row, agg: CatalogAggregates) -> str | None:
+    group_threads = agg.threads_for(row.family, row.cap_ml)
+    if len(group_threads) > 1 and row.family not in MULTI_THREAD_EXEMPT:
+        return f"Family {row.family} {row.cap_ml}ml has multiple threads: {sorted(group_threads)}"
+    return None
+
+
+# Evaluated in order; a row's severity is that of the last flag raised that has one
+FLAG_RULES = [
+    FlagRule("THREAD_NONSTANDARD", "⚠️", _thread_nonstandard),
+    FlagRule("RARE_COLOR", "⚠️", _rare_color),
+    FlagRule("MISSING_APPLICATOR", None, _missing_applicator),
+    FlagRule("MISSING_CAP_COLOR", None, _missing_cap_color),
+    FlagRule("MISSING_THREAD", "🔴", _missing_thread),
+    FlagRule("SUSPECT_COLOR_NAME", "🔴", _suspect_color),
+    FlagRule("SUSPECT_CAP_COLOR", "🔴", _suspect_cap_color),
+    FlagRule("MULTI_THREAD", "🔴", _multi_thread),
+]
+
+
+def flag_product(p: dict[str, Any], aggregates: CatalogAggregates) -> tuple[int, str, str, str]:
+    """(flag count, severity, flag types, flag details) for a single product."""
+    row = Row(
+        family=p.get("family", ""),
+        cap_ml=p.get("capacityMl", 0),
+        color=str(p.get("color", "")),
+        thread=str(p.get("neckThreadSize", "")),
+        applicator=p.get("applicator"),
+        cap_color=p.get("capColor"),
+    )
+    flags = []
+    flag_details = []
+    severity = "✅"  # default
+    for rule in FLAG_RULES:
+        detail = rule.check(row, aggregates)
+        if detail is not None:
+            flags.append(rule.flag)
+            flag_details.append(detail)
+            if rule.severity:
+                severity = rule.severity
+
+    flag_str = "; ".join(flags) if flags else "CLEAN"
+    detail_str = " | ".join(flag_details) if flag_details else "No issues"
+    return len(flags), severity, flag_str, detail_str
@@ -7,9 +7,10 @@ the Master Products tab of the master sheet.
 
 This is the 3rd identifier — sits above websiteSku and graceSku.
 """
-import json
 import openpyxl
 
+from catalog_store import CatalogStore
+
 # ── Load master sheet — all rows ──────────────────────────────
 wb = openpyxl.load_workbook(
     "docs/BestBottles_MasterSheet_v1.4_MASTER.xlsx",
@@ -40,8 +41,8 @@ wb.close()
 print(f"Master sheet SKU→ProductID mappings: {len(sku_to_pid)}")
 
 # ── Load grace products ───────────────────────────────────────
-with open("data/grace_products_clean.json") as f:
-    products = json.load(f)
+store = CatalogStore()
+products = store.find()  # every row gets a productId, so all rows are loaded
 
 # ── Back-fill productId on every record ──────────────────────
 matched   = 0
@@ -82,7 +83,7 @@ for p in unmatched_items[:10]:
     print(f"    {p.get('websiteSku'):<35} {p.get('itemName', '')[:40]}")
 
 # Save
-with open("data/grace_products_clean.json", "w") as f:
-    json.dump(products, f, indent=2)
+store.update(products)
+store.export_json()
 
 print(f"\n✅ Saved {len(products)} items with productId field populated")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Benchmark + equivalence check: single-pass audit flags vs the old per-row catalog rescans.
+
+Flags a synthetic catalog (optionally seeded from the real one) at growing
+sizes with audit_flags and reports the time per SKU, which should stay flat
+as the catalog grows. Sizes up to --legacy-max are also run through the old
+O(n²) flag_product; any output difference is reported and makes the
+script exit non-zero.
+
+Usage:
+    python3 scripts/bench_audit_flags.py
+    python3 scripts/bench_audit_flags.py --sizes 3000,12000,50000 --legacy-max 6000
+    python3 scripts/bench_audit_flags.py --from-catalog   # mix real rows into the synthetic ones
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from typing import Any
+
+from audit_flags import (
+    MULTI_THREAD_EXEMPT, SUSPECT_COLORS, THREAD_STANDARDIZATION, CatalogAggregates, flag_product,
+)
+
+FAMILIES = ["Cylinder", "Boston Round", "Diva", "Elegant", "Empire", "Grace", "Sleek", "Tulip",
+            "Cap", "Sprayer", "Dropper", "Lotion Pump", "", None]
+CAPACITIES = [1, 5, 9, 10, 15, 30, 50, 100, 0, None]
+COLORS = ["Clear", "Amber", "Cobalt Blue", "Frosted", "Black", "Green", "Swirl", "", None]
+THREADS = ["13-415", "15-415", "17-415", "18-415", "18-400", "20-400", "", None, "None"]
+APPLICATORS = ["Metal Roller", "Plastic Roller", "Sprayer", "Dropper", "Lotion Pump", "", None, "None"]
+CAP_COLORS = ["Black", "Gold", "Silver", "Matte Silver", "White", "", None, "None"]
+
+
+def flag_product_legacy(p, all_products):
+    """The pre-audit_flags implementation (full catalog scans per row), kept as the reference."""
+    flags = []
+    flag_details = []
+    severity = "✅"  # default
+
+    family = p.get("family", "")
+    cap_ml = p.get("capacityMl", 0)
+    color = str(p.get("color", ""))
+    thread = str(p.get("neckThreadSize", ""))
+    applicator = p.get("applicator")
+    cap_color = p.get("capColor")
+
+    if thread in THREAD_STANDARDIZATION:
+        flags.append("THREAD_NONSTANDARD")
+        flag_details.append(f'Thread "{thread}" should be "{THREAD_STANDARDIZATION[thread]}"')
+        severity = "⚠️"
+
+    color_count = sum(1 for pp in all_products if str(pp.get("color", "")) == color)
+    if color and color_count < 5:
+        flags.append("RARE_COLOR")
+        flag_details.append(f'Color "{color}" only appears in {color_count} SKU(s)')
+        severity = "⚠️"
+
+    if not applicator or applicator == "None":
+        flags.append("MISSING_APPLICATOR")
+        flag_details.append("No applicator specified")
+
+    if not cap_color or cap_color == "None":
+        flags.append("MISSING_CAP_COLOR")
+        flag_details.append("No cap color specified")
+
+    if not thread or thread == "None":
+        flags.append("MISSING_THREAD")
+        flag_details.append("No thread size specified")
+        severity = "🔴"
+
+    if color in SUSPECT_COLORS:
+        flags.append("SUSPECT_COLOR_NAME")
+        flag_details.append(f'Color "{color}" looks like a data entry error')
+        severity = "🔴"
+
+    if cap_color and str(cap_color) in SUSPECT_COLORS:
+        flags.append("SUSPECT_CAP_COLOR")
+        flag_details.append(f'Cap color "{cap_color}" looks like a data entry error')
+        severity = "🔴"
+
+    group_threads = set()
+    for pp in all_products:
+        if pp.get("family") == family and pp.get("capacityMl") == cap_ml:
+            t = str(pp.get("neckThreadSize", ""))
+            if t and t != "None":
+                group_threads.add(t)
+    if len(group_threads) > 1 and family not in MULTI_THREAD_EXEMPT:
+        flags.append("MULTI_THREAD")
+        flag_details.append(f"Family {family} {cap_ml}ml has multiple threads: {sorted(group_threads)}")
+        severity = "🔴"
+
+    flag_count = len(flags)
+    flag_str = "; ".join(flags) if flags else "CLEAN"
+    detail_str = " | ".join(flag_details) if flag_details else "No issues"
+    return flag_count, severity, flag_str, detail_str
+
+
+def synthetic_catalog(size: int, rng: random.Random, seed_rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Products with the fields the rules read; some keys missing, some rare / suspect / mm-thread values."""
+    fields = {
+        "family": FAMILIES,
+        "capacityMl": CAPACITIES,
+        "color": COLORS * 20 + sorted(SUSPECT_COLORS),
+        "neckThreadSize": THREADS * 10 + list(THREAD_STANDARDIZATION),
+        "applicator": APPLICATORS,
+        "capColor": CAP_COLORS * 10 + sorted(SUSPECT_COLORS),
+    }
+    products = []
+    for i in range(size):
+        if seed_rows and rng.random() < 0.5:
+            products.append(dict(rng.choice(seed_rows)))
+            continue
+        p = {"graceSku": f"SYN-{i:06d}"}
+        for field, values in fields.items():
+            if rng.random() < 0.95:  # otherwise leave the key out
+                p[field] = rng.choice(values)
+        if rng.random() < 0.02:
+            p["color"] = f"Rare Tint {rng.randrange(size // 10 + 1)}"  # a handful of SKUs each
+        products.append(p)
+    return products
+
+
+def flag_all(products: list[dict[str, Any]]) -> list[tuple[int, str, str, str]]:
+    aggregates = CatalogAggregates(products)
+    return [flag_product(p, aggregates) for p in products]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="3125,6250,12500,25000,50000", help="catalog sizes to flag")
+    parser.add_argument("--legacy-max", type=int, default=3125,
+                        help="also run (and compare against) the O(n²) reference up to this size")
+    parser.add_argument("--from-catalog", action="store_true",
+                        help="mix rows from the local catalog (catalog_loader) into the synthetic ones")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    seed_rows: list[dict[str, Any]] = []
+    if args.from_catalog:
+        from catalog_loader import load_products
+
+        seed_rows = load_products("local", verbose=False)
+
+    rng = random.Random(args.seed)
+    mismatches = 0
+    print(f"{'SKUs':>8}  {'single-pass':>12}  {'µs/SKU':>7}  {'legacy':>9}  {'speedup':>8}")
+    for size in (int(n) for n in args.sizes.split(",") if n):
+        products = synthetic_catalog(size, rng, seed_rows)
+
+        start = time.perf_counter()
+        flags = flag_all(products)
+        elapsed = time.perf_counter() - start
+
+        legacy = ""
+        speedup = ""
+        if size <= args.legacy_max:
+            start = time.perf_counter()
+            reference = [flag_product_legacy(p, products) for p in products]
+            legacy_elapsed = time.perf_counter() - start
+            legacy = f"{legacy_elapsed:8.2f}s"
+            speedup = f"{legacy_elapsed / elapsed:7.0f}x"
+            diffs = [i for i, (a, b) in enumerate(zip(flags, reference)) if a != b]
+            mismatches += len(diffs)
+            for i in diffs[:5]:
+                print(f"  MISMATCH row {i}: {products[i]}\n    new:    {flags[i]}\n    legacy: {reference[i]}")
+
+        print(f"{size:>8}  {elapsed:11.3f}s  {elapsed / size * 1e6:7.1f}  {legacy:>9}  {speedup:>8}")
+
+    if mismatches:
+        print(f"\n{mismatches} row(s) differ from the legacy flags")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Benchmark + equivalence check: single-pass spec_extract vs the old per-label regex extractor.
+
+Every page is run through both implementations; any output difference is
+reported and makes the script exit non-zero.
+
+Usage:
+    python3 scripts/bench_extract_specs.py --cache-dir .cache/pages
+    python3 scripts/bench_extract_specs.py --pages path/to/saved_html/
+    python3 scripts/bench_extract_specs.py --from-scrape data/audits/2026-03-06/live_scrape_raw.json --fuzz 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from html_text import strip_html_to_text
+from spec_extract import LABEL_TO_FIELD, SPEC_LABELS, extract_specs
+
+
+STOP_PATTERN = "|".join(re.escape(label) for label in SPEC_LABELS)
+# Approximates the nav / category menu text that precedes the spec block on live pages.
+PAGE_CHROME = " ".join(
+    f"Glass Bottles {family} Bottles {size} ml Roll-On Sprayers Droppers Lotion Pumps Caps & Closures"
+    for family in ("Cylinder", "Boston Round", "Diva", "Elegant", "Empire", "Grace", "Sleek", "Tulip")
+    for size in (1, 5, 9, 15, 30, 50, 100)
+)
+
+
+def extract_specs_legacy(page_text: str) -> dict[str, Any]:
+    """The pre-spec_extract implementation, kept verbatim as the reference."""
+    data: dict[str, Any] = {}
+    for label in SPEC_LABELS:
+        pattern = (
+            rf"{re.escape(label)}:\s*(.+?)(?=(?:{STOP_PATTERN})\:|1\s*pcs?\s*[-–]|\Z)"
+        )
+        match = re.search(pattern, page_text, flags=re.I | re.S)
+        if not match:
+            continue
+        value = re.sub(r"\s+", " ", match.group(1)).strip()
+        value = re.sub(r"\s*Purchase:.*$", "", value, flags=re.I).strip()
+        value = re.sub(r"\s*Nemat International.*$", "", value, flags=re.I).strip()
+        field = LABEL_TO_FIELD[label]
+        if value:
+            data[field] = value
+    return data
+
+
+def load_raw_pages(pages_dir: Path | None, cache_dir: Path | None) -> list[str]:
+    """Raw HTML from a directory of saved .html files and/or page_cache bodies."""
+    pages: list[str] = []
+    if pages_dir:
+        for path in sorted(p for p in pages_dir.rglob("*") if p.suffix.lower() in (".html", ".htm")):
+            pages.append(path.read_text(encoding="utf-8", errors="replace"))
+    if cache_dir:
+        for path in sorted((cache_dir / "bodies").rglob("*.html.gz")):
+            with gzip.open(path, "rb") as handle:
+                pages.append(handle.read().decode("utf-8", errors="replace"))
+    return pages
+
+
+def synthesize_from_scrape(path: Path, rng: random.Random) -> list[str]:
+    """Rebuild product-page-like text from archived scrape records (spec block + price tiers + footer)."""
+    field_to_label = {field: label for label, field in LABEL_TO_FIELD.items()}
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    texts = []
+    for product in payload.get("products", []):
+        parts = [PAGE_CHROME]
+        for field, label in field_to_label.items():
+            if product.get(field):
+                parts.append(f"{label}: {product[field]}")
+        for qty, key in ((1, "webPrice1pc"), (10, "webPrice10pc"), (12, "webPrice12pc")):
+            if product.get(key) is not None:
+                parts.append(f"{qty} pcs - ${product[key]:.2f} / pc")
+        parts.append("Purchase: Add to cart  © Nemat International, Inc. All rights reserved.")
+        separator = rng.choice([" ", "  ", "\n", " \n\t "])
+        texts.append(separator.join(parts))
+    return texts
+
+
+def fuzz_pages(count: int, rng: random.Random) -> list[str]:
+    """Random token soup that exercises edge cases: repeated/adjacent labels, case, missing colons, tiers."""
+    tokens = [f"{label}:" for label in SPEC_LABELS] + [label for label in SPEC_LABELS] + [
+        label.upper() + ":" for label in SPEC_LABELS
+    ] + [
+        "1 pcs -", "11 pcs –", "1pc-", "12 pcs - $4.20 / pc", "Purchase:", "Nemat International",
+        "18-415", "9 ml", "Clear glass", "±0.5 mm", "", " ", "\n", "\t", ":", "1", "pcs",
+        # Non-ASCII code points that re.I folds onto label letters.
+        "İtem Type:", "ıtem Name:", "Neck Thread ſize:", "1 PCſ -", "NECK:",
+    ]
+    return [
+        rng.choice(["", " ", "\n"]).join(rng.choice(tokens) for _ in range(rng.randint(0, 40)))
+        for _ in range(count)
+    ]
+
+
+def time_it(fn: Callable[[str], dict[str, Any]], texts: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=Path, help="Directory of saved product page .html files")
+    parser.add_argument("--cache-dir", type=Path, help="page_cache directory populated by the scrapers")
+    parser.add_argument("--from-scrape", type=Path, nargs="*", default=[], help="live_scrape_raw.json files")
+    parser.add_argument("--fuzz", type=int, default=0, help="Also check N random adversarial pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = [strip_html_to_text(page) for page in load_raw_pages(args.pages, args.cache_dir)]
+    for path in args.from_scrape:
+        texts += synthesize_from_scrape(path, rng)
+    bench_count = len(texts)
+    fuzz = fuzz_pages(args.fuzz, rng)
+    if not texts and not fuzz:
+        raise SystemExit("No pages: pass --pages, --cache-dir, --from-scrape and/or --fuzz")
+
+    mismatches = 0
+    for text in texts + fuzz:
+        expected, actual = extract_specs_legacy(text), extract_specs(text)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH on {text[:120]!r}\n  legacy: {expected}\n  new:    {actual}")
+    print(f"Equivalence: {len(texts) + len(fuzz)} pages checked, {mismatches} mismatches")
+
+    if bench_count:
+        total_chars = sum(len(t) for t in texts)
+        legacy_s = time_it(extract_specs_legacy, texts, args.repeat)
+        new_s = time_it(extract_specs, texts, args.repeat)
+        print(f"Corpus: {bench_count} pages, avg {total_chars / bench_count:,.0f} chars")
+        print(f"  legacy (per-label regex): {legacy_s * 1000:9.1f} ms  ({bench_count / legacy_s:,.0f} pages/s)")
+        print(f"  spec_extract (one pass):  {new_s * 1000:9.1f} ms  ({bench_count / new_s:,.0f} pages/s)")
+        print(f"  speedup: {legacy_s / new_s:.1f}x")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Benchmark the html_text backends (regex / stream / lxml / bs4) on product pages.
+
+Reports pages/sec per backend and how often each backend's spec + price
+extraction agrees with the BeautifulSoup get_text baseline.
+
+Usage:
+    python3 scripts/bench_html_text.py --cache-dir .cache/pages
+    python3 scripts/bench_html_text.py --pages path/to/saved_html/
+    python3 scripts/bench_html_text.py --synthetic 300      # no saved pages needed
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+from bench_extract_specs import load_raw_pages
+from html_text import _EXTRACTORS, _lxml_etree
+from spec_extract import LABEL_TO_FIELD
+
+
+def synthetic_page(rng: random.Random) -> str:
+    """A page shaped like bestbottles.com: heavy inline script/style, long nav, spec block, tiers."""
+    script = "var cfg = {" + ",".join(f'"k{i}": "{"x" * rng.randint(5, 40)}"' for i in range(400)) + "};"
+    style = " ".join(f".c{i} {{ margin: {i}px; color: #{i:06x}; }}" for i in range(300))
+    nav = "".join(
+        f'<li class="menu-item"><a href="/category/{i}">Glass Bottles &amp; Jars {i}</a></li>' for i in range(250)
+    )
+    specs = "".join(
+        f"<tr><td><b>{label}:</b></td><td>{rng.choice(['9 ml', 'Clear glass &amp; cap', '18-415', '52 ± 0.5 mm'])}</td></tr>"
+        for label in LABEL_TO_FIELD
+    )
+    tiers = "".join(
+        f"<option>{qty} pcs - ${rng.uniform(0.2, 3):.2f} / pc</option>" for qty in (1, 12, 144)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Cylinder 9 ml Clear &amp; Roll-On</title>"
+        f"<style>{style}</style><script>{script}</script></head><body>"
+        f'<nav><ul>{nav}</ul></nav><!-- product --><div class="prdDet"><table>{specs}</table>'
+        f'<select name="qty">{tiers}</select><p>In Stock</p></div>'
+        f"<script>{script}</script><footer>Nemat International, Inc.</footer></body></html>"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=Path, help="Directory of saved product page .html files")
+    parser.add_argument("--cache-dir", type=Path, help="page_cache directory populated by the scrapers")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N synthetic product pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = load_raw_pages(args.pages, args.cache_dir)
+    rng = random.Random(args.seed)
+    pages += [synthetic_page(rng) for _ in range(args.synthetic)]
+    if not pages:
+        raise SystemExit("No pages: pass --pages, --cache-dir and/or --synthetic N")
+
+    from product_page import extract_prices
+    from spec_extract import extract_specs
+
+    backends = ["regex", "stream"]
+    if _lxml_etree is not None:
+        backends.append("lxml")
+    try:
+        import bs4  # noqa: F401
+
+        backends.append("bs4")
+    except ImportError:
+        pass
+
+    def parsed(text: str) -> dict:
+        return {**extract_specs(text), **extract_prices(text)}
+
+    baseline_name = "bs4" if "bs4" in backends else "regex"
+    baseline = [parsed(_EXTRACTORS[baseline_name](page)) for page in pages]
+    avg_kb = sum(len(page) for page in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, avg {avg_kb:,.1f} KB; agreement measured against {baseline_name}")
+
+    for name in backends:
+        extract = _EXTRACTORS[name]
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            texts = [extract(page) for page in pages]
+            best = min(best, time.perf_counter() - start)
+        agree = sum(parsed(text) == expected for text, expected in zip(texts, baseline))
+        print(
+            f"  {name:7s} {best * 1000:9.1f} ms  {len(pages) / best:8,.0f} pages/s  "
+            f"specs+prices agree: {agree}/{len(pages)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import pandas as pd
 import json
 import math
 
+from catalog_loader import load_products
+
 def clean_value(val):
     if pd.isna(val) or val is None:
         return None
@@ -12,8 +14,7 @@ def clean_value(val):
 
 def main():
     # 1. Load existing JSON
-    with open('data/grace_products_clean.json') as f:
-        existing_data = json.load(f)
+    existing_data = load_products("local", verbose=False)
         
     existing_by_grace = {p.get('graceSku'): p for p in existing_data if p.get('graceSku')}
     existing_by_web = {p.get('websiteSku'): p for p in existing_data if p.get('websiteSku')}
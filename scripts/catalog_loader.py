@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Shared product-catalog loader for the audit scripts.
+
+Two sources:
+
+  convex  products:getAllForAudit over the Convex REST API. The first page
+          reports ``total``; the remaining pages are then fetched
+          concurrently over one pooled session (fetch_client) instead of
+          one 500-row page at a time. The result is written to a gzipped
+          snapshot with a version stamp, and later runs reuse that snapshot
+          while it is fresh (--snapshot-max-age) instead of re-querying.
+  local   data/grace_products_clean.json, the file the upload scripts
+          keep in sync with Convex. Only with ``allow_fallback=True`` does
+          a missing clean file fall back to grace_products_final.json /
+          grace_products.json, and the file actually read is always
+          printed then.
+
+``load_products("convex")`` falls back to a stale snapshot, then to the
+local files (clean file first, the older exports only when
+``allow_fallback``), so an offline run still has data.
+
+This is the read-only layer, for scripts that take a snapshot of the
+catalog (the audits, scrape_crosscheck, build_missing_master,
+reconcile_master_sheet). Scripts that query, edit and re-export the clean
+file use ``catalog_store.CatalogStore``, whose SQLite copy is built from
+the same file through ``load_local_products``.
+
+Usage:
+    from catalog_loader import add_catalog_args, load_products
+
+    products = load_products("local")
+    products = load_products("convex", convex_url=CONVEX_URL, max_age=3600)
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+
+ROOT = Path(__file__).resolve().parent.parent
+LOCAL_FILES = [
+    ROOT / "data" / "grace_products_clean.json",
+    ROOT / "data" / "grace_products_final.json",
+    ROOT / "data" / "grace_products.json",
+]
+SNAPSHOT_PATH = ROOT / ".cache" / "catalog" / "convex_products.json.gz"
+SNAPSHOT_FORMAT = 1  # bump when the snapshot layout changes
+DEFAULT_SNAPSHOT_MAX_AGE = 6 * 3600  # seconds
+CONVEX_URL = (
+    os.environ.get("NEXT_PUBLIC_CONVEX_URL")
+    or os.environ.get("CONVEX_URL")
+    or "https://helpful-elephant-638.convex.cloud"
+)
+AUDIT_QUERY = "products:getAllForAudit"
+PAGE_SIZE = 500
+DEFAULT_WORKERS = 6
+
+
+# ── Convex ─────────────────────────────────────────────────────────────────────
+
+
+def _query_page(endpoint: str, skip: int, limit: int) -> dict[str, Any]:
+    from fetch_client import get_client  # needs requests; local-only callers never import it
+
+    resp = get_client().post(endpoint, json={"path": AUDIT_QUERY, "args": {"limit": limit, "skip": skip}}, timeout=30)
+    if resp.status_code != 200:
+        raise RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+    return resp.json().get("value", {})
+
+
+def fetch_convex_products(
+    convex_url: str = CONVEX_URL, page_size: int = PAGE_SIZE, workers: int = DEFAULT_WORKERS
+) -> list[dict[str, Any]]:
+    """Fetch every product row; pages after the first are requested concurrently."""
+    endpoint = f"{convex_url.rstrip('/')}/api/query"
+    first = _query_page(endpoint, 0, page_size)
+    total = int(first.get("total") or 0)
+    pages: dict[int, list[dict[str, Any]]] = {0: first.get("page", [])}
+
+    skips = list(range(page_size, total, page_size))
+    if skips:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(skips)))) as pool:
+            for skip, value in zip(skips, pool.map(lambda s: _query_page(endpoint, s, page_size), skips)):
+                pages[skip] = value.get("page", [])
+
+    products = [row for skip in sorted(pages) for row in pages[skip]]
+    if total and len(products) != total:
+        print(f"  ⚠️  Convex reported total={total} but returned {len(products)} rows")
+    return products
+
+
+# ── Snapshot ───────────────────────────────────────────────────────────────────
+
+
+def _snapshot_stamp(convex_url: str, products: list[dict[str, Any]], body: bytes) -> dict[str, Any]:
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "query": AUDIT_QUERY,
+        "convexUrl": convex_url,
+        "fetchedAt": datetime.now().isoformat(),
+        "fetchedAtEpoch": time.time(),
+        "count": len(products),
+        "sha256": hashlib.sha256(body).hexdigest(),
+    }
+
+
+def save_snapshot(products: list[dict[str, Any]], convex_url: str, path: Path = SNAPSHOT_PATH) -> dict[str, Any]:
+    body = json.dumps(products, separators=(",", ":")).encode("utf-8")
+    stamp = _snapshot_stamp(convex_url, products, body)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with gzip.open(temp_path, "wb", compresslevel=6) as handle:
+        # Stamp on the first line so freshness checks never inflate the body.
+        handle.write(json.dumps(stamp).encode("utf-8") + b"\n")
+        handle.write(body)
+    temp_path.replace(path)
+    return stamp
+
+
+def read_snapshot_stamp(path: Path = SNAPSHOT_PATH) -> dict[str, Any] | None:
+    try:
+        with gzip.open(path, "rb") as handle:
+            return json.loads(handle.readline())
+    except (OSError, ValueError):
+        return None
+
+
+def load_snapshot(path: Path = SNAPSHOT_PATH) -> tuple[dict[str, Any], list[dict[str, Any]]] | None:
+    """Return (stamp, products), or None when the snapshot is missing, corrupt or an old format."""
+    try:
+        with gzip.open(path, "rb") as handle:
+            stamp = json.loads(handle.readline())
+            body = handle.read()
+    except (OSError, ValueError):
+        return None
+    if stamp.get("format") != SNAPSHOT_FORMAT or hashlib.sha256(body).hexdigest() != stamp.get("sha256"):
+        return None
+    return stamp, json.loads(body)
+
+
+def snapshot_is_fresh(stamp: dict[str, Any] | None, convex_url: str, max_age: float) -> bool:
+    return (
+        stamp is not None
+        and stamp.get("format") == SNAPSHOT_FORMAT
+        and stamp.get("convexUrl") == convex_url
+        and time.time() - float(stamp.get("fetchedAtEpoch", 0)) < max_age
+    )
+
+
+# ── Loaders ────────────────────────────────────────────────────────────────────
+
+
+def load_local_products(
+    paths: list[Path] | None = None, allow_fallback: bool = False
+) -> tuple[Path, list[dict[str, Any]]] | None:
+    """(path, products) from the first existing file; by default only the clean catalog is tried."""
+    for path in paths or (LOCAL_FILES if allow_fallback else LOCAL_FILES[:1]):
+        if path.exists():
+            with path.open(encoding="utf-8") as handle:
+                return path, json.load(handle)
+    return None
+
+
+def load_products(
+    source: str = "local",
+    *,
+    convex_url: str = CONVEX_URL,
+    max_age: float = DEFAULT_SNAPSHOT_MAX_AGE,
+    refresh: bool = False,
+    snapshot_path: Path = SNAPSHOT_PATH,
+    workers: int = DEFAULT_WORKERS,
+    verbose: bool = True,
+    allow_fallback: bool = False,
+) -> list[dict[str, Any]]:
+    """Load the product catalog from ``source`` ("local" or "convex"); exits when nothing is available."""
+    say = print if verbose else (lambda *args, **kwargs: None)
+    if source == "convex":
+        if not refresh and snapshot_is_fresh(read_snapshot_stamp(snapshot_path), convex_url, max_age):
+            loaded = load_snapshot(snapshot_path)
+            if loaded is not None:
+                stamp, products = loaded
+                say(f"  ✅ {len(products)} products loaded from snapshot ({stamp['fetchedAt'][:19]})")
+                return products
+        try:
+            products = fetch_convex_products(convex_url, workers=workers)
+            if products:
+                save_snapshot(products, convex_url, snapshot_path)
+                say(f"  ✅ {len(products)} products loaded from live Convex          ")
+                return products
+            say("  ⚠️  Convex returned 0 products (query limit). Using local data...")
+        except Exception as e:  # noqa: BLE001
+            say(f"  ⚠️  Convex REST failed: {e}\n     Using local data...")
+
+        loaded = load_snapshot(snapshot_path)
+        if loaded is not None and loaded[0].get("convexUrl") == convex_url:
+            stamp, products = loaded
+            say(f"  ✅ {len(products)} products loaded from stale snapshot ({stamp['fetchedAt'][:19]})")
+            return products
+    elif source != "local":
+        raise ValueError(f"Unknown catalog source: {source!r} (choose local or convex)")
+
+    # Local fallback — kept in sync with Convex via batch upload scripts
+    found = load_local_products(allow_fallback=allow_fallback)
+    if found is not None:
+        path, products = found
+        if path == LOCAL_FILES[0]:
+            say(f"  ✅ {len(products)} products loaded from {path.relative_to(ROOT)}")
+        else:  # a fallback file is never loaded silently
+            print(f"  ⚠️  {LOCAL_FILES[0].relative_to(ROOT)} not found; "
+                  f"{len(products)} products loaded from {path.relative_to(ROOT)}")
+        return products
+
+    tried = LOCAL_FILES if allow_fallback else LOCAL_FILES[:1]
+    print(f"  ❌ No product source found ({', '.join(str(p.relative_to(ROOT)) for p in tried)}). Exiting.")
+    sys.exit(1)
+
+
+def add_catalog_args(parser, default_source: str = "local") -> None:
+    """Register the shared catalog-source options on an argparse parser."""
+    parser.add_argument(
+        "--source",
+        choices=("local", "convex"),
+        default=default_source,
+        help=f"Product catalog source (default: {default_source})",
+    )
+    parser.add_argument(
+        "--snapshot-max-age",
+        type=float,
+        default=DEFAULT_SNAPSHOT_MAX_AGE,
+        help="Reuse the local Convex snapshot while younger than this many seconds",
+    )
+    parser.add_argument("--refresh-snapshot", action="store_true", help="Ignore the Convex snapshot and re-query")
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Indexed SQLite access layer over data/grace_products_clean.json.
+
+The JSON file stays the committed source of truth; ``CatalogStore`` keeps a
+derived SQLite copy in .cache/catalog/ and rebuilds it (one JSON parse)
+only when the JSON's size or mtime changes. Every other run opens the
+database directly, so startup no longer pays the full 4 MB parse.
+
+  - ``websiteSku``, ``graceSku``, ``family``, ``category``, ``neckThreadSize``
+    and ``productUrl`` are real columns with indexes, so equality / IN
+    filters are index lookups.
+  - Rows are decoded lazily: ``rows()`` streams from a cursor and only the
+    rows a query returns are turned into dicts. ``values()`` and ``count()``
+    never decode a row at all. Other fields can still be filtered in SQL via
+    ``json_field("applicator")``.
+  - Each row keeps its exact ``json.dump(products, indent=2)`` text, so
+    ``export_json()`` regenerates the file byte-for-byte and only re-encodes
+    rows that were changed.
+
+Writes (``update`` / ``append``) stay in an open transaction until
+``export_json()`` has replaced the JSON file, so an interrupted script never
+leaves the store ahead of the file.
+
+The JSON is read through ``catalog_loader.load_local_products``, the same
+reader the read-only audit scripts use, but pinned to the one file the store
+exports back to: there is no fallback to the older exports here. Scripts
+that edit or join the catalog (the fitment matrix builders, backfills,
+imports, data_integrity_audit) use this store; scripts that only read a
+snapshot of it, possibly from Convex (the audits, the scrape cross-check,
+build_missing_master, reconcile_master_sheet) use ``catalog_loader.load_products``.
+
+Usage:
+    from catalog_store import CatalogStore
+
+    store = CatalogStore()
+    bottles = store.find(category="Glass Bottle")
+    caps = store.find(family=["Cap", "Cap/Closure"], neckThreadSize="18-415")
+    row = store.first(websiteSku="GBCylAmb9MtlRollBlkDot")
+    for bottle in bottles:
+        bottle["fitmentStatus"] = "mapped"
+    store.update(bottles)
+    store.export_json()
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from catalog_loader import LOCAL_FILES, load_local_products
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_JSON = LOCAL_FILES[0]
+CACHE_DIR = ROOT / ".cache" / "catalog"
+STORE_FORMAT = "1"  # bump when the table layout changes
+INDEXED_COLUMNS = ("websiteSku", "graceSku", "family", "category", "neckThreadSize", "productUrl")
+FETCH_BATCH = 256
+
+
+class CatalogRow(dict):
+    """A product dict that remembers which store row it came from."""
+
+    __slots__ = ("rowid",)
+
+    def __init__(self, rowid: int, data: dict[str, Any]) -> None:
+        super().__init__(data)
+        self.rowid = rowid
+
+
+def json_field(name: str) -> str:
+    """SQL expression for a (non-indexed) top-level product field, e.g. ``json_field("applicator")``."""
+    return f"json_extract(doc, '$.\"{name}\"')"
+
+
+def truthy(expr: str) -> str:
+    """SQL condition matching Python truthiness of a scalar column / json_field value."""
+    return f"({expr} IS NOT NULL AND {expr} != '' AND {expr} != 0)"
+
+
+def _fragment(product: dict[str, Any]) -> str:
+    # One element of json.dump(list, indent=2): the object indented one level.
+    return json.dumps(product, indent=2).replace("\n", "\n  ")
+
+
+def _column_value(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value)
+
+
+class CatalogStore:
+    """SQLite-backed, lazily decoded view of a products JSON file."""
+
+    def __init__(self, json_path: Path = DEFAULT_JSON, db_path: Path | None = None) -> None:
+        self.json_path = Path(json_path)
+        self.db_path = Path(db_path) if db_path else CACHE_DIR / f"{self.json_path.stem}.sqlite"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, isolation_level="DEFERRED")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._sync()
+
+    # ── build / sync ──────────────────────────────────────────────────────────
+
+    def _source_stamp(self) -> str:
+        stat = self.json_path.stat()
+        return f"{STORE_FORMAT}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _stored_stamp(self) -> str | None:
+        try:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else None
+
+    def _sync(self) -> None:
+        if not self.json_path.exists():
+            raise FileNotFoundError(self.json_path)
+        if self._stored_stamp() != self._source_stamp():
+            self.rebuild()
+
+    def rebuild(self) -> None:
+        """Reload every row from the JSON file (the only place the whole file is parsed)."""
+        loaded = load_local_products([self.json_path])
+        if loaded is None:
+            raise FileNotFoundError(self.json_path)
+        _, products = loaded
+        columns = ", ".join(f'"{name}"' for name in INDEXED_COLUMNS)
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS products")
+            self.conn.execute("DROP TABLE IF EXISTS meta")
+            self.conn.execute(f"CREATE TABLE products (id INTEGER PRIMARY KEY, {columns}, doc TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            for name in INDEXED_COLUMNS:
+                self.conn.execute(f'CREATE INDEX idx_products_{name} ON products ("{name}")')
+            self._insert(products, start=0)
+            self._restamp()
+
+    def _insert(self, products: Iterable[dict[str, Any]], start: int) -> None:
+        placeholders = ", ".join("?" for _ in range(len(INDEXED_COLUMNS) + 2))
+        self.conn.executemany(
+            f"INSERT INTO products VALUES ({placeholders})",
+            (
+                (start + offset, *(_column_value(p.get(name)) for name in INDEXED_COLUMNS), _fragment(p))
+                for offset, p in enumerate(products)
+            ),
+        )
+
+    def _restamp(self) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)", (self._source_stamp(),)
+        )
+
+    # ── queries ───────────────────────────────────────────────────────────────
+
+    def _where(self, where: str, params: Iterable[Any], equals: dict[str, Any]) -> tuple[str, list[Any]]:
+        clauses = [f"({where})"] if where else []
+        args = list(params)
+        for name, value in equals.items():
+            if name not in INDEXED_COLUMNS:
+                raise KeyError(f"{name!r} is not an indexed column; filter it with where=json_field({name!r})")
+            if value is None:
+                clauses.append(f'"{name}" IS NULL')
+            elif isinstance(value, (list, tuple, set, frozenset)):
+                values = list(value)
+                clauses.append(f'"{name}" IN ({", ".join("?" for _ in values)})')
+                args.extend(values)
+            else:
+                clauses.append(f'"{name}" = ?')
+                args.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def rows(self, where: str = "", params: Iterable[Any] = (), **equals: Any) -> Iterator[CatalogRow]:
+        """Stream matching products in file order, decoding each row only as it is reached."""
+        sql_where, args = self._where(where, params, equals)
+        cursor = self.conn.execute(f"SELECT id, doc FROM products{sql_where} ORDER BY id", args)
+        while True:
+            batch = cursor.fetchmany(FETCH_BATCH)
+            if not batch:
+                return
+            for rowid, doc in batch:
+                yield CatalogRow(rowid, json.loads(doc))
+
+    def find(self, where: str = "", params: Iterable[Any] = (), **equals: Any) -> list[CatalogRow]:
+        return list(self.rows(where, params, **equals))
+
+    def first(self, where: str = "", params: Iterable[Any] = (), **equals: Any) -> CatalogRow | None:
+        return next(self.rows(where, params, **equals), None)
+
+    def count(self, where: str = "", params: Iterable[Any] = (), **equals: Any) -> int:
+        sql_where, args = self._where(where, params, equals)
+        return self.conn.execute(f"SELECT COUNT(*) FROM products{sql_where}", args).fetchone()[0]
+
+    def values(self, column: str, where: str = "", params: Iterable[Any] = (), **equals: Any) -> list[Any]:
+        """One indexed column (or json_field expression) for every matching row, without decoding rows."""
+        expr = f'"{column}"' if column in INDEXED_COLUMNS else column
+        sql_where, args = self._where(where, params, equals)
+        return [row[0] for row in self.conn.execute(f"SELECT {expr} FROM products{sql_where} ORDER BY id", args)]
+
+    def group_counts(
+        self, field: str, where: str = "", params: Iterable[Any] = (), missing: Any = None, **equals: Any
+    ) -> Counter:
+        """Counter of ``p.get(field, missing)`` over matching rows, computed inside SQLite.
+
+        Keys come back in first-appearance order, like Counter over the list.
+        """
+        sql_where, args = self._where(where, params, equals)
+        path = f"'$.\"{field}\"'"
+        expr = f"CASE WHEN json_type(doc, {path}) IS NULL THEN ? ELSE json_extract(doc, {path}) END"
+        counts: Counter = Counter()
+        for value, n in self.conn.execute(
+            f"SELECT {expr} AS v, COUNT(*) FROM products{sql_where} GROUP BY v ORDER BY MIN(id)", [missing, *args]
+        ):
+            counts[value] += n
+        return counts
+
+    def __len__(self) -> int:
+        return self.count()
+
+    # ── writes ────────────────────────────────────────────────────────────────
+
+    def update(self, rows: Iterable[CatalogRow]) -> int:
+        """Write changed rows back (uncommitted until export_json)."""
+        assignments = ", ".join(f'"{name}" = ?' for name in INDEXED_COLUMNS)
+        cursor = self.conn.executemany(
+            f"UPDATE products SET {assignments}, doc = ? WHERE id = ?",
+            (
+                (*(_column_value(row.get(name)) for name in INDEXED_COLUMNS), _fragment(row), row.rowid)
+                for row in rows
+            ),
+        )
+        return cursor.rowcount
+
+    def append(self, products: Iterable[dict[str, Any]]) -> None:
+        """Add new products after the existing ones (uncommitted until export_json)."""
+        start = self.conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM products").fetchone()[0]
+        self._insert(products, start=start)
+
+    def export_json(self, path: Path | None = None) -> int:
+        """Regenerate the products JSON (same bytes as json.dump(products, f, indent=2)) and commit."""
+        target = Path(path) if path else self.json_path
+        temp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        count = 0
+        with temp_path.open("w", encoding="utf-8") as handle:
+            handle.write("[")
+            for (doc,) in self.conn.execute("SELECT doc FROM products ORDER BY id"):
+                handle.write(",\n  " if count else "\n  ")
+                handle.write(doc)
+                count += 1
+            handle.write("\n]" if count else "]")
+        temp_path.replace(target)
+        if target == self.json_path:
+            self._restamp()
+        self.conn.commit()
+        return count
+
+    def close(self) -> None:
+        self.conn.rollback()
+        self.conn.close()
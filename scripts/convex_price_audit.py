@@ -18,29 +18,23 @@ Usage:
   python3 scripts/convex_price_audit.py              # full audit
   python3 scripts/convex_price_audit.py --family Elegant
   python3 scripts/convex_price_audit.py --limit 50   # quick test run
+  python3 scripts/convex_price_audit.py --workers 8  # async, adaptive rate (needs aiohttp)
 
 Requirements:
-  pip install requests beautifulsoup4
+  pip install requests
 """
 
-import json, csv, time, sys, os, re, argparse
+import asyncio, json, csv, time, sys, argparse
 from datetime import datetime
 from pathlib import Path
 
-try:
-    import requests
-    from bs4 import BeautifulSoup
-except ImportError:
-    print("Missing: pip install requests beautifulsoup4")
-    sys.exit(1)
+from catalog_loader import CONVEX_URL, add_catalog_args, load_products
+from fetch_client import get_client
+from page_cache import add_cache_args, cache_from_args
+from product_page import ProductPage, fetch_product_page, parse_fetched_page
 
 # ── Config ─────────────────────────────────────────────────────────────────────
 
-CONVEX_URL = (
-    os.environ.get("NEXT_PUBLIC_CONVEX_URL")
-    or os.environ.get("CONVEX_URL")
-    or "https://helpful-elephant-638.convex.cloud"
-)
 REQUEST_DELAY   = 0.9    # seconds — be polite to bestbottles.com
 PRICE_TOLERANCE = 0.03   # ≤$0.03 diff treated as rounding, not a mismatch
 
@@ -58,58 +52,8 @@ HEADERS = {
 }
 
 # ── Step 1 — Load products from Convex or local fallback ─────────────────────
-
-def load_products(convex_url: str) -> list[dict]:
-    """
-    Tries to load from live Convex REST API (paginated).
-    Falls back to local grace_products_clean.json if Convex returns 0 or errors.
-    The local file is kept in sync with Convex via the upload scripts.
-    """
-    endpoint = f"{convex_url.rstrip('/')}/api/query"
-    batch    = 500
-    skip     = 0
-    all_prods: list[dict] = []
-    total    = None
-
-    try:
-        while True:
-            r = requests.post(endpoint, json={
-                "path": "products:getAllForAudit",
-                "args": {"limit": batch, "skip": skip}
-            }, timeout=30)
-            if r.status_code != 200:
-                raise Exception(f"HTTP {r.status_code}: {r.text[:200]}")
-            data = r.json()
-            val  = data.get("value", {})
-            if total is None:
-                total = val.get("total", 0)
-            page = val.get("page", [])
-            if not page:
-                break
-            all_prods.extend(page)
-            print(f"     Loaded {len(all_prods)}/{total}...", end="\r")
-            if len(all_prods) >= (total or 0):
-                break
-            skip += batch
-
-        if all_prods:
-            print(f"  ✅ {len(all_prods)} products loaded from live Convex          ")
-            return all_prods
-        else:
-            print(f"  ⚠️  Convex returned 0 products (query limit). Using local file...")
-    except Exception as e:
-        print(f"  ⚠️  Convex REST failed: {e}\n     Using local file...")
-
-    # Local fallback — kept in sync with Convex via batch upload scripts
-    for p in ["data/grace_products_clean.json", "data/grace_products_final.json", "data/grace_products.json"]:
-        if Path(p).exists():
-            prods = json.load(open(p))
-            print(f"  ✅ {len(prods)} products loaded from {p}")
-            return prods
-
-    print("  ❌ No product source found. Exiting.")
-    sys.exit(1)
-
+# catalog_loader.load_products: concurrent Convex pages + gzipped snapshot,
+# falling back to a stale snapshot and then the local JSON files.
 
 # ── Step 2 — Scrape live pricing tiers from bestbottles.com ──────────────────
 
@@ -118,92 +62,67 @@ def scrape_prices(url: str) -> dict:
     Returns a dict with keys: live_1pc, live_10pc, live_12pc, all_tiers, live_stock.
     all_tiers maps qty string → price float, e.g. {"1": 0.80, "12": 0.65, "10": 0.70}.
     """
+    return prices_from_page(fetch_product_page(url, get_client(HEADERS), timeout=15))
+
+
+def prices_from_page(page: ProductPage) -> dict:
+    """scrape_prices() result for an already fetched and parsed page."""
+    if page.status_code == 404:
+        return {"error": "404"}
+    if not page.ok:
+        return {"error": page.error}
+
     result = {}
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=15, allow_redirects=True)
-        if resp.status_code == 404:
-            return {"error": "404"}
-        if resp.status_code != 200:
-            return {"error": f"HTTP {resp.status_code}"}
-
-        soup = BeautifulSoup(resp.text, "html.parser")
-        raw  = resp.text
-
-        # ── A: Price tier table (primary strategy) ────────────────────────
-        # bestbottles.com product pages have a pricing table with qty rows
-        # Structure: <td>1 Piece</td> ... <td>$0.80</td>
-        tier_map: dict[str, float] = {}
-        for row in soup.find_all("tr"):
-            cells = row.find_all(["td", "th"])
-            if len(cells) >= 2:
-                qty_text   = cells[0].get_text(strip=True)
-                price_text = cells[-1].get_text(strip=True)
-                qty_m   = re.search(r"(\d+)", qty_text)
-                price_m = re.search(r"\$([\d]+\.[\d]{2})", price_text)
-                if qty_m and price_m:
-                    qty   = int(qty_m.group(1))
-                    price = float(price_m.group(1))
-                    tier_map[str(qty)] = price
-
-        if tier_map:
-            result["all_tiers"] = tier_map
-            # 1-piece: lowest qty key
-            min_qty = min(int(k) for k in tier_map)
-            result["live_1pc"] = tier_map[str(min_qty)]
-            # 10-piece
-            if "10" in tier_map:
-                result["live_10pc"] = tier_map["10"]
-            # 12-piece
-            if "12" in tier_map:
-                result["live_12pc"] = tier_map["12"]
-            # Handle cases where the lowest tier IS 10 or 12 (no 1pc)
-            # — treat it as 1pc for comparison purposes
-            if "live_1pc" not in result and tier_map:
-                result["live_1pc"] = tier_map[str(min(int(k) for k in tier_map))]
-
-        # ── B: JSON-LD schema.org offers (fallback) ───────────────────────
-        if "live_1pc" not in result:
-            for script in soup.find_all("script", type="application/ld+json"):
-                try:
-                    ld = json.loads(script.string or "")
-                    offers = ld.get("offers") or ld.get("Offers")
-                    if isinstance(offers, dict):
-                        p = offers.get("price") or offers.get("lowPrice")
-                        if p: result["live_1pc"] = float(p); break
-                    elif isinstance(offers, list) and offers:
-                        p = offers[0].get("price")
-                        if p: result["live_1pc"] = float(p); break
-                except Exception:
-                    pass
-
-        # ── C: meta itemprop="price" (fallback) ───────────────────────────
-        if "live_1pc" not in result:
-            meta = soup.find("meta", itemprop="price")
-            if meta:
-                try: result["live_1pc"] = float(meta.get("content", ""))
-                except ValueError: pass
-
-        # ── D: Scan all dollar amounts (last resort) ───────────────────────
-        if "live_1pc" not in result:
-            prices = [float(m) for m in re.findall(r"\$([\d]+\.[\d]{2})", raw)
-                      if 0.01 < float(m) < 200]
-            if prices:
-                result["live_1pc"] = min(prices)
-
-        # Stock status
-        lc = raw.lower()
-        if "out of stock" in lc:          result["live_stock"] = "Out of Stock"
-        elif "back order" in lc or "backorder" in lc: result["live_stock"] = "Back Order"
-        else:                             result["live_stock"] = "In Stock"
-
-    except Exception as ex:
-        return {"error": str(ex)}
+    # ── A: Price tier table (primary strategy) ────────────────────────────
+    # bestbottles.com product pages have a pricing table with qty rows
+    # Structure: <td>1 Piece</td> ... <td>$0.80</td>
+    tier_map = page.table_tiers
+    if tier_map:
+        result["all_tiers"] = tier_map
+        # 1-piece: lowest qty key — when the lowest tier IS 10 or 12 (no 1pc)
+        # it is treated as 1pc for comparison purposes
+        result["live_1pc"] = tier_map[str(min(int(k) for k in tier_map))]
+        if "10" in tier_map:
+            result["live_10pc"] = tier_map["10"]
+        if "12" in tier_map:
+            result["live_12pc"] = tier_map["12"]
+
+    # ── B: JSON-LD offers, C: meta itemprop="price", D: lowest $ amount ───
+    if "live_1pc" not in result:
+        for fallback in (page.json_ld_price(), page.meta_price, page.lowest_dollar_amount):
+            if fallback is not None:
+                result["live_1pc"] = fallback
+                break
 
+    # Stock status
+    result["live_stock"] = page.stock_status if page.stock_status in ("Out of Stock", "Back Order") else "In Stock"
     return result
 
+def scrape_all_async(urls: list[str], workers: int, start_rate: float, max_rate: float) -> list[dict]:
+    """scrape_prices() for every URL with aiohttp workers and AIMD pacing; results in input order."""
+    from async_fetch import AimdRate, fetch_all
+
+    def handle(url, page, error):
+        if error is not None:
+            return {"error": str(error)}
+        return prices_from_page(parse_fetched_page(url, page))
+
+    def on_done(n):
+        sys.stdout.write(f"\r  [{n:4d}/{len(urls)}] {n / len(urls) * 100:5.1f}%  fetching")
+        sys.stdout.flush()
+
+    rate = AimdRate(initial=start_rate, maximum=max(max_rate, start_rate))
+    results = asyncio.run(
+        fetch_all(urls, headers=HEADERS, workers=workers, rate=rate, cache=get_client(HEADERS).cache,
+                  timeout=15, handle=handle, on_done=on_done)
+    )
+    print(f"\n  Async scrape: final rate {rate.rate:.2f} req/s, {rate.cuts} back-off(s)")
+    return results
+
 # ── Step 3 — Compare one product ─────────────────────────────────────────────
 
-def audit_product(p: dict) -> dict:
+def audit_product(p: dict, sc: dict | None = None) -> dict:
+    """Compare one product against the live page; ``sc`` is a pre-fetched scrape_prices() result."""
     sku      = p.get("graceSku") or p.get("grace_sku") or "???"
     url      = p.get("productUrl") or p.get("product_url") or ""
     s1pc     = p.get("webPrice1pc")
@@ -218,7 +137,8 @@ def audit_product(p: dict) -> dict:
     if not url:
         return {**base, "status": "NO_URL"}
 
-    sc = scrape_prices(url)
+    if sc is None:
+        sc = scrape_prices(url)
     if "error" in sc:
         return {**base, "status": f"ERROR_{sc['error']}", "live_1pc": None}
 
@@ -332,7 +252,13 @@ def main():
     ap.add_argument("--family",   help="Audit one family only, e.g. Elegant")
     ap.add_argument("--delay",    type=float, default=REQUEST_DELAY)
     ap.add_argument("--no-scrape", action="store_true", help="Skip web scraping (dry-run)")
+    ap.add_argument("--workers",  type=int, default=0,
+                    help="Scrape with N async workers and adaptive (AIMD) pacing instead of a fixed --delay")
+    ap.add_argument("--max-rate", type=float, default=8.0, help="Upper bound on requests/sec in --workers mode")
+    add_cache_args(ap)
+    add_catalog_args(ap, default_source="convex")
     args = ap.parse_args()
+    get_client(HEADERS).cache = cache_from_args(args)
 
     Path("data").mkdir(exist_ok=True)
 
@@ -343,7 +269,8 @@ def main():
     print(f"  Compares: webPrice1pc  |  webPrice10pc  |  webPrice12pc")
     print("=" * 70)
 
-    products = load_products(args.url)
+    products = load_products(args.source, convex_url=args.url, max_age=args.snapshot_max_age,
+                             refresh=args.refresh_snapshot, allow_fallback=True)
     if args.family:
         products = [p for p in products if (p.get("family") or "").lower() == args.family.lower()]
         print(f"  Filtered to '{args.family}': {len(products)} products")
@@ -357,7 +284,9 @@ def main():
     print(f"\n  Total products:        {len(products)}")
     print(f"  Have URL (will check): {len(with_url)}")
     print(f"  No URL (skip):         {len(no_url)}")
-    if not args.no_scrape:
+    if not args.no_scrape and args.workers:
+        print(f"  Mode:                  async, {args.workers} workers, ≤{args.max_rate:g} req/s")
+    elif not args.no_scrape:
         est = len(with_url) * args.delay / 60
         print(f"  Est. time:             ~{est:.0f} min ({args.delay}s/req)")
     print("=" * 70 + "\n")
@@ -378,6 +307,14 @@ def main():
             "stored_12pc": p.get("webPrice12pc"),
         })
 
+    prefetched = None
+    if args.workers and not args.no_scrape:
+        prefetched = scrape_all_async(
+            [p.get("productUrl") or p.get("product_url") for p in with_url],
+            workers=args.workers, start_rate=1 / args.delay if args.delay > 0 else args.max_rate,
+            max_rate=args.max_rate,
+        )
+
     for idx, product in enumerate(with_url):
         sku = product.get("graceSku") or "???"
         pct = (idx + 1) / len(with_url) * 100
@@ -393,9 +330,13 @@ def main():
                 "stored_10pc": product.get("webPrice10pc"),
                 "stored_12pc": product.get("webPrice12pc"),
             }
+        elif prefetched is not None:
+            result = audit_product(product, prefetched[idx])
         else:
+            cached = get_client(HEADERS).has_fresh(product.get("productUrl") or product.get("product_url"))
             result = audit_product(product)
-            time.sleep(args.delay)
+            if not cached:
+                time.sleep(args.delay)
 
         s = result.get("status", "")
         stats["checked"] += 1
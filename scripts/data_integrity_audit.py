@@ -1,93 +1,94 @@
-import json
-from collections import Counter, defaultdict
+from catalog_store import CatalogStore, json_field, truthy
 
-with open("data/grace_products_clean.json") as f:
-    data = json.load(f)
+# Every figure below is a COUNT / GROUP BY inside the catalog store; no
+# product row is decoded in Python.
+store = CatalogStore()
 
-total = len(data)
+HAS_URL   = truthy("productUrl")
+HAS_IMAGE = f"({truthy(json_field('image'))} OR {truthy(json_field('imageUrl'))})"
+HAS_1PC   = truthy(json_field("webPrice1pc"))
+
+total = len(store)
 print("=" * 60)
 print(f"FULL DATA INTEGRITY AUDIT — grace_products_clean.json")
 print(f"Total items: {total}")
 print("=" * 60)
 
 # ── 1. URL Status ──────────────────────────────────────────────
-has_url   = [i for i in data if i.get("productUrl")]
-no_url    = [i for i in data if not i.get("productUrl")]
-verified  = [i for i in data if i.get("verified") is True]
+has_url   = store.count(HAS_URL)
+no_url    = total - has_url
+verified  = store.count("json_type(doc, '$.verified') = 'true'")
 
 print(f"\n📡 PRODUCT URL STATUS")
-print(f"  Has productUrl   : {len(has_url):>5}  ({round(len(has_url)/total*100)}%)")
-print(f"  Missing productUrl: {len(no_url):>5}  ({round(len(no_url)/total*100)}%)")
-print(f"  Verified (live)  : {len(verified):>5}  ({round(len(verified)/total*100)}%)")
+print(f"  Has productUrl   : {has_url:>5}  ({round(has_url/total*100)}%)")
+print(f"  Missing productUrl: {no_url:>5}  ({round(no_url/total*100)}%)")
+print(f"  Verified (live)  : {verified:>5}  ({round(verified/total*100)}%)")
 
 # ── 2. Image Status ────────────────────────────────────────────
-has_img = [i for i in data if i.get("image") or i.get("imageUrl")]
-no_img  = [i for i in data if not (i.get("image") or i.get("imageUrl"))]
+has_img = store.count(HAS_IMAGE)
+no_img  = total - has_img
 print(f"\n🖼️  IMAGE STATUS")
-print(f"  Has image        : {len(has_img):>5}  ({round(len(has_img)/total*100)}%)")
-print(f"  Missing image    : {len(no_img):>5}  ({round(len(no_img)/total*100)}%)")
+print(f"  Has image        : {has_img:>5}  ({round(has_img/total*100)}%)")
+print(f"  Missing image    : {no_img:>5}  ({round(no_img/total*100)}%)")
 
 # ── 3. Pricing Status ──────────────────────────────────────────
-has_1pc  = [i for i in data if i.get("webPrice1pc")]
-has_10pc = [i for i in data if i.get("webPrice10pc")]
-has_12pc = [i for i in data if i.get("webPrice12pc")]
-no_price = [i for i in data if not i.get("webPrice1pc") and not i.get("qbPrice")]
+has_1pc  = store.count(HAS_1PC)
+has_10pc = store.count(truthy(json_field("webPrice10pc")))
+has_12pc = store.count(truthy(json_field("webPrice12pc")))
+no_price = store.count(f"NOT {HAS_1PC} AND NOT {truthy(json_field('qbPrice'))}")
 
 print(f"\n💰 PRICING STATUS")
-print(f"  Has webPrice1pc  : {len(has_1pc):>5}  ({round(len(has_1pc)/total*100)}%)")
-print(f"  Has webPrice10pc : {len(has_10pc):>5}  ({round(len(has_10pc)/total*100)}%)")
-print(f"  Has webPrice12pc : {len(has_12pc):>5}  ({round(len(has_12pc)/total*100)}%)")
-print(f"  No price at all  : {len(no_price):>5}  ({round(len(no_price)/total*100)}%)")
+print(f"  Has webPrice1pc  : {has_1pc:>5}  ({round(has_1pc/total*100)}%)")
+print(f"  Has webPrice10pc : {has_10pc:>5}  ({round(has_10pc/total*100)}%)")
+print(f"  Has webPrice12pc : {has_12pc:>5}  ({round(has_12pc/total*100)}%)")
+print(f"  No price at all  : {no_price:>5}  ({round(no_price/total*100)}%)")
 
 # ── 4. SKU Status ──────────────────────────────────────────────
-has_grace_sku   = [i for i in data if i.get("graceSku")]
-has_website_sku = [i for i in data if i.get("websiteSku")]
-has_both        = [i for i in data if i.get("graceSku") and i.get("websiteSku")]
-generic_sku     = [i for i in data if "GENERIC" in (i.get("graceSku") or "").upper()
-                   or "GENERIC" in (i.get("websiteSku") or "").upper()]
+has_grace_sku   = store.count(truthy("graceSku"))
+has_website_sku = store.count(truthy("websiteSku"))
+has_both        = store.count(f"{truthy('graceSku')} AND {truthy('websiteSku')}")
+# instr(upper(...)) mirrors the old str.upper() check (ASCII-only, which "GENERIC" is)
+generic_sku     = store.count("instr(upper(IFNULL(graceSku, '')), 'GENERIC') > 0"
+                              " OR instr(upper(IFNULL(websiteSku, '')), 'GENERIC') > 0")
 
 print(f"\n🔖 SKU STATUS")
-print(f"  Has Grace SKU    : {len(has_grace_sku):>5}  ({round(len(has_grace_sku)/total*100)}%)")
-print(f"  Has Website SKU  : {len(has_website_sku):>5}  ({round(len(has_website_sku)/total*100)}%)")
-print(f"  Has both SKUs    : {len(has_both):>5}  ({round(len(has_both)/total*100)}%)")
-print(f"  Generic/bad SKUs : {len(generic_sku):>5}")
+print(f"  Has Grace SKU    : {has_grace_sku:>5}  ({round(has_grace_sku/total*100)}%)")
+print(f"  Has Website SKU  : {has_website_sku:>5}  ({round(has_website_sku/total*100)}%)")
+print(f"  Has both SKUs    : {has_both:>5}  ({round(has_both/total*100)}%)")
+print(f"  Generic/bad SKUs : {generic_sku:>5}")
 
 # ── 5. The 725 "missing" items ────────────────────────────────
-missing_url_by_cat = Counter(i.get("category", "Unknown") for i in no_url)
-print(f"\n🔴 THE {len(no_url)} ITEMS MISSING A PRODUCT URL")
+missing_url_by_cat = store.group_counts("category", f"NOT {HAS_URL}", missing="Unknown")
+print(f"\n🔴 THE {no_url} ITEMS MISSING A PRODUCT URL")
 print("  By category:")
 for cat, cnt in sorted(missing_url_by_cat.items(), key=lambda x: -x[1]):
     print(f"    {cat:<25}: {cnt}")
 
 # Missing URL by family
-missing_url_by_family = Counter(i.get("family", "Unknown") for i in no_url)
+missing_url_by_family = store.group_counts("family", f"NOT {HAS_URL}", missing="Unknown")
 print("\n  Top 10 families missing URLs:")
 for fam, cnt in missing_url_by_family.most_common(10):
     print(f"    {fam:<30}: {cnt}")
 
 # ── 6. Data Grade Distribution ────────────────────────────────
-grades = Counter(i.get("dataGrade", "None") for i in data)
+grades = store.group_counts("dataGrade", missing="None")
 print(f"\n📊 DATA GRADE DISTRIBUTION")
 for grade, cnt in sorted(grades.items()):
     bar = "█" * int(cnt / total * 40)
     print(f"  Grade {grade:<4}: {cnt:>5} ({round(cnt/total*100):>3}%) {bar}")
 
 # ── 7. What GOOD items look like (have everything) ────────────
-complete = [i for i in data
-            if i.get("productUrl")
-            and i.get("webPrice1pc")
-            and (i.get("image") or i.get("imageUrl"))
-            and i.get("websiteSku")]
-incomplete = total - len(complete)
-
-print(f"\n✅ COMPLETE ITEMS (url + price + image + sku): {len(complete)} ({round(len(complete)/total*100)}%)")
+complete = store.count(f"{HAS_URL} AND {HAS_1PC} AND {HAS_IMAGE} AND {truthy('websiteSku')}")
+incomplete = total - complete
+
+print(f"\n✅ COMPLETE ITEMS (url + price + image + sku): {complete} ({round(complete/total*100)}%)")
 print(f"⚠️  INCOMPLETE ITEMS (missing at least one):   {incomplete} ({round(incomplete/total*100)}%)")
 
 # What's the biggest gap among incomplete items?
 missing_breakdown = {
-    "No URL":   len(no_url),
-    "No Image": len(no_img),
-    "No Price": len(no_price),
+    "No URL":   no_url,
+    "No Image": no_img,
+    "No Price": no_price,
 }
 print(f"\n  Breakdown of what's missing:")
 for k, v in missing_breakdown.items():
@@ -97,8 +98,8 @@ for k, v in missing_breakdown.items():
 print(f"\n{'=' * 60}")
 print("SUMMARY & WHAT STILL NEEDS TO BE DONE")
 print("=" * 60)
-print(f"  1. ✅ Pricing data    : SOLID — {round(len(has_1pc)/total*100)}% have webPrice1pc")
-print(f"  2. ✅ SKU coverage    : SOLID — {round(len(has_website_sku)/total*100)}% have websiteSku")
-print(f"  3. ⚠️  Product URLs   : {len(no_url)} items need URLs scraped from site")
-print(f"  4. ⚠️  Images         : {len(no_img)} items need images")
-print(f"  5. {'✅' if not generic_sku else '❌'} Generic SKUs   : {len(generic_sku)} need fixing")
+print(f"  1. ✅ Pricing data    : SOLID — {round(has_1pc/total*100)}% have webPrice1pc")
+print(f"  2. ✅ SKU coverage    : SOLID — {round(has_website_sku/total*100)}% have websiteSku")
+print(f"  3. ⚠️  Product URLs   : {no_url} items need URLs scraped from site")
+print(f"  4. ⚠️  Images         : {no_img} items need images")
+print(f"  5. {'✅' if not generic_sku else '❌'} Generic SKUs   : {generic_sku} need fixing")
@@ -17,6 +17,8 @@ def main():
             m['Guessed URL Title'] = url_titles.get(u, '')
         else:
             m['Guessed URL Title'] = ''
+        if isinstance(m.get('match_candidates'), list):
+            m['match_candidates'] = '; '.join(f"{c['url']} ({c['score']})" for c in m['match_candidates'])
 
     df = pd.DataFrame(missing)
     
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Shared keep-alive HTTP client for the bestbottles.com scrapers.
+
+Every scraper used to open a fresh connection per page (bare
+``urllib.request.urlopen`` / ``requests.get``), paying a TCP + TLS handshake
+on each request. ``FetchClient`` wraps a single ``requests.Session`` with a
+bounded per-host connection pool so those handshakes happen once per worker.
+
+Usage:
+    from fetch_client import get_client
+
+    client = get_client(headers={"User-Agent": USER_AGENT})
+    html = client.get_text(url, timeout=15)
+
+Set ``client.cache`` to a ``page_cache.PageCache`` to serve repeat fetches
+from disk and revalidate stale pages with conditional requests.
+
+Requirements:
+    pip install requests          # brotli is optional: pip install brotli
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    print("Missing: pip install requests")
+    sys.exit(1)
+
+from page_cache import PageCache
+
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+)
+DEFAULT_POOL_MAXSIZE = 8  # max open connections per host
+
+
+@dataclass
+class Page:
+    """Decoded result of ``FetchClient.get_page``; mirrors the Response fields the scrapers use."""
+
+    url: str
+    status_code: int
+    text: str
+    from_cache: bool = False
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+def _accept_encoding() -> str:
+    # urllib3 only decodes br when a brotli binding is importable.
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+            return "gzip, deflate, br"
+        except ImportError:
+            continue
+    return "gzip, deflate"
+
+
+class FetchClient:
+    """Session wrapper with keep-alive pooling, compression and a per-host connection cap."""
+
+    def __init__(
+        self,
+        headers: dict[str, str] | None = None,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        timeout: float = 20,
+        cache: PageCache | None = None,
+    ) -> None:
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "User-Agent": DEFAULT_USER_AGENT,
+                "Accept-Encoding": _accept_encoding(),
+                "Connection": "keep-alive",
+            }
+        )
+        if headers:
+            self.session.headers.update(headers)
+        # pool_block=True makes workers wait for a free connection instead of
+        # opening (and then discarding) extra sockets past the per-host cap.
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, timeout: float | None = None, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("allow_redirects", True)
+        return self.session.get(url, timeout=timeout or self.timeout, **kwargs)
+
+    def post(self, url: str, timeout: float | None = None, **kwargs: Any) -> requests.Response:
+        return self.session.post(url, timeout=timeout or self.timeout, **kwargs)
+
+    def has_fresh(self, url: str, variant: str = "") -> bool:
+        """True when ``url`` would be served from the cache without any network request."""
+        if self.cache is None:
+            return False
+        entry = self.cache.lookup(url, variant=variant)
+        return entry is not None and self.cache.is_fresh(entry)
+
+    def get_page(self, url: str, timeout: float | None = None) -> Page:
+        """GET ``url`` through the page cache (when configured) and return the decoded page."""
+        cache = self.cache
+        entry = cache.lookup(url) if cache else None
+        if cache and entry and cache.is_fresh(entry):
+            return Page(url, 200, cache.read_body(entry), from_cache=True)
+
+        headers = cache.conditional_headers(entry) if cache else {}
+        resp = self.get(url, timeout=timeout, headers=headers)
+        if cache and entry and resp.status_code == 304:
+            cache.touch(entry)
+            return Page(url, 200, cache.read_body(entry), from_cache=True)
+
+        text = _decode(resp)
+        if cache and resp.status_code == 200:
+            cache.store(url, text, etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"))
+        return Page(url, resp.status_code, text)
+
+    def get_text(self, url: str, timeout: float | None = None) -> str:
+        """GET ``url`` and return the decoded body, raising on non-2xx responses."""
+        page = self.get_page(url, timeout=timeout)
+        page.raise_for_status()
+        return page.text
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _decode(resp: requests.Response) -> str:
+    # Match the old urllib behaviour: UTF-8 with replacement rather than
+    # requests' ISO-8859-1 guess for text/html without a charset.
+    declared = "charset=" in resp.headers.get("Content-Type", "").lower()
+    encoding = resp.encoding if declared and resp.encoding else "utf-8"
+    try:
+        return resp.content.decode(encoding, errors="replace")
+    except LookupError:
+        return resp.content.decode("utf-8", errors="replace")
+
+
+_clients: dict[tuple[tuple[str, str], ...], FetchClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(
+    headers: dict[str, str] | None = None,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+    timeout: float = 20,
+) -> FetchClient:
+    """Return the process-wide client for ``headers``, creating it on first use.
+
+    ``pool_maxsize`` and ``timeout`` only apply when the client is created, so
+    call this once up front (e.g. sized to ``--concurrency``) before workers start.
+    """
+    key = tuple(sorted((headers or {}).items()))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = FetchClient(headers=headers, pool_maxsize=pool_maxsize, timeout=timeout)
+            _clients[key] = client
+        return client
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""Persisted fitment index: which catalog components fit each bottle.
+
+Compiles the two fitment inputs once and keeps the result in
+.cache/fitment/fitment_index.json:
+
+  - the ODS rules (docs/Bottles and Fitment options.ods, streamed through
+    ods_reader) become a prefix trie of bottle codes, so a websiteSku's
+    rule is found by walking its characters once (the longest matching
+    code wins, as the old longest-first scan of every code did)
+  - the catalog's components (via CatalogStore) are grouped by
+    (component type, neck thread)
+
+The artifact is stamped with INDEX_FORMAT, the ODS file's SHA-256 and a
+SHA-256 fingerprint of the catalog rows the index reads (the component
+rows and every bottle's thread). Writing fitment results back onto the
+bottles does not change that fingerprint, so build_fitment_matrix.py can
+run again without recompiling anything. The fingerprint itself is only
+recomputed when the catalog JSON's size or mtime moved.
+
+Usage:
+    from fitment_index import FitmentIndex
+
+    index = FitmentIndex.load()
+    fit = index.components_for("GBCylAmb9MtlRollBlkDot")
+    # {"components": {"Roll-On Cap": [...], ...}, "fitmentStatus": "mapped_partial",
+    #  "catalogGaps": ["Plastic Roller", "Metal Roller"]}
+
+    python scripts/fitment_index.py GBCylAmb9MtlRollBlkDot [--rebuild]
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import defaultdict
+from itertools import groupby
+from pathlib import Path
+from typing import Any
+
+from catalog_store import DEFAULT_JSON, CatalogStore, truthy
+from ods_reader import expand, iter_rows
+
+
+ROOT = Path(__file__).resolve().parent.parent
+ODS_PATH = ROOT / "docs" / "Bottles and Fitment options.ods"
+INDEX_PATH = ROOT / ".cache" / "fitment" / "fitment_index.json"
+INDEX_FORMAT = 2  # bump when the artifact layout or the ODS parsing / classification rules change
+
+# ── 1. ODS fitment rules ──────────────────────────────────────────────────────
+
+
+def header_types(header_row):
+    """Column index -> component type for one sheet's header row."""
+    col_map = {}
+    for i, h in enumerate(header_row):
+        hl = h.lower().strip()
+        if hl in ('reducers', 'reducer'):
+            col_map[i] = 'Reducer'
+        elif hl in ('short caps with liner', 'short cap with liner', 'short caps with liners',
+                    'caps with liners', 'short caps'):
+            col_map[i] = 'Short Cap'
+        elif hl in ('tall caps with liner', 'tall cap with liner', 'tall caps with liners',
+                    'tall caps'):
+            col_map[i] = 'Tall Cap'
+        elif hl in ('roller plug plastic', 'roller plug metal'):
+            # It maps to ALL 3 parts of the roller system
+            col_map[i] = 'Roller System'
+        elif hl in ('roll on cap options', 'roll-on cap options', 'rollon cap options'):
+            if i not in col_map.values():
+                col_map[i] = 'Roller System'
+        elif hl in ('spray top options', 'sprayers', 'sprayer'):
+            col_map[i] = 'Sprayer'
+        elif hl in ('bulb sprayers - with and without tassels', 'bulb sprayer', 'bulb sprayers'):
+            col_map[i] = 'Antique Bulb Sprayer'
+        elif hl in ('lotion pump options', 'lotion pumps', 'lotion pump'):
+            col_map[i] = 'Lotion Pump'
+        elif hl in ('droppers', 'dropper'):
+            col_map[i] = 'Dropper'
+    return col_map
+
+
+def parse_ods_rules(ods_path: Path = ODS_PATH) -> dict[str, dict[str, Any]]:
+    """Bottle code (or name, when a row has no code) -> its ODS rule."""
+    rules = {}
+    for name, sheet_rows in groupby(iter_rows(ods_path), key=lambda row: row.sheet):
+        header_row = col_map = None
+        for i, ods_row in enumerate(sheet_rows):
+            row = expand(ods_row.runs)
+            if i == 0:
+                continue  # sheet title
+            if i == 1:
+                header_row = row
+                col_map = header_types(header_row)
+                continue
+            if row == header_row:
+                continue
+            bottle_name = row[0].strip()
+            bottle_code = row[1].strip() if len(row) > 1 else ''
+
+            if not bottle_name or bottle_name.lower().startswith(('bottle', '18/415', '13/415',
+                                                                   '15/415', '17/415', 'boston',
+                                                                   'special')):
+                continue
+
+            compatible_types = set()
+            for col_idx, comp_type in col_map.items():
+                if col_idx < len(row) and row[col_idx].strip().lower() == 'x':
+                    if comp_type == 'Roller System':
+                        compatible_types.add('Plastic Roller')
+                        compatible_types.add('Metal Roller')
+                        compatible_types.add('Roll-On Cap')
+                    else:
+                        compatible_types.add(comp_type)
+
+            key = bottle_code if bottle_code else bottle_name
+            rules[key] = {
+                'bottleName':      bottle_name,
+                'bottleCode':      bottle_code,
+                'sheetName':       name,
+                'compatibleTypes': sorted(compatible_types),
+            }
+    return rules
+
+
+def compile_trie(rules: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    """Nested {char: node} trie of the bottle codes that have types; "" holds a code's types."""
+    trie: dict[str, Any] = {}
+    for code, rule in rules.items():
+        if rule['compatibleTypes'] and code.strip():
+            node = trie
+            for ch in code:
+                node = node.setdefault(ch, {})
+            node[''] = rule['compatibleTypes']
+    return trie
+
+
+# ── 2. Catalog components ─────────────────────────────────────────────────────
+
+# Explicitly EXCLUDE full bottle bundles that happen to have applicators attached
+BOTTLE_CATS = {
+    'Glass Bottle', 'Glass Jar', 'Packaging', 'Packaging Box',
+    'Aluminum Bottle', 'Plastic Bottle', 'Accessory', 'Other'
+}
+COMPONENT_WHERE = (
+    f"IFNULL(category, '') NOT IN ({', '.join('?' for _ in BOTTLE_CATS)}) AND {truthy('neckThreadSize')}"
+)
+
+VERIFIED_17415_ROLLONCAP_SKUS = {
+    "CpRoll17-415BlkDot", "CpRoll17-415Cu", "CpRoll17-415MattGl", "CpRoll17-415MattSl",
+    "CpRoll17-415PnkDot", "CpRoll17-415ShnBlk", "CpRoll17-415ShnGl", "CpRoll17-415ShnSl",
+    "CpRoll17-415SlDot", "CpRoll17-415White", "CP17-415BlkPP", "CPRoll10mlGl",
+    "CPRoll9mlBlkw/dots", "CPRoll9mlPnkdots",
+}
+
+
+def classify_component(p):
+    app   = p.get('applicator') or ''
+    fam   = p.get('family') or ''
+    cat   = p.get('category') or ''
+    name  = (p.get('itemName') or '').lower()
+    sku   = p.get('websiteSku', '')
+    thread= (p.get('neckThreadSize') or '').strip()
+    types = []
+
+    # ── Roll-On Outer Caps (Lid) ──────────────
+    is_rollon = (cat == 'Roll-On Cap' or (app == 'Roller Ball' and fam == 'Roll-On Cap'))
+    if is_rollon:
+        if thread == "17-415":
+            if sku in VERIFIED_17415_ROLLONCAP_SKUS:
+                types.append('Roll-On Cap')
+        else:
+            types.append('Roll-On Cap')
+
+    # ── Roller Inserts ──────────────
+    elif app == 'Plastic Roller' or (app == 'Roller Ball' and 'plastic' in name):
+        types.append('Plastic Roller')
+
+    elif app == 'Metal Roller' or (app == 'Roller Ball' and 'metal' in name):
+        types.append('Metal Roller')
+
+    # ── Short Cap ──────────────────────────────────────────────────────────
+    elif (app == 'Cap/Closure' or
+          cat == 'Cap/Closure' or
+          (not app and fam in ('Cap', 'Cap/Closure') and cat in ('Component', 'Cap/Closure'))):
+        types.append('Short Cap')
+
+    # ── Reducer ────────────────────────────────────────────────────────────
+    elif app == 'Reducer' or fam == 'Reducer':
+        types.append('Reducer')
+
+    # ── Sprayer ────────────────────────────────────────────────
+    elif (app == 'Sprayer' and fam in ('Sprayer', 'Component')
+          and cat not in ('Lotion Bottle',)):
+        types.append('Sprayer')
+
+    # ── Antique / Bulb Sprayer ─────────────────────────────────────────────
+    elif ((not app and fam == 'Sprayer' and cat == 'Component') or
+          (app == 'Sprayer' and cat == 'Cap/Closure' and 'tassel' in name)):
+        types.append('Antique Bulb Sprayer')
+
+    # ── Dropper ────────────────────────────────────────────────────────────
+    elif app == 'Dropper' or fam == 'Dropper':
+        types.append('Dropper')
+
+    # ── Lotion Pump ───────────────────────────────────────────────────────
+    elif (app in ('Lotion Pump', 'Pump') and cat == 'Component') or (not app and fam == 'Lotion Pump' and cat == 'Component'):
+        types.append('Lotion Pump')
+
+    return types
+
+
+def build_component_map(store: CatalogStore) -> dict[tuple[str, str], list[dict[str, Any]]]:
+    """(component type, neck thread) -> the catalog components of that type and thread."""
+    comp_by_type_thread = defaultdict(list)
+    for c in store.rows(COMPONENT_WHERE, sorted(BOTTLE_CATS)):
+        thread = (c.get('neckThreadSize') or '').strip()
+        for mtype in classify_component(c):
+            comp_by_type_thread[(mtype, thread)].append({
+                'websiteSku':  c.get('websiteSku'),
+                'graceSku':    c.get('graceSku'),
+                'itemName':    c.get('itemName'),
+                'webPrice1pc': c.get('webPrice1pc'),
+                'capColor':    c.get('capColor'),
+                'trimColor':   c.get('trimColor'),
+                'stockStatus': c.get('stockStatus'),
+                'ballMaterial':c.get('ballMaterial'),
+            })
+    return dict(comp_by_type_thread)
+
+
+def bottle_threads(store: CatalogStore) -> list[tuple[str, str]]:
+    """(websiteSku, stripped neck thread) of every glass bottle, in file order."""
+    skus = store.values('websiteSku', category='Glass Bottle')
+    threads = store.values('neckThreadSize', category='Glass Bottle')
+    return [(sku or '', (thread or '').strip()) for sku, thread in zip(skus, threads)]
+
+
+def catalog_fingerprint(store: CatalogStore) -> str:
+    """SHA-256 over exactly the catalog data the index is built from."""
+    digest = hashlib.sha256()
+    for doc in store.values('doc', COMPONENT_WHERE, sorted(BOTTLE_CATS)):
+        digest.update(doc.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(json.dumps(bottle_threads(store)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+# ── 3. Thread-size default compatibility ──────────────────────────────────────
+THREAD_COMPAT = {
+    '13-415': ['Reducer', 'Short Cap', 'Plastic Roller', 'Metal Roller', 'Roll-On Cap', 'Sprayer'],
+    '15-415': ['Short Cap', 'Sprayer'],
+    '17-415': ['Plastic Roller', 'Metal Roller', 'Roll-On Cap', 'Sprayer', 'Lotion Pump'],
+    '18-415': ['Reducer', 'Short Cap', 'Dropper', 'Sprayer', 'Antique Bulb Sprayer', 'Lotion Pump'],
+    '18-400': ['Reducer', 'Short Cap', 'Dropper', 'Sprayer', 'Antique Bulb Sprayer', 'Lotion Pump'],
+    '20-400': ['Short Cap', 'Plastic Roller', 'Metal Roller', 'Roll-On Cap', 'Dropper'],
+}
+
+
+# ── 4. The index ──────────────────────────────────────────────────────────────
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _catalog_stat(path: Path) -> list[int]:
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class FitmentIndex:
+    """Compiled ODS trie + (type, thread) component map, with bottle threads by websiteSku."""
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.stamp = data['stamp']
+        self.trie = data['trie']
+        self.comp_by_type_thread = {(ctype, thread): comps for ctype, thread, comps in data['components']}
+        self.threads: dict[str, str] = {}
+        for sku, thread in data['bottles']:
+            self.threads.setdefault(sku, thread)
+        self._data = data
+
+    # ── build / load ──────────────────────────────────────────────────────────
+
+    @classmethod
+    def build(cls, store: CatalogStore, ods_path: Path = ODS_PATH) -> FitmentIndex:
+        """Compile the index from the ODS and the catalog (the only place either is read in full)."""
+        components = build_component_map(store)
+        return cls({
+            'stamp': {
+                'format': INDEX_FORMAT,
+                'odsSha256': _sha256_file(ods_path),
+                'catalogSha256': catalog_fingerprint(store),
+                'catalogStat': _catalog_stat(store.json_path),
+            },
+            'trie': compile_trie(parse_ods_rules(ods_path)),
+            'components': [[ctype, thread, comps] for (ctype, thread), comps in components.items()],
+            'bottles': bottle_threads(store),
+        })
+
+    @classmethod
+    def load(
+        cls,
+        store: CatalogStore | None = None,
+        *,
+        path: Path = INDEX_PATH,
+        ods_path: Path = ODS_PATH,
+        json_path: Path = DEFAULT_JSON,
+        rebuild: bool = False,
+    ) -> FitmentIndex:
+        """The persisted index when its ODS and catalog stamps still match, else a fresh build (saved)."""
+        json_path = store.json_path if store is not None else Path(json_path)
+        cached = None if rebuild else cls.read(path)
+        if cached is not None and cached.stamp.get('format') == INDEX_FORMAT \
+                and cached.stamp.get('odsSha256') == _sha256_file(ods_path):
+            if cached.stamp.get('catalogStat') == _catalog_stat(json_path):
+                return cached
+            store = store or CatalogStore(json_path)
+            if cached.stamp.get('catalogSha256') == catalog_fingerprint(store):
+                # Only fields the index doesn't read changed: keep it, under the new stat
+                cached.stamp['catalogStat'] = _catalog_stat(json_path)
+                cached.save(path)
+                return cached
+
+        index = cls.build(store or CatalogStore(json_path), ods_path)
+        index.save(path)
+        return index
+
+    @classmethod
+    def read(cls, path: Path = INDEX_PATH) -> FitmentIndex | None:
+        try:
+            with path.open(encoding='utf-8') as handle:
+                return cls(json.load(handle))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path: Path = INDEX_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with temp_path.open('w', encoding='utf-8') as handle:
+            json.dump(self._data, handle, separators=(',', ':'))
+        temp_path.replace(path)
+
+    # ── queries ───────────────────────────────────────────────────────────────
+
+    def rule_types(self, websiteSku: str) -> list[str] | None:
+        """Component types of the longest ODS bottle code websiteSku starts with, or None."""
+        node, types = self.trie, None
+        for ch in websiteSku:
+            node = node.get(ch)
+            if node is None:
+                break
+            types = node.get('', types)
+        return types
+
+    def compat_types(self, websiteSku: str, thread: str) -> list[str] | None:
+        """The bottle's ODS rule, falling back to its thread's defaults."""
+        types = self.rule_types(websiteSku)
+        return types if types is not None else THREAD_COMPAT.get(thread)
+
+    def components_for(self, websiteSku: str, thread: str | None = None) -> dict[str, Any]:
+        """Fitment fields for a bottle: fitmentStatus, plus components / catalogGaps once it maps.
+
+        thread defaults to the catalog's neckThreadSize for websiteSku (KeyError if it isn't a
+        glass bottle there). Component lists are shared with the index; copy before mutating.
+        """
+        if thread is None:
+            thread = self.threads[websiteSku]
+        if not thread:
+            return {'fitmentStatus': 'missing_thread'}
+
+        compat_types = self.compat_types(websiteSku, thread)
+        if not compat_types:
+            return {'fitmentStatus': 'unknown_thread'}
+
+        comp_map = {}
+        for ctype in compat_types:
+            matching = self.comp_by_type_thread.get((ctype, thread), [])
+            if matching:
+                comp_map[ctype] = matching
+
+        fit: dict[str, Any] = {'components': comp_map if comp_map else None}
+        if comp_map:
+            has_gaps = len(comp_map) < len(compat_types)
+            fit['fitmentStatus'] = 'mapped_partial' if has_gaps else 'mapped'
+            if has_gaps:
+                fit['catalogGaps'] = [t for t in compat_types if t not in comp_map]
+        else:
+            fit['fitmentStatus'] = 'mapped_no_components'
+        return fit
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the components that fit a bottle")
+    parser.add_argument("skus", nargs="*", help="Bottle websiteSku(s)")
+    parser.add_argument("--rebuild", action="store_true", help="Recompile the index even if it is current")
+    args = parser.parse_args()
+
+    index = FitmentIndex.load(rebuild=args.rebuild)
+    print(f"Fitment index: {len(index.threads)} bottles, {len(index.comp_by_type_thread)} type/thread groups")
+    for sku in args.skus:
+        fit = index.components_for(sku)
+        print(f"\n{sku}: {fit['fitmentStatus']}")
+        for ctype, comps in (fit.get('components') or {}).items():
+            print(f"  ✅ {ctype:<15}: {len(comps)} variants available")
+        for gap in fit.get('catalogGaps') or []:
+            print(f"  ❌ {gap:<15}: CATALOG GAP")
@@ -1,93 +1,154 @@
+import argparse
+import heapq
 import json
 import re
-from difflib import SequenceMatcher
+import time
+from collections import defaultdict
+
+TOKEN = re.compile(r'[a-z0-9]+')
+CAPACITY = re.compile(r'(\d+)\s*(ml|oz)')
+
+MATCH_THRESHOLD = 30  # reasonable threshold to pair a capacity, family, and color/cap
+
 
 def clean_url(url):
     return url.split('?')[0].split('#')[0].lower()
 
 def get_url_words(url):
     slug = url.split('/')[-1]
-    return set(re.findall(r'[a-z0-9]+', slug))
+    return set(TOKEN.findall(slug))
 
-def calculate_score(product, url_words, url_string):
-    score = 0
-    
-    # Family match
+def product_terms(product):
+    """(family, capacity number, color, applicator/cap words) as calculate_score compares them."""
     family = (product.get('family') or '').lower()
     if family == 'boston round': family = 'boston-round'
-    if family and family in url_string:
-        score += 10
-        
+
     capacity = (product.get('capacity') or '').lower()
     # e.g., "5 ml" -> ["5", "ml"]
-    cap_match = re.search(r'(\d+)\s*(ml|oz)', capacity)
-    if cap_match:
-        if cap_match.group(1) in url_words:
-            score += 15
-            
+    cap_match = CAPACITY.search(capacity)
+
     color = (product.get('color') or '').lower()
-    if color and color in url_string:
-        score += 8
-        
+
     # Cap color/applicator words
     applicator = (product.get('applicator') or '').lower()
     cap_color = (product.get('capColor') or '').lower()
-    
-    for word in re.findall(r'[a-z0-9]+', applicator + " " + cap_color):
+    words = TOKEN.findall(applicator + " " + cap_color)
+
+    return family, cap_match.group(1) if cap_match else None, color, words
+
+def calculate_score(product, url_words, url_string):
+    family, cap_number, color, words = product_terms(product)
+    score = 0
+
+    # Family match
+    if family and family in url_string:
+        score += 10
+
+    if cap_number and cap_number in url_words:
+        score += 15
+
+    if color and color in url_string:
+        score += 8
+
+    for word in words:
         if word in url_words:
             score += 5
-            
+
     return score
 
+
+class UrlIndex:
+    """
+    Product URLs indexed by slug token (and, memoized per distinct value,
+    by family/color substring) so a product is only scored against URLs
+    that share its family or capacity. Scores are calculate_score's.
+    """
+
+    def __init__(self, urls):
+        self.urls = list(urls)
+        self.slugs = [u.split('/')[-1] for u in self.urls]
+        self.by_token = defaultdict(set)
+        for i, url in enumerate(self.urls):
+            for word in get_url_words(url):
+                self.by_token[word].add(i)
+        self._containing = {}
+
+    def containing(self, term):
+        """Ids of the URLs whose slug contains term (a substring, as calculate_score tests)."""
+        if term not in self._containing:
+            self._containing[term] = {i for i, slug in enumerate(self.slugs) if term in slug}
+        return self._containing[term]
+
+    def top_k(self, product, k=3):
+        """The k best (url, score) for product, best first; ties go to the earlier URL."""
+        family, cap_number, color, words = product_terms(product)
+
+        scores = dict.fromkeys(self.containing(family) if family else (), 10)
+        for i in self.by_token.get(cap_number, ()) if cap_number else ():
+            scores[i] = scores.get(i, 0) + 15
+        if not scores:
+            return []
+
+        for i in self.containing(color) if color else ():
+            if i in scores:
+                scores[i] += 8
+        for word in words:
+            for i in self.by_token.get(word, ()):
+                if i in scores:
+                    scores[i] += 5
+
+        best = heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.urls[i], score) for i, score in best]
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Match missing master-sheet products to sitemap URLs")
+    parser.add_argument('--missing', default='data/master_sheet_missing.json')
+    parser.add_argument('--url-map', default='data/firecrawl_url_map.json')
+    parser.add_argument('--output', default='data/master_sheet_missing_matched.json')
+    parser.add_argument('--top-k', type=int, default=3,
+                        help="candidate URLs (with scores) kept per product for review")
+    parser.add_argument('--threshold', type=int, default=MATCH_THRESHOLD)
+    args = parser.parse_args()
+
     print("Loading missing URLs...")
-    with open('data/master_sheet_missing.json') as f:
+    with open(args.missing) as f:
         missing = json.load(f)
-        
+
     print("Loading firecrawl map...")
-    with open('data/firecrawl_url_map.json') as f:
+    with open(args.url_map) as f:
         url_map_raw = json.load(f)
-        
+
+    # Unique, in sitemap order (ties between equal scores go to the earlier URL)
     all_urls = [clean_url(u.get('url')) for u in url_map_raw.get('links', []) if 'product/' in u.get('url', '')]
-    all_urls = list(set(all_urls))
-    
+    all_urls = list(dict.fromkeys(all_urls))
+
     print(f"Loaded {len(all_urls)} unique product URLs.")
-    
-    url_data = []
-    for u in all_urls:
-        url_data.append({
-            'url': u,
-            'words': get_url_words(u),
-            'string': u.split('/')[-1]
-        })
-        
+
+    start = time.perf_counter()
+    index = UrlIndex(all_urls)
     matched = 0
-    
+
     for p in missing:
-        best_score = 0
-        best_url = None
-        
-        # Heuristics based matching
-        for u in url_data:
-            score = calculate_score(p, u['words'], u['string'])
-            if score > best_score:
-                best_score = score
-                best_url = u['url']
-                
-        if best_score >= 30: # reasonable threshold to pair a capacity, family, and color/cap
+        candidates = index.top_k(p, max(args.top_k, 1))
+        best_url, best_score = candidates[0] if candidates else (None, 0)
+
+        if best_score >= args.threshold:
             p['productUrl'] = best_url
             p['match_score'] = best_score
             matched += 1
         else:
             p['productUrl'] = None
             p['match_score'] = best_score
-            
-    print(f"Successfully matched URLs for {matched} out of {len(missing)} products!")
-    
-    with open('data/master_sheet_missing_matched.json', 'w') as f:
+        p['match_candidates'] = [{'url': url, 'score': score} for url, score in candidates[:args.top_k]]
+
+    print(f"Successfully matched URLs for {matched} out of {len(missing)} products!"
+          f" ({time.perf_counter() - start:.2f}s)")
+
+    with open(args.output, 'w') as f:
         json.dump(missing, f, indent=2)
-        
-    print("Saved to data/master_sheet_missing_matched.json")
+
+    print(f"Saved to {args.output}")
 
     # Show some examples
     print("\n--- Match Examples ---")
@@ -9,9 +9,10 @@ This creates an Excel file with:
   - Tab 4: BOTTLE COLORS REVIEW — grouped by family+capacity → verify colors
   - Tab 5: CAP COLORS REVIEW — all cap colors for standardization
   - Tab 6: SUMMARY DASHBOARD — issue counts and quick stats
+
+The MASTER AUDIT flag rules live in audit_flags.py.
 """
 
-import json
 import os
 from collections import defaultdict, Counter
 from openpyxl import Workbook
@@ -21,10 +22,12 @@ from openpyxl.styles import (
 from openpyxl.utils import get_column_letter
 from openpyxl.formatting.rule import CellIsRule
 
+from audit_flags import SUSPECT_COLORS, CatalogAggregates, flag_product
+from catalog_loader import LOCAL_FILES, load_local_products
+
 # ─── CONFIG ───
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
-DATA_FILE = os.path.join(PROJECT_DIR, "data", "grace_products_clean.json")
 OUTPUT_FILE = os.path.join(PROJECT_DIR, "docs", "PRODUCT_DATA_AUDIT.xlsx")
 
 # ─── STYLES ───
@@ -44,106 +47,13 @@ THIN_BORDER = Border(
     bottom=Side(style="thin", color="CCCCCC"),
 )
 
-# ─── KNOWN RULES ───
-# Threading: mm-based names → standard equivalents
-THREAD_STANDARDIZATION = {
-    "13mm": "13-415",
-    "16mm": "16-415",
-    "16.5mm": "16-415",
-    "18mm": "18-415",
-}
-
-# Suspect single-count colors (across the catalog)
-SUSPECT_COLORS = {
-    "Shiny", "Matte Shiny Silver", "Gold Silver", "Matte Red",
-    "Copper Red", "Gold Ivory", "Gold Lavender Pink", "Copper Gold",
-    "Black Copper", "Shiny Black Copper", "Shiny Copper Pink",
-    "Shiny Black White", "Clear Gold", "Clear Silver",
-}
-
 
 def load_data():
-    with open(DATA_FILE, "r") as f:
-        return json.load(f)
-
-
-def flag_product(p, all_products):
-    """Generate flag columns for a single product."""
-    flags = []
-    flag_details = []
-    severity = "✅"  # default
-
-    family = p.get("family", "")
-    cap_ml = p.get("capacityMl", 0)
-    color = str(p.get("color", ""))
-    thread = str(p.get("neckThreadSize", ""))
-    applicator = p.get("applicator")
-    cap_color = p.get("capColor")
-
-    # ── Flag 1: Thread size standardization ──
-    if thread in THREAD_STANDARDIZATION:
-        flags.append("THREAD_NONSTANDARD")
-        flag_details.append(
-            f'Thread "{thread}" should be "{THREAD_STANDARDIZATION[thread]}"'
-        )
-        severity = "⚠️"
-
-    # ── Flag 2: Rare bottle color ──
-    color_count = sum(1 for pp in all_products if str(pp.get("color", "")) == color)
-    if color and color_count < 5:
-        flags.append("RARE_COLOR")
-        flag_details.append(f'Color "{color}" only appears in {color_count} SKU(s)')
-        severity = "⚠️"
-
-    # ── Flag 3: Missing applicator ──
-    if not applicator or applicator == "None":
-        flags.append("MISSING_APPLICATOR")
-        flag_details.append("No applicator specified")
-
-    # ── Flag 4: Missing cap color ──
-    if not cap_color or cap_color == "None":
-        flags.append("MISSING_CAP_COLOR")
-        flag_details.append("No cap color specified")
-
-    # ── Flag 5: Missing thread size ──
-    if not thread or thread == "None":
-        flags.append("MISSING_THREAD")
-        flag_details.append("No thread size specified")
-        severity = "🔴"
-
-    # ── Flag 6: Suspect color name ──
-    if color in SUSPECT_COLORS:
-        flags.append("SUSPECT_COLOR_NAME")
-        flag_details.append(f'Color "{color}" looks like a data entry error')
-        severity = "🔴"
-
-    if cap_color and str(cap_color) in SUSPECT_COLORS:
-        flags.append("SUSPECT_CAP_COLOR")
-        flag_details.append(f'Cap color "{cap_color}" looks like a data entry error')
-        severity = "🔴"
-
-    # ── Flag 7: Multiple threads for this family+capacity ──
-    group_threads = set()
-    for pp in all_products:
-        if pp.get("family") == family and pp.get("capacityMl") == cap_ml:
-            t = str(pp.get("neckThreadSize", ""))
-            if t and t != "None":
-                group_threads.add(t)
-    if len(group_threads) > 1 and family not in [
-        "Component", "Cap", "Cap/Closure", "Dropper", "Sprayer",
-        "Roll-On Cap", "Lotion Pump",
-    ]:
-        flags.append("MULTI_THREAD")
-        flag_details.append(
-            f"Family {family} {cap_ml}ml has multiple threads: {sorted(group_threads)}"
-        )
-        severity = "🔴"
-
-    flag_count = len(flags)
-    flag_str = "; ".join(flags) if flags else "CLEAN"
-    detail_str = " | ".join(flag_details) if flag_details else "No issues"
-
-    return flag_count, severity, flag_str, detail_str
+    """(path read, products) from catalog_loader's local catalog."""
+    found = load_local_products()
+    if found is None:
+        raise FileNotFoundError(LOCAL_FILES[0])
+    return found
 
 
 def style_header(ws, row, col_count):
@@ -185,11 +95,12 @@ def create_master_audit(wb, products):
     ws.freeze_panes = "A2"
     ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}1"
 
-    # Pre-compute flags (this is O(n²) but fine for 2,354 rows)
+    # One aggregate pass, then each row's flags are O(1)
     print("  Computing flags for all products...")
+    aggregates = CatalogAggregates(products)
     flag_cache = {}
     for i, p in enumerate(products):
-        flag_cache[i] = flag_product(p, products)
+        flag_cache[i] = flag_product(p, aggregates)
 
     print("  Writing rows...")
     for i, p in enumerate(products):
@@ -434,7 +345,7 @@ def create_cap_color_review(wb, products):
     print(f"  → CAP COLORS REVIEW: {len(cap_stats)} unique colors written")
 
 
-def create_summary(wb, products):
+def create_summary(wb, products, source_name):
     ws = wb.create_sheet("SUMMARY")
 
     # ── Title ──
@@ -445,7 +356,7 @@ def create_summary(wb, products):
     title_cell.alignment = Alignment(horizontal="center")
 
     ws.merge_cells("A2:F2")
-    ws.cell(row=2, column=1).value = f"Generated from grace_products_clean.json — {len(products)} SKUs"
+    ws.cell(row=2, column=1).value = f"Generated from {source_name} — {len(products)} SKUs"
     ws.cell(row=2, column=1).alignment = Alignment(horizontal="center")
 
     # ── Stats ──
@@ -496,8 +407,8 @@ def main():
     print("  GENERATING PRODUCT DATA AUDIT WORKBOOK")
     print("=" * 60)
 
-    print(f"\n📂 Reading: {DATA_FILE}")
-    products = load_data()
+    data_path, products = load_data()
+    print(f"\n📂 Read: {data_path}")
     print(f"   Loaded {len(products)} products\n")
 
     wb = Workbook()
@@ -508,7 +419,7 @@ def main():
     create_thread_review(wb, products)
     create_color_review(wb, products)
     create_cap_color_review(wb, products)
-    create_summary(wb, products)
+    create_summary(wb, products, data_path.name)
 
     # Move summary to first position
     summary_ws = wb["SUMMARY"]
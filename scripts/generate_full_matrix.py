@@ -1,14 +1,16 @@
 #!/usr/bin/env python3
-import json
 from collections import defaultdict
 
-with open('data/grace_products_clean.json') as f:
-    products = json.load(f)
+from catalog_store import CatalogStore, truthy
+
+store = CatalogStore()
 
 # Group products
 components_keys = ['Cap', 'Cap/Closure', 'Roll-On Cap', 'Sprayer', 'Dropper', 'Applicator Closures', 'Component']
-components = [p for p in products if p.get('family') in components_keys]
-bottles = [p for p in products if p.get('family') not in components_keys and p.get('family')]
+components = store.find(family=components_keys)
+bottles = store.find(
+    f"{truthy('family')} AND family NOT IN ({', '.join('?' for _ in components_keys)})", components_keys
+)
 
 # By Family -> List of distinct Bottle Types (based on thread and type)
 # We will define a Bottle Group by: Capacity + Neck Thread Size + Is_RollOn
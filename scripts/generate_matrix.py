@@ -1,12 +1,14 @@
-import json
 from collections import defaultdict
 
-with open('data/grace_products_clean.json') as f:
-    products = json.load(f)
+from catalog_store import CatalogStore
+
+store = CatalogStore()
 
 # Group products
-bottles = [p for p in products if p.get('family') not in ['Cap', 'Cap/Closure', 'Roll-On Cap', 'Sprayer', 'Dropper', 'Applicator Closures', 'Component']]
-components = [p for p in products if p.get('family') in ['Cap', 'Cap/Closure', 'Roll-On Cap', 'Sprayer', 'Dropper', 'Applicator Closures', 'Component']]
+component_families = ['Cap', 'Cap/Closure', 'Roll-On Cap', 'Sprayer', 'Dropper', 'Applicator Closures', 'Component']
+family_marks = ', '.join('?' for _ in component_families)
+bottles = store.find(f"family IS NULL OR family NOT IN ({family_marks})", component_families)
+components = store.find(family=component_families)
 
 # 1. Cylinder 25ml
 cyl_25 = next((b for b in bottles if b.get('family') == 'Cylinder' and '25' in str(b.get('capacity', '')) and 'ml' in str(b.get('capacity', ''))), None)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Visible-text extraction for bestbottles.com product pages, with selectable backends.
+
+Backends (all return whitespace-collapsed text; script/style bodies are dropped):
+
+  regex   three DOTALL re.sub passes over the raw HTML. Entities are left
+          as-is. This is the original scrape_live_catalog behaviour.
+  stream  html.parser.HTMLParser subclass: a single tokenizer pass, no tree,
+          entities decoded.
+  lxml    lxml's C HTML parser driving a parser *target*, so events are
+          consumed as they are parsed and no element tree is built. Needs
+          ``pip install lxml``.
+  bs4     BeautifulSoup(html, "html.parser").get_text(" ") — builds the full
+          tree; kept for comparison and for callers that also need the soup.
+  auto    lxml when importable, otherwise stream.
+
+Tag boundaries become a single space in every backend, so "<b>1</b>pcs" reads
+"1 pcs" the same way it did with the regex stripper and bs4.
+
+Benchmark:
+    python3 scripts/bench_html_text.py --cache-dir .cache/pages
+"""
+
+from __future__ import annotations
+
+import html as html_lib
+import re
+from html.parser import HTMLParser
+
+
+BACKENDS = ("regex", "stream", "lxml", "bs4", "auto")
+SKIP_TAGS = frozenset({"script", "style", "template"})
+
+WHITESPACE_RE = re.compile(r"\s+")
+TITLE_RE = re.compile(r"<title\b[^>]*>(.*?)</title\s*>", re.I | re.S)
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:  # optional dependency
+    _lxml_etree = None
+
+
+def strip_html_to_text(html: str) -> str:
+    no_script = re.sub(r"<script.*?</script>", " ", html, flags=re.I | re.S)
+    no_style = re.sub(r"<style.*?</style>", " ", no_script, flags=re.I | re.S)
+    text = re.sub(r"<[^>]+>", " ", no_style)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class _StreamTextParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        self.parts.append(" ")
+
+    def handle_startendtag(self, tag: str, attrs) -> None:
+        self.parts.append(" ")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        self.parts.append(" ")
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def stream_html_to_text(html: str) -> str:
+    parser = _StreamTextParser()
+    parser.feed(html)
+    parser.close()
+    return WHITESPACE_RE.sub(" ", "".join(parser.parts)).strip()
+
+
+class _LxmlTextTarget:
+    """lxml parser target: receives parse events directly, so no tree is allocated."""
+
+    def __init__(self) -> None:
+        self.parts: list[str] = []
+        self._skip_depth = 0
+
+    def start(self, tag, attrib) -> None:
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        self.parts.append(" ")
+
+    def end(self, tag) -> None:
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        self.parts.append(" ")
+
+    def data(self, data: str) -> None:
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def comment(self, text: str) -> None:
+        pass
+
+    def close(self) -> str:
+        return "".join(self.parts)
+
+
+def lxml_html_to_text(html: str) -> str:
+    if _lxml_etree is None:
+        raise RuntimeError("lxml backend requested but lxml is not installed (pip install lxml)")
+    if not html.strip():
+        return ""
+    target = _LxmlTextTarget()
+    parser = _lxml_etree.HTMLParser(target=target, remove_comments=True)
+    parser.feed(html)
+    return WHITESPACE_RE.sub(" ", parser.close()).strip()
+
+
+def bs4_html_to_text(html: str) -> str:
+    from bs4 import BeautifulSoup
+
+    return WHITESPACE_RE.sub(" ", BeautifulSoup(html, "html.parser").get_text(" ")).strip()
+
+
+def resolve_backend(backend: str) -> str:
+    if backend == "auto":
+        return "lxml" if _lxml_etree is not None else "stream"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML text backend: {backend!r} (choose from {', '.join(BACKENDS)})")
+    return backend
+
+
+_EXTRACTORS = {
+    "regex": strip_html_to_text,
+    "stream": stream_html_to_text,
+    "lxml": lxml_html_to_text,
+    "bs4": bs4_html_to_text,
+}
+
+
+def html_to_text(html: str, backend: str = "auto") -> str:
+    """Return the visible text of ``html`` using the chosen backend."""
+    return _EXTRACTORS[resolve_backend(backend)](html)
+
+
+def html_title(html: str) -> str | None:
+    """Contents of the first <title>, entity-decoded and stripped, without parsing the page."""
+    match = TITLE_RE.search(html)
+    if not match:
+        return None
+    return html_lib.unescape(match.group(1)).strip()
+
+
+def add_html_parser_arg(parser, default: str) -> None:
+    """Register the shared --html-parser option on an argparse parser."""
+    parser.add_argument(
+        "--html-parser",
+        choices=BACKENDS,
+        default=default,
+        help=f"Backend used to turn product page HTML into text (default: {default}; "
+        "stream/lxml skip building a DOM)",
+    )
@@ -10,20 +10,22 @@ Rules:
 - Map master sheet columns → grace_products_clean.json field names
 - Flag any record with missing thread size for review
 """
-import json
 import openpyxl
 from collections import Counter
 
+from catalog_store import CatalogStore
+
 # ── Load existing data ────────────────────────────────────────
-with open("data/grace_products_clean.json") as f:
-    existing = json.load(f)
+store = CatalogStore()
+existing_count = len(store)
 
+# websiteSku is an indexed column: read it without decoding any product rows
 existing_skus = {
-    (p.get("websiteSku") or "").strip().lower()
-    for p in existing
+    (sku or "").strip().lower()
+    for sku in store.values("websiteSku")
 }
 
-print(f"Existing items in grace_products_clean.json: {len(existing)}")
+print(f"Existing items in grace_products_clean.json: {existing_count}")
 print(f"Unique existing websiteSkus: {len(existing_skus)}")
 
 # ── Load master sheet Component tab ──────────────────────────
@@ -147,11 +149,9 @@ for app, cnt in sorted(app_counts.items(), key=lambda x: -x[1]):
     print(f"    {app or '(none)':<35}: {cnt}")
 
 # ── Merge and save ────────────────────────────────────────────
-merged = existing + new_items
-
-with open("data/grace_products_clean.json", "w") as f:
-    json.dump(merged, f, indent=2)
+store.append(new_items)
+merged_count = store.export_json()
 
 print(f"\n{'='*60}")
-print(f"✅ Saved {len(merged)} total items to data/grace_products_clean.json")
-print(f"   ({len(existing)} existing + {len(new_items)} new components added)")
+print(f"✅ Saved {merged_count} total items to data/grace_products_clean.json")
+print(f"   ({existing_count} existing + {len(new_items)} new components added)")
@@ -9,13 +9,12 @@ is the single source of truth for all taxonomy values. No field
 should be renamed, merged, or cleared without first verifying
 against the Legend.
 """
-import json
-from collections import Counter
+from catalog_store import CatalogStore, json_field
 
-with open("data/grace_products_clean.json") as f:
-    products = json.load(f)
+store = CatalogStore()
+APPLICATOR = json_field("applicator")
 
-before = Counter(p.get("applicator") for p in products)
+before = store.group_counts("applicator")
 
 # ── Revert Map — restore legend-correct values ─────────────────
 # Keyed by: current_value → legend_correct_value
@@ -41,7 +40,12 @@ reverted = 0
 plastic_roller_bottles = 0   # Roller (ROL)
 plastic_roller_caps = 0       # Roller Ball (RLB)
 
-for p in products:
+# Only rows one of the branches below can touch are loaded from the store
+candidates = store.find(
+    f"{APPLICATOR} IN ('Plastic Roller', 'Antique Bulb Sprayer', 'Antique Tassel Sprayer', 'Metal Roller')"
+    f" OR ({APPLICATOR} IS NULL AND graceSku GLOB 'CMP-CAP*')"
+)
+for p in candidates:
     app = p.get("applicator")
     cat = p.get("category", "")
     grace_sku = p.get("graceSku", "") or ""
@@ -83,7 +87,8 @@ for p in products:
         p["applicator"] = "Roll-On"
         reverted += 1
 
-after = Counter(p.get("applicator") for p in products)
+store.update(candidates)
+after = store.group_counts("applicator")
 
 print("=" * 70)
 print("LEGEND RESTORE REPORT")
@@ -142,7 +147,6 @@ print("  referenced against docs/BestBottles_MasterSheet_v1.4_MASTER.xlsx")
 print("  Legend sheet BEFORE being applied to grace_products_clean.json.")
 print("  The Grace SKU formula depends on these exact values.")
 
-with open("data/grace_products_clean.json", "w") as f:
-    json.dump(products, f, indent=2)
+saved = store.export_json()
 
-print(f"\n✅ Saved {len(products)} items to data/grace_products_clean.json")
+print(f"\n✅ Saved {saved} items to data/grace_products_clean.json")
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-"""Merge multiple live scrape raw outputs by productUrl."""
+"""Merge multiple live scrape raw outputs (.json payloads or .jsonl logs) by productUrl."""
 
 from __future__ import annotations
 
@@ -8,6 +8,8 @@ import json
 from datetime import datetime
 from pathlib import Path
 
+from scrape_checkpoint import open_scrape_output
+
 
 def main() -> None:
     parser = argparse.ArgumentParser()
@@ -17,7 +19,7 @@ def main() -> None:
         type=Path,
         nargs="+",
         required=True,
-        help="One or more live_scrape_raw.json files to merge in order",
+        help="One or more live_scrape_raw.json / live_scrape_raw.jsonl files to merge in order",
     )
     args = parser.parse_args()
 
@@ -28,23 +30,27 @@ def main() -> None:
     transport_counts = {"browserless": 0, "direct": 0}
 
     for input_path in args.inputs:
-        payload = json.loads(input_path.read_text(encoding="utf-8"))
-        for product in payload.get("products", []):
-            url = (product.get("productUrl") or "").strip()
+        header, records = open_scrape_output(input_path)
+        input_errors: list[dict] = []
+        for kind, record in records:
+            if kind == "error":
+                input_errors.append(record)
+                continue
+            url = (record.get("productUrl") or "").strip()
             if not url:
                 continue
-            merged_by_url[url] = product
-        for error in payload.get("errors", []):
+            merged_by_url[url] = record
+        for error in input_errors:
             url = (error.get("productUrl") or "").strip()
             if url and url not in merged_by_url:
                 all_errors.append(error)
-        for family in payload.get("families", []):
+        for family in header.get("families", []):
             if family not in families:
                 families.append(family)
-        fetch_mode = payload.get("fetchMode")
+        fetch_mode = header.get("fetchMode")
         if fetch_mode and fetch_mode not in fetch_modes:
             fetch_modes.append(fetch_mode)
-        for key, value in (payload.get("transportCounts") or {}).items():
+        for key, value in (header.get("transportCounts") or {}).items():
             transport_counts[key] = transport_counts.get(key, 0) + int(value or 0)
 
     merged_products = list(merged_by_url.values())
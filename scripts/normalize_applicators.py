@@ -1,8 +1,7 @@
-import json
-from collections import Counter
+from catalog_store import CatalogStore, json_field
 
-with open("data/grace_products_clean.json") as f:
-    products = json.load(f)
+store = CatalogStore()
+APPLICATOR = json_field("applicator")
 
 # ── Normalization Map ─────────────────────────────────────────
 # Each entry: old_value → new_value (or None to clear the field)
@@ -15,13 +14,15 @@ APPLICATOR_MAP = {
 }
 
 # Count before
-before = Counter(p.get("applicator") for p in products)
+before = store.group_counts("applicator")
 
 changed = 0
 cleared = 0
 flags   = []
 
-for product in products:
+# Only the rows carrying an old label are loaded and rewritten
+to_normalize = store.find(f"{APPLICATOR} IN ({', '.join('?' for _ in APPLICATOR_MAP)})", list(APPLICATOR_MAP))
+for product in to_normalize:
     app = product.get("applicator")
     if app in APPLICATOR_MAP:
         new_val = APPLICATOR_MAP[app]
@@ -31,23 +32,22 @@ for product in products:
         else:
             product["applicator"] = new_val
             changed += 1
+store.update(to_normalize)
 
 # ── Flag: no standalone metal roller caps in catalog ──────────
 # Add a catalog-level note to the first item as a metadata marker (just track via print)
-metal_roller_standalones = [
-    p for p in products
-    if p.get("applicator") == "Metal Roller"
-    and p.get("category") != "Glass Bottle"
-]
+metal_roller_standalones = store.find(
+    f"{APPLICATOR} = 'Metal Roller' AND category IS NOT 'Glass Bottle'"
+)
 
 # Count after
-after = Counter(p.get("applicator") for p in products)
+after = store.group_counts("applicator")
 
 # ── Print Report ──────────────────────────────────────────────
 print("=" * 60)
 print("APPLICATOR NORMALIZATION REPORT")
 print("=" * 60)
-print(f"\nTotal items processed: {len(products)}")
+print(f"\nTotal items processed: {len(store)}")
 print(f"Labels consolidated (changed): {changed}")
 print(f"Labels cleared (Cap/Closure → null): {cleared}")
 
@@ -63,20 +63,20 @@ for app, cnt in sorted(after.items(), key=lambda x: -x[1]):
     print(f"  {label:<35}: {cnt}{marker}")
 
 print("\n── CLEAN ROLLER COUNTS ─────────────────")
-plastic = [p for p in products if p.get("applicator") == "Plastic Roller"]
-metal   = [p for p in products if p.get("applicator") == "Metal Roller"]
+plastic = store.count(f"{APPLICATOR} = 'Plastic Roller'")
+metal   = store.count(f"{APPLICATOR} = 'Metal Roller'")
 
-plastic_bundles    = [p for p in plastic if p.get("category") == "Glass Bottle"]
-plastic_standalone = [p for p in plastic if p.get("category") != "Glass Bottle"]
-metal_bundles      = [p for p in metal   if p.get("category") == "Glass Bottle"]
-metal_standalone   = [p for p in metal   if p.get("category") != "Glass Bottle"]
+plastic_bundles    = store.count(f"{APPLICATOR} = 'Plastic Roller'", category="Glass Bottle")
+plastic_standalone = plastic - plastic_bundles
+metal_bundles      = store.count(f"{APPLICATOR} = 'Metal Roller'", category="Glass Bottle")
+metal_standalone   = metal - metal_bundles
 
-print(f"  Plastic Roller — total: {len(plastic)}")
-print(f"    └─ Bottle+roller bundles    : {len(plastic_bundles)}")
-print(f"    └─ Standalone roller caps   : {len(plastic_standalone)}")
-print(f"  Metal Roller   — total: {len(metal)}")
-print(f"    └─ Bottle+roller bundles    : {len(metal_bundles)}")
-print(f"    └─ Standalone roller caps   : {len(metal_standalone)}")
+print(f"  Plastic Roller — total: {plastic}")
+print(f"    └─ Bottle+roller bundles    : {plastic_bundles}")
+print(f"    └─ Standalone roller caps   : {plastic_standalone}")
+print(f"  Metal Roller   — total: {metal}")
+print(f"    └─ Bottle+roller bundles    : {metal_bundles}")
+print(f"    └─ Standalone roller caps   : {metal_standalone}")
 
 print("\n── ⚠️  FLAGS ────────────────────────────")
 if not metal_standalone:
@@ -87,7 +87,6 @@ if not metal_standalone:
 print()
 
 # ── Save ──────────────────────────────────────────────────────
-with open("data/grace_products_clean.json", "w") as f:
-    json.dump(products, f, indent=2)
+saved = store.export_json()
 
-print(f"✅ Saved {len(products)} items to data/grace_products_clean.json")
+print(f"✅ Saved {saved} items to data/grace_products_clean.json")
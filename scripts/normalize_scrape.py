@@ -10,6 +10,8 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+from scrape_checkpoint import RAW_JSON_NAME, RAW_JSONL_NAME, open_scrape_output
+
 
 ROOT = Path(__file__).resolve().parent.parent
 
@@ -90,18 +92,20 @@ def main() -> None:
     parser.add_argument("--output", type=Path, default=None)
     args = parser.parse_args()
 
-    in_path = args.input or (args.audit_dir / "live_scrape_raw.json")
+    in_path = args.input or (args.audit_dir / RAW_JSON_NAME)
+    if args.input is None and not in_path.exists() and (args.audit_dir / RAW_JSONL_NAME).exists():
+        in_path = args.audit_dir / RAW_JSONL_NAME
     out_path = args.output or (args.audit_dir / "live_scrape_normalized.json")
 
     if not in_path.exists():
         raise SystemExit(f"Input file not found: {in_path}")
 
-    payload = json.loads(in_path.read_text(encoding="utf-8"))
-    products = payload.get("products", [])
-
     normalized = []
     skipped = 0
-    for entry in products:
+    _, records = open_scrape_output(in_path)
+    for kind, entry in records:
+        if kind != "product":
+            continue
         row = normalize_entry(entry)
         if row:
             normalized.append(row)
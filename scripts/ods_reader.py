@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Streaming reader for OpenDocument spreadsheets (.ods).
+
+Rows are read from content.xml with ``iterparse`` and yielded one at a
+time; each row element is detached from the tree as soon as it has been
+read, so memory stays flat however long the sheets grow.
+
+Cells come back run-length encoded, as the file stores them: a row is a
+list of ``(text, repeat)`` runs, where ``repeat`` is the cell's
+``number-columns-repeated``. Trailing empty runs are dropped, so the
+16k-column blank tails spreadsheet apps write never get expanded.
+``expand()`` turns a row into one string per column when a script wants
+plain lists.
+
+Usage:
+    from ods_reader import expand, iter_rows
+
+    for row in iter_rows("docs/Bottles and Fitment options.ods"):
+        cells = expand(row.runs)
+        print(row.sheet, cells)
+
+    python scripts/ods_reader.py "docs/Bottles and Fitment options.ods" [--sheet NAME]
+"""
+
+from __future__ import annotations
+
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+T = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+X = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+
+TABLE = f'{{{T}}}table'
+ROW = f'{{{T}}}table-row'
+CELLS = (f'{{{T}}}table-cell', f'{{{T}}}covered-table-cell')
+PARAGRAPH = f'.//{{{X}}}p'
+NAME = f'{{{T}}}name'
+COLUMNS_REPEATED = f'{{{T}}}number-columns-repeated'
+ROWS_REPEATED = f'{{{T}}}number-rows-repeated'
+
+
+class OdsRow(NamedTuple):
+    sheet: str
+    runs: list[tuple[str, int]]  # (cell text, columns it spans), trailing blanks dropped
+    repeat: int                  # number-rows-repeated
+
+
+def cell_text(cell: ET.Element) -> str:
+    """The cell's paragraphs, each stripped, joined without separators."""
+    texts = []
+    for p in cell.iterfind(PARAGRAPH):
+        t = ''.join(p.itertext()).strip()
+        if t:
+            texts.append(t)
+    return ''.join(texts)
+
+
+def row_runs(row: ET.Element) -> list[tuple[str, int]]:
+    runs = []
+    for cell in row:
+        if cell.tag in CELLS:
+            runs.append((cell_text(cell), int(cell.get(COLUMNS_REPEATED, 1))))
+    while runs and not runs[-1][0]:
+        runs.pop()
+    return runs
+
+
+def expand(runs: list[tuple[str, int]], limit: int | None = None) -> list[str]:
+    """One string per column (at most limit columns)."""
+    cells: list[str] = []
+    for text, repeat in runs:
+        if limit is not None and len(cells) + repeat > limit:
+            cells.extend([text] * (limit - len(cells)))
+            break
+        cells.extend([text] * repeat)
+    return cells
+
+
+def iter_rows(path: Path | str) -> Iterator[OdsRow]:
+    """Every non-blank row of every sheet, in document order."""
+    with zipfile.ZipFile(path, 'r') as z, z.open('content.xml') as f:
+        parents: list[ET.Element] = []
+        sheet = ''
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == TABLE:
+                    sheet = elem.get(NAME, '')
+                parents.append(elem)
+                continue
+
+            parents.pop()
+            if elem.tag == ROW:
+                runs = row_runs(elem)
+                if runs:
+                    yield OdsRow(sheet, runs, int(elem.get(ROWS_REPEATED, 1)))
+            elif elem.tag != TABLE:
+                continue
+            # Done with this row (or table): detach it so the tree never grows
+            if parents:
+                parents[-1].remove(elem)
+            elem.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print an .ods file's rows as tab-separated text")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--sheet", help="Only this sheet")
+    args = parser.parse_args()
+
+    for row in iter_rows(args.path):
+        if args.sheet is None or row.sheet == args.sheet:
+            print(row.sheet, *expand(row.runs), sep="\t")
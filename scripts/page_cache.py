@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""On-disk page cache shared by the bestbottles.com scrapers.
+
+Layout under ``cache_dir``:
+    meta/<ab>/<sha256(url)>.json        url, etag, lastModified, fetchedAt, bodyHash
+    bodies/<cd>/<sha256(body)>.html.gz  gzip'd page body, stored once per distinct content
+
+Entries younger than ``max_age`` seconds are served without touching the
+network. Older entries are revalidated with ``If-None-Match`` /
+``If-Modified-Since``; a 304 just refreshes ``fetchedAt``.
+
+Usage:
+    cache = PageCache(Path(".cache/pages"), max_age=12 * 3600)
+    entry = cache.lookup(url)
+    if entry and cache.is_fresh(entry):
+        html = cache.read_body(entry)
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+
+DEFAULT_MAX_AGE = 12 * 3600  # seconds
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    bodyHash: str
+    fetchedAt: float
+    etag: str | None = None
+    lastModified: str | None = None
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique temp name so concurrent workers never clobber each other's partial writes.
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+    temp_path.write_bytes(data)
+    temp_path.replace(path)
+
+
+class PageCache:
+    def __init__(self, cache_dir: Path, max_age: float = DEFAULT_MAX_AGE) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_age = max_age
+
+    def _meta_path(self, url: str, variant: str) -> Path:
+        key = _sha256(f"{variant}\n{url}".encode("utf-8"))
+        return self.cache_dir / "meta" / key[:2] / f"{key}.json"
+
+    def _body_path(self, body_hash: str) -> Path:
+        return self.cache_dir / "bodies" / body_hash[:2] / f"{body_hash}.html.gz"
+
+    def lookup(self, url: str, variant: str = "") -> CacheEntry | None:
+        """Return the cached entry for ``url`` (fresh or stale), or None if absent/corrupt."""
+        meta_path = self._meta_path(url, variant)
+        try:
+            entry = CacheEntry(**json.loads(meta_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            return None
+        if not self._body_path(entry.bodyHash).exists():
+            return None
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.fetchedAt < self.max_age
+
+    def read_body(self, entry: CacheEntry) -> str:
+        with gzip.open(self._body_path(entry.bodyHash), "rb") as handle:
+            return handle.read().decode("utf-8", errors="replace")
+
+    def conditional_headers(self, entry: CacheEntry | None) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.lastModified:
+            headers["If-Modified-Since"] = entry.lastModified
+        return headers
+
+    def store(
+        self,
+        url: str,
+        body: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        variant: str = "",
+    ) -> CacheEntry:
+        raw = body.encode("utf-8")
+        body_hash = _sha256(raw)
+        body_path = self._body_path(body_hash)
+        if not body_path.exists():
+            _atomic_write(body_path, gzip.compress(raw, compresslevel=6))
+        entry = CacheEntry(
+            url=url,
+            bodyHash=body_hash,
+            fetchedAt=time.time(),
+            etag=etag,
+            lastModified=last_modified,
+        )
+        _atomic_write(self._meta_path(url, variant), json.dumps(asdict(entry)).encode("utf-8"))
+        return entry
+
+    def touch(self, entry: CacheEntry, variant: str = "") -> None:
+        """Mark a revalidated (304) entry as freshly fetched."""
+        entry.fetchedAt = time.time()
+        _atomic_write(self._meta_path(entry.url, variant), json.dumps(asdict(entry)).encode("utf-8"))
+
+
+def add_cache_args(parser) -> None:
+    """Register the shared --cache-dir / --max-age options on an argparse parser."""
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Reuse product pages from this on-disk cache (disabled when omitted)",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        default=DEFAULT_MAX_AGE,
+        help=f"Seconds a cached page is served without revalidation (default: {DEFAULT_MAX_AGE})",
+    )
+
+
+def cache_from_args(args) -> PageCache | None:
+    if not args.cache_dir:
+        return None
+    return PageCache(args.cache_dir, max_age=args.max_age)
@@ -9,14 +9,16 @@ discrepancy report.
 
 Usage:
     python3 scripts/pricing_audit.py
+    python3 scripts/pricing_audit.py --cache-dir .cache/pages   # reuse pages fetched today
+    python3 scripts/pricing_audit.py --source convex           # Convex rows, snapshot reused while fresh
 
 Output:
     data/pricing_audit_report.json    — Full machine-readable report
     data/pricing_audit_summary.csv    — Human-readable summary for Excel
 """
 
+import argparse
 import json
-import re
 import csv
 import time
 import sys
@@ -24,15 +26,20 @@ import os
 from datetime import datetime
 
 try:
-    import requests
-    from bs4 import BeautifulSoup
+    import bs4  # noqa: F401  (the default --html-parser)
+    import requests  # noqa: F401
 except ImportError:
     print("ERROR: Missing dependencies. Run: pip install requests beautifulsoup4")
     sys.exit(1)
 
+from catalog_loader import add_catalog_args, load_products
+from fetch_client import get_client
+from html_text import add_html_parser_arg
+from page_cache import add_cache_args, cache_from_args
+from product_page import fetch_product_page
+
 # ─── Configuration ────────────────────────────────────────────────────
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_FILE = os.path.join(ROOT, "data", "grace_products_clean.json")
 REPORT_JSON = os.path.join(ROOT, "data", "pricing_audit_report.json")
 REPORT_CSV = os.path.join(ROOT, "data", "pricing_audit_summary.csv")
 
@@ -47,108 +54,79 @@ HEADERS = {
 PRICE_TOLERANCE = 0.02  # $0.02
 
 # ─── Price Scraping ───────────────────────────────────────────────────
-def scrape_prices(url):
+def scrape_prices(url, html_parser="bs4"):
     """
     Scrape pricing from a bestbottles.com product page.
-    Returns dict with price tiers found, or None on failure.
+    Returns dict with price tiers found, or {"error": ...} on failure.
+    Fields come from one product_page.ProductPage parse; html_parser only
+    picks how the page text for the price regexes is produced.
     """
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=15)
-        resp.raise_for_status()
-    except Exception as e:
-        return {"error": str(e)}
+    page = fetch_product_page(url, get_client(HEADERS), timeout=15, html_parser=html_parser)
+    if not page.ok:
+        return {"error": page.error}
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-    
     prices = {}
-    
-    # Strategy 1: Look for price in structured pricing table/divs
-    # bestbottles.com typically has pricing tiers in the page
-    page_text = soup.get_text(" ", strip=True)
-    
-    # Pattern: "$X.XX/pc" or "$X.XX /pc" for 1pc price
-    # Pattern: "1 pcs - $X.XX/pc" or "1 pc - $X.XX"
-    one_pc_patterns = [
-        r'1\s*pcs?\s*[-–]\s*\$(\d+\.?\d*)\s*/?\s*pc',
-        r'1\s*pcs?\s*[-–]\s*\$(\d+\.?\d*)',
-        r'Price:\s*\$(\d+\.?\d*)',
-    ]
-    
-    for pat in one_pc_patterns:
-        m = re.search(pat, page_text, re.IGNORECASE)
-        if m:
-            prices['live_price_1pc'] = float(m.group(1))
-            break
-    
-    # Pattern: "12 pcs - $XX.XX ($X.XX/pc)"
-    twelve_pc_patterns = [
-        r'12\s*pcs?\s*[-–]\s*\$[\d,]+\.?\d*\s*\(\$(\d+\.?\d*)\s*/?\s*pc\)',
-        r'12\s*pcs?\s*[-–]\s*\$(\d+\.?\d*)',
-    ]
-    
-    for pat in twelve_pc_patterns:
-        m = re.search(pat, page_text, re.IGNORECASE)
-        if m:
-            prices['live_price_12pc'] = float(m.group(1))
+
+    # 1pc: "1 pcs - $X.XX / pc", then "1 pcs - $X.XX", then "Price: $X.XX",
+    # then the product:price:amount meta tag, then the first $ amount inside
+    # a *price* CSS class.
+    first_of_qty = {}
+    for tier in page.text_tiers:
+        first_of_qty.setdefault(tier.qty, tier)
+    one_pc = first_of_qty.get(1)
+    for candidate in (
+        page.web_price_1pc,
+        one_pc.total if one_pc else None,
+        page.labeled_price,
+        page.og_price,
+        page.class_price,
+    ):
+        if candidate is not None:
+            prices['live_price_1pc'] = candidate
             break
-    
+
+    # 12pc: "12 pcs - $XX.XX ($X.XX/pc)" per-piece, else the first bare 12 pcs amount
+    twelve_pc_per_piece = next(
+        (tier.per_piece for tier in page.text_tiers if tier.qty == 12 and tier.per_piece is not None), None
+    )
+    if twelve_pc_per_piece is not None:
+        prices['live_price_12pc'] = twelve_pc_per_piece
+    elif 12 in first_of_qty:
+        prices['live_price_12pc'] = first_of_qty[12].total
+
     # Also grab ALL price tiers for reference
-    all_tiers = re.findall(r'(\d+)\s*pcs?\s*[-–]\s*\$([\d,]+\.?\d*)\s*(?:\(\$([\d.]+)/pc\))?', page_text, re.IGNORECASE)
-    if all_tiers:
-        tiers = {}
-        for qty, total, per_pc in all_tiers:
-            tiers[f"{qty}pc"] = {
-                "total": float(total.replace(",", "")),
-                "per_pc": float(per_pc) if per_pc else None
-            }
-        prices['all_tiers'] = tiers
-    
-    # Fallback: search for any dollar amount pattern in common price containers
-    if 'live_price_1pc' not in prices:
-        # Try meta tags or structured data
-        for meta in soup.find_all("meta", {"property": "product:price:amount"}):
-            try:
-                prices['live_price_1pc'] = float(meta.get("content", "0"))
-                break
-            except ValueError:
-                pass
-    
-    if 'live_price_1pc' not in prices:
-        # Try finding price in specific CSS classes common to e-commerce
-        for cls in ['price', 'product-price', 'current-price', 'sale-price']:
-            el = soup.find(class_=re.compile(cls, re.I))
-            if el:
-                m = re.search(r'\$(\d+\.?\d*)', el.get_text())
-                if m:
-                    prices['live_price_1pc'] = float(m.group(1))
-                    break
-    
+    if page.text_tiers:
+        prices['all_tiers'] = {
+            f"{tier.qty}pc": {"total": tier.total, "per_pc": tier.per_piece}
+            for tier in page.text_tiers
+        }
+
     # Also extract the SKU/product name from the page for verification
-    title_tag = soup.find("title")
-    if title_tag:
-        prices['page_title'] = title_tag.get_text(strip=True)[:100]
-    
+    if page.title:
+        prices['page_title'] = page.title[:100]
+
     # Extract stock status if visible
-    stock_text = page_text.lower()
-    if 'out of stock' in stock_text:
-        prices['live_stock'] = 'Out of Stock'
-    elif 'in stock' in stock_text:
-        prices['live_stock'] = 'In Stock'
-    elif 'back order' in stock_text or 'backorder' in stock_text:
-        prices['live_stock'] = 'Back Order'
-    
+    if page.stock_status:
+        prices['live_stock'] = page.stock_status
+
     return prices
 
 
 # ─── Main Audit Loop ─────────────────────────────────────────────────
 def main():
+    parser = argparse.ArgumentParser(description="Audit stored prices against live bestbottles.com")
+    add_cache_args(parser)
+    add_html_parser_arg(parser, default="bs4")
+    add_catalog_args(parser)
+    args = parser.parse_args()
+    get_client(HEADERS).cache = cache_from_args(args)
+
     print("=" * 64)
     print("  GLOBAL PRICING AUDIT — Best Bottles Catalog")
     print(f"  Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 64)
     
-    with open(DATA_FILE) as f:
-        products = json.load(f)
+    products = load_products(args.source, max_age=args.snapshot_max_age, refresh=args.refresh_snapshot)
     
     total = len(products)
     with_url = [p for p in products if p.get("productUrl")]
@@ -185,8 +163,9 @@ def main():
         sys.stdout.write(f"\r  [{idx+1:4d}/{len(with_url)}] {pct:5.1f}%  {sku:35s}")
         sys.stdout.flush()
         
-        # Scrape
-        scraped = scrape_prices(url)
+        # Scrape (no politeness delay needed when the page comes from the cache)
+        delay = 0 if get_client(HEADERS).has_fresh(url) else REQUEST_DELAY
+        scraped = scrape_prices(url, args.html_parser)
         stats["total_checked"] += 1
         
         if not scraped or "error" in scraped:
@@ -201,7 +180,7 @@ def main():
                 "stored_12pc": stored_12pc,
             })
             stats["errors"] += 1
-            time.sleep(REQUEST_DELAY)
+            time.sleep(delay)
             continue
         
         live_1pc = scraped.get("live_price_1pc")
@@ -218,7 +197,7 @@ def main():
                 "scraped_raw": scraped,
             })
             stats["no_price_found"] += 1
-            time.sleep(REQUEST_DELAY)
+            time.sleep(delay)
             continue
         
         # Compare prices
@@ -272,7 +251,7 @@ def main():
             "all_tiers": scraped.get("all_tiers"),
         })
         
-        time.sleep(REQUEST_DELAY)
+        time.sleep(delay)
     
     # ─── Generate Reports ─────────────────────────────────────────────
     print("\n\n" + "=" * 64)
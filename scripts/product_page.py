@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""One-pass parser for bestbottles.com product pages.
+
+``parse_product_page`` turns a fetched page into a typed ``ProductPage``
+record: spec block, every price tier (text and table), JSON-LD offers, meta
+prices, stock status, title and the website SKU with its source. The spec
+scrape (scrape_live_catalog.py), both price audits (convex_price_audit.py,
+pricing_audit.py) and the crosscheck (scrape_crosscheck.py) read their fields
+from this record instead of each running their own parse. With a shared
+``--cache-dir`` one crawl then serves all of them.
+
+The structural pass is event-driven (lxml parser target when available,
+otherwise html.parser), so no DOM is built. ``html_parser`` only picks how
+the page *text* used for spec/price regexes is produced; see html_text.py.
+With the stream / lxml backends that text comes out of the structural pass
+itself; with regex / bs4 the title is read with html_title() and the
+structural pass is deferred until a structural field (table_tiers, JSON-LD,
+meta / class prices) is first read.
+
+Regression examples: ``python3 -m doctest scripts/product_page.py``
+
+Usage:
+    page = fetch_product_page(url, get_client(HEADERS))
+    page.specs["capacity"], page.web_price_1pc, page.table_tiers, page.stock_status
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from html.parser import HTMLParser
+from typing import Any
+
+from html_text import SKIP_TAGS, WHITESPACE_RE, _lxml_etree, html_title, html_to_text, resolve_backend
+from spec_extract import extract_specs
+
+
+VOID_TAGS = frozenset(
+    {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+)
+PRICE_CLASS_RE = re.compile(r"price", re.I)
+DOLLAR_RE = re.compile(r"\$(\d+\.?\d*)")
+DOLLAR_CENTS_RE = re.compile(r"\$([\d]+\.[\d]{2})")
+TIER_QTY_RE = re.compile(r"(\d+)")
+TEXT_TIER_RE = re.compile(
+    r"(\d+)\s*pcs?\s*[-–]\s*\$([\d,]+\.?\d*)\s*(?:\(\$([\d.]+)\s*/?\s*pc\))?", re.I
+)
+LABELED_PRICE_RE = re.compile(r"Price:\s*\$(\d+\.?\d*)", re.I)
+WEB_PRICE_RES = {
+    "webPrice1pc": re.compile(r"1\s*pcs?\s*[-–]\s*\$([0-9.]+)\s*/\s*pc", re.I),
+    "webPrice10pc": re.compile(r"10\s*pcs?\s*[-–]\s*\$([0-9.]+)\s*/\s*pc", re.I),
+    "webPrice12pc": re.compile(r"12\s*pcs?\s*[-–]\s*\$([0-9.]+)\s*/\s*pc", re.I),
+}
+ITEM_NAME_SKU_RE = re.compile(r"Item Name:\s*([A-Za-z0-9._-]+)", re.I)
+IMAGE_SKU_RE = re.compile(
+    r"""src=["'][^"']*(?:enlarged_pics|store/capped)/([^"'/]+\.(?:jpg|jpeg|png|webp))["']""",
+    re.I,
+)
+
+
+@dataclass
+class PriceTier:
+    qty: int
+    total: float | None
+    per_piece: float | None
+
+
+@dataclass
+class PageStructure:
+    """The fields that need the page's tag structure (one event-driven pass)."""
+
+    # qty -> price from <tr> rows whose first cell has a number and last cell a $x.xx
+    table_tiers: dict[str, float] = field(default_factory=dict)
+    json_ld_offers: list[dict[str, Any]] = field(default_factory=list)
+    meta_price: float | None = None  # <meta itemprop="price">
+    og_price: float | None = None  # <meta property="product:price:amount">
+    class_price: float | None = None  # first $X inside an element with a *price* class
+
+    @classmethod
+    def from_collector(cls, collector: _PageCollector) -> PageStructure:
+        table_tiers: dict[str, float] = {}
+        for cells in collector.rows:
+            if len(cells) < 2:
+                continue
+            qty_m = TIER_QTY_RE.search(cells[0])
+            price_m = DOLLAR_CENTS_RE.search(cells[-1])
+            if qty_m and price_m:
+                table_tiers[str(int(qty_m.group(1)))] = float(price_m.group(1))
+        return cls(
+            table_tiers=table_tiers,
+            json_ld_offers=_json_ld_offers(collector.json_ld_blocks),
+            meta_price=collector.meta_price,
+            og_price=collector.og_price,
+            class_price=collector.class_price,
+        )
+
+
+@dataclass
+class ProductPage:
+    url: str
+    status_code: int = 200
+    error: str | None = None
+    title: str | None = None
+    specs: dict[str, str] = field(default_factory=dict)
+    # "N pcs - $X / pc" per-piece prices, keyed webPrice1pc / webPrice10pc / webPrice12pc
+    web_prices: dict[str, float] = field(default_factory=dict)
+    # every "N pcs - $T ($X/pc)" match in the page text, in page order
+    text_tiers: list[PriceTier] = field(default_factory=list)
+    labeled_price: float | None = None  # "Price: $X"
+    lowest_dollar_amount: float | None = None  # min $x.xx anywhere in the raw HTML (0.01–200)
+    stock_status: str | None = None  # "Out of Stock" | "Back Order" | "In Stock" | None
+    website_sku: str | None = None
+    website_sku_source: str | None = None
+    text: str = field(default="", repr=False)
+    # Source of the structural fields below; parsed on first access unless given
+    html: str = field(default="", repr=False)
+    use_lxml: bool = field(default=False, repr=False)
+    structure: PageStructure | None = field(default=None, repr=False)
+
+    def _structure(self) -> PageStructure:
+        if self.structure is None:
+            self.structure = PageStructure.from_collector(_collect(self.html, self.use_lxml))
+            self.html = ""
+        return self.structure
+
+    @property
+    def table_tiers(self) -> dict[str, float]:
+        return self._structure().table_tiers
+
+    @property
+    def json_ld_offers(self) -> list[dict[str, Any]]:
+        return self._structure().json_ld_offers
+
+    @property
+    def meta_price(self) -> float | None:
+        return self._structure().meta_price
+
+    @property
+    def og_price(self) -> float | None:
+        return self._structure().og_price
+
+    @property
+    def class_price(self) -> float | None:
+        return self._structure().class_price
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status_code == 200
+
+    @property
+    def web_price_1pc(self) -> float | None:
+        return self.web_prices.get("webPrice1pc")
+
+    @property
+    def web_price_10pc(self) -> float | None:
+        return self.web_prices.get("webPrice10pc")
+
+    @property
+    def web_price_12pc(self) -> float | None:
+        return self.web_prices.get("webPrice12pc")
+
+    def json_ld_price(self) -> float | None:
+        """Price of the first JSON-LD offer that has one (price, then lowPrice)."""
+        for offer in self.json_ld_offers:
+            value = offer.get("price") or offer.get("lowPrice")
+            if value:
+                try:
+                    return float(value)
+                except (TypeError, ValueError):
+                    continue
+        return None
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        for name in ("text", "html", "use_lxml", "structure"):
+            data.pop(name)
+        data.update(asdict(self._structure()))
+        return data
+
+
+# ── Extraction helpers (shared by every consumer) ──────────────────────────────
+
+
+def extract_prices(page_text: str) -> dict[str, Any]:
+    out: dict[str, Any] = {}
+    for key, pattern in WEB_PRICE_RES.items():
+        match = pattern.search(page_text)
+        if match:
+            out[key] = float(match.group(1))
+    return out
+
+
+def extract_website_sku(html: str, page_text: str, url: str) -> tuple[str | None, str | None]:
+    # Most reliable source on these pages is still "Item Name: SKU"
+    sku_match = ITEM_NAME_SKU_RE.search(page_text)
+    if sku_match:
+        return sku_match.group(1).strip(), "item_name_label"
+
+    image_match = IMAGE_SKU_RE.search(html)
+    if image_match:
+        return image_match.group(1).rsplit(".", 1)[0].strip(), "image_filename"
+
+    url_tail = url.rstrip("/").split("/")[-1]
+    if url_tail:
+        cleaned = re.sub(r"[^A-Za-z0-9._-]", "", url_tail) or None
+        if cleaned:
+            return cleaned, "url_tail"
+        return None, None
+    return None, None
+
+
+def extract_text_tiers(page_text: str) -> list[PriceTier]:
+    """Every "N pcs - $T ($X/pc)" tier; the per-piece part may be spaced or lack the slash.
+
+    >>> extract_text_tiers("12 pcs - $9.00 ($0.75 / pc) 1 pc - $0.80 ($0.80pc)")
+    [PriceTier(qty=12, total=9.0, per_piece=0.75), PriceTier(qty=1, total=0.8, per_piece=0.8)]
+    """
+    tiers = []
+    for qty, total, per_pc in TEXT_TIER_RE.findall(page_text):
+        tiers.append(
+            PriceTier(
+                qty=int(qty),
+                total=float(total.replace(",", "")),
+                per_piece=float(per_pc) if per_pc else None,
+            )
+        )
+    return tiers
+
+
+def detect_stock_status(page_text: str) -> str | None:
+    lowered = page_text.lower()
+    if "out of stock" in lowered:
+        return "Out of Stock"
+    if "back order" in lowered or "backorder" in lowered:
+        return "Back Order"
+    if "in stock" in lowered:
+        return "In Stock"
+    return None
+
+
+def _float_or_none(value: Any) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _json_ld_offers(blocks: list[str]) -> list[dict[str, Any]]:
+    offers: list[dict[str, Any]] = []
+    for block in blocks:
+        try:
+            ld = json.loads(block)
+        except ValueError:
+            continue
+        for item in ld if isinstance(ld, list) else [ld]:
+            if not isinstance(item, dict):
+                continue
+            found = item.get("offers") or item.get("Offers")
+            if isinstance(found, dict):
+                offers.append(found)
+            elif isinstance(found, list):
+                offers.extend(offer for offer in found if isinstance(offer, dict))
+    return offers
+
+
+# ── Structural pass ───────────────────────────────────────────────────────────
+
+
+class _PageCollector:
+    """Receives start/end/data events and collects everything ProductPage needs."""
+
+    def __init__(self) -> None:
+        self.text_parts: list[str] = []
+        self.title_parts: list[str] | None = None
+        self.title: str | None = None
+        self.rows: list[list[str]] = []
+        self.json_ld_blocks: list[str] = []
+        self.meta_price: float | None = None
+        self.og_price: float | None = None
+        self.class_price: float | None = None
+        self._skip_depth = 0
+        self._json_ld_parts: list[str] | None = None
+        self._row: list[str] | None = None
+        self._cell: list[str] | None = None
+        self._price_captures: list[list[Any]] = []  # [tag, depth, parts]
+
+    # table helpers
+    def _close_cell(self) -> None:
+        if self._cell is not None and self._row is not None:
+            self._row.append("".join(part.strip() for part in self._cell))
+        self._cell = None
+
+    def _close_row(self) -> None:
+        self._close_cell()
+        if self._row is not None:
+            self.rows.append(self._row)
+        self._row = None
+
+    def start(self, tag: str, attrs: dict[str, str | None]) -> None:
+        self.text_parts.append(" ")
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+            if tag == "script" and (attrs.get("type") or "").lower() == "application/ld+json":
+                self._json_ld_parts = []
+        elif tag == "title" and self.title is None:
+            self.title_parts = []
+        elif tag == "tr":
+            self._close_row()
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._close_cell()
+            self._cell = []
+        elif tag == "meta":
+            if self.meta_price is None and attrs.get("itemprop") == "price":
+                self.meta_price = _float_or_none(attrs.get("content", ""))
+            if self.og_price is None and attrs.get("property") == "product:price:amount":
+                self.og_price = _float_or_none(attrs.get("content", "0"))
+
+        if self.class_price is None and tag not in VOID_TAGS:
+            for capture in self._price_captures:
+                if capture[0] == tag:
+                    capture[1] += 1
+            if PRICE_CLASS_RE.search(attrs.get("class") or ""):
+                self._price_captures.append([tag, 1, []])
+
+    def end(self, tag: str) -> None:
+        self.text_parts.append(" ")
+        if tag in SKIP_TAGS:
+            if self._skip_depth:
+                self._skip_depth -= 1
+            if tag == "script" and self._json_ld_parts is not None:
+                self.json_ld_blocks.append("".join(self._json_ld_parts))
+                self._json_ld_parts = None
+        elif tag == "title" and self.title_parts is not None:
+            self.title = "".join(self.title_parts).strip()
+            self.title_parts = None
+        elif tag in ("td", "th"):
+            self._close_cell()
+        elif tag in ("tr", "table"):
+            self._close_row()
+
+        if self._price_captures:
+            still_open = []
+            for capture in self._price_captures:
+                if capture[0] == tag:
+                    capture[1] -= 1
+                    if capture[1] == 0:
+                        match = DOLLAR_RE.search("".join(capture[2]))
+                        if match and self.class_price is None:
+                            self.class_price = float(match.group(1))
+                        continue
+                still_open.append(capture)
+            self._price_captures = still_open if self.class_price is None else []
+
+    def data(self, data: str) -> None:
+        if self._json_ld_parts is not None:
+            self._json_ld_parts.append(data)
+        if self._skip_depth:
+            return
+        self.text_parts.append(data)
+        if self.title_parts is not None:
+            self.title_parts.append(data)
+        if self._cell is not None:
+            self._cell.append(data)
+        for capture in self._price_captures:
+            capture[2].append(data)
+
+    def close(self) -> "_PageCollector":
+        self._close_row()
+        return self
+
+    @property
+    def text(self) -> str:
+        return WHITESPACE_RE.sub(" ", "".join(self.text_parts)).strip()
+
+
+class _HTMLParserDriver(HTMLParser):
+    def __init__(self, collector: _PageCollector) -> None:
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        self.collector.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag: str, attrs) -> None:
+        self.collector.start(tag, dict(attrs))
+        if tag not in VOID_TAGS:
+            self.collector.end(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag not in VOID_TAGS:
+            self.collector.end(tag)
+
+    def handle_data(self, data: str) -> None:
+        self.collector.data(data)
+
+
+class _LxmlDriver:
+    """lxml parser target; lxml balances tags itself, so void elements still get end()."""
+
+    def __init__(self, collector: _PageCollector) -> None:
+        self.collector = collector
+
+    def start(self, tag, attrib) -> None:
+        if isinstance(tag, str):
+            self.collector.start(tag, dict(attrib))
+
+    def end(self, tag) -> None:
+        if isinstance(tag, str) and tag not in VOID_TAGS:
+            self.collector.end(tag)
+
+    def data(self, data: str) -> None:
+        self.collector.data(data)
+
+    def comment(self, text: str) -> None:
+        pass
+
+    def close(self) -> _PageCollector:
+        return self.collector.close()
+
+
+def _collect(html: str, use_lxml: bool) -> _PageCollector:
+    collector = _PageCollector()
+    if use_lxml and html.strip():
+        parser = _lxml_etree.HTMLParser(target=_LxmlDriver(collector), remove_comments=True)
+        parser.feed(html)
+        return parser.close()
+    driver = _HTMLParserDriver(collector)
+    driver.feed(html)
+    driver.close()
+    return collector.close()
+
+
+def parse_product_page(url: str, html: str, status_code: int = 200, html_parser: str = "auto") -> ProductPage:
+    """Parse a fetched product page into a ProductPage.
+
+    For the stream / lxml backends the page text and the structural fields
+    come from one event pass. regex / bs4 keep their historical text for
+    callers whose outputs depend on it; their title comes from html_title()
+    and the structural pass only runs if a structural field (table_tiers,
+    JSON-LD, meta / class prices) is read.
+    """
+    backend = resolve_backend(html_parser)
+    use_lxml = backend == "lxml" and _lxml_etree is not None
+    structure = None
+    if backend in ("stream", "lxml"):
+        collector = _collect(html, use_lxml)
+        structure = PageStructure.from_collector(collector)
+        text = collector.text
+        title = collector.title
+    else:
+        text = html_to_text(html, backend)
+        title = html_title(html)
+
+    sku, sku_source = extract_website_sku(html, text, url)
+    dollar_amounts = [float(m) for m in DOLLAR_CENTS_RE.findall(html) if 0.01 < float(m) < 200]
+    labeled = LABELED_PRICE_RE.search(text)
+
+    return ProductPage(
+        url=url,
+        status_code=status_code,
+        title=title,
+        specs=extract_specs(text),
+        web_prices=extract_prices(text),
+        text_tiers=extract_text_tiers(text),
+        labeled_price=float(labeled.group(1)) if labeled else None,
+        lowest_dollar_amount=min(dollar_amounts) if dollar_amounts else None,
+        stock_status=detect_stock_status(text),
+        website_sku=sku,
+        website_sku_source=sku_source,
+        text=text,
+        html=html if structure is None else "",
+        use_lxml=use_lxml,
+        structure=structure,
+    )
+
+
+def parse_fetched_page(url: str, page, html_parser: str = "auto") -> ProductPage:
+    """ProductPage for a fetch_client.Page (sync or async fetch); non-200 pages land on ``.error``."""
+    if page.status_code != 200:
+        return ProductPage(url=url, status_code=page.status_code, error=f"HTTP {page.status_code}")
+    return parse_product_page(url, page.text, html_parser=html_parser)
+
+
+def fetch_product_page(url: str, client, timeout: float = 15, html_parser: str = "auto") -> ProductPage:
+    """Fetch ``url`` once through a fetch_client.FetchClient and parse it; errors land on ``.error``."""
+    try:
+        page = client.get_page(url, timeout=timeout)
+    except Exception as exc:  # noqa: BLE001
+        return ProductPage(url=url, status_code=0, error=str(exc))
+    return parse_fetched_page(url, page, html_parser=html_parser)
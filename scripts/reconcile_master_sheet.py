@@ -1,10 +1,10 @@
 import pandas as pd
-import json
+
+from catalog_loader import load_products
 
 def main():
     # 1. Load existing database
-    with open('data/grace_products_clean.json') as f:
-        existing_data = json.load(f)
+    existing_data = load_products("local", verbose=False)
     
     # Create mapping of Grace SKU and Website SKU to their records (and URLs)
     existing_by_grace = {p.get('graceSku'): p for p in existing_data if p.get('graceSku')}
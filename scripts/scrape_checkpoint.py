@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""Checkpoint formats for live scrape output (scrape_live_catalog.py).
+
+Two formats share one interface:
+
+  json   live_scrape_raw.json — the whole payload (every product and error)
+         is rewritten on each checkpoint. Simple, but O(n) per save.
+  jsonl  live_scrape_raw.jsonl — append-only log, one {"kind", "record"}
+         line per scraped product or error, plus a small
+         live_scrape_raw.summary.json sidecar (fetch mode, counts, status).
+         Each checkpoint costs O(1) and records are never held in memory.
+
+``open_scrape_output`` reads either format, so
+downstream scripts (merge_scrape_batches.py, normalize_scrape.py) can take
+a .json or .jsonl path directly.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+
+RAW_JSON_NAME = "live_scrape_raw.json"
+RAW_JSONL_NAME = "live_scrape_raw.jsonl"
+
+
+def build_payload(
+    *,
+    fetch_mode: str,
+    requested_families: list[str],
+    transport_counts: dict[str, int],
+    scraped: list[dict[str, Any]],
+    errors: list[dict[str, Any]],
+    processed_count: int,
+    total_url_count: int,
+    status: str,
+) -> dict[str, Any]:
+    return {
+        "generatedAt": datetime.now().isoformat(),
+        "source": "bestbottles.com sitemap + product pages",
+        "fetchMode": fetch_mode,
+        "families": requested_families,
+        "transportCounts": transport_counts,
+        "count": len(scraped),
+        "errorCount": len(errors),
+        "processedCount": processed_count,
+        "remainingCount": max(total_url_count - processed_count, 0),
+        "totalUrlCount": total_url_count,
+        "status": status,
+        "completed": status == "completed",
+        "products": scraped,
+        "errors": errors,
+    }
+
+
+def save_payload(output_path: Path, payload: dict[str, Any]) -> None:
+    temp_path = output_path.with_suffix(f"{output_path.suffix}.tmp")
+    temp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    temp_path.replace(output_path)
+
+
+def load_payload(output_path: Path) -> dict[str, Any] | None:
+    if not output_path.exists():
+        return None
+    return json.loads(output_path.read_text(encoding="utf-8"))
+
+
+def summary_path_for(log_path: Path) -> Path:
+    return log_path.with_name(f"{log_path.stem}.summary.json")
+
+
+def iter_jsonl_log(log_path: Path) -> Iterator[tuple[str, dict[str, Any]]]:
+    """Stream (kind, record) pairs from a JSONL log, ignoring a torn final line."""
+    with log_path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            if not line.endswith("\n"):
+                break  # partial write from an interrupted run
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            yield item["kind"], item["record"]
+
+
+def open_scrape_output(path: Path) -> tuple[dict[str, Any], Iterator[tuple[str, dict[str, Any]]]]:
+    """Return (header, records) for a .json payload or a .jsonl log.
+
+    ``header`` is the run metadata (fetchMode, families, transportCounts,
+    status, ...) and ``records`` yields ("product" | "error", record). A .jsonl
+    log is streamed; a .json payload is parsed once.
+    """
+    if path.suffix == ".jsonl":
+        summary_path = summary_path_for(path)
+        header = json.loads(summary_path.read_text(encoding="utf-8")) if summary_path.exists() else {}
+        return header, iter_jsonl_log(path)
+
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    products = payload.pop("products", [])
+    errors = payload.pop("errors", [])
+    records = [("product", product) for product in products] + [("error", error) for error in errors]
+    return payload, iter(records)
+
+
+class ScrapeCheckpoint(ABC):
+    """Tracks scrape progress and persists it; subclasses decide the on-disk format."""
+
+    path: Path
+
+    def __init__(self, *, fetch_mode: str, requested_families: list[str], total_url_count: int) -> None:
+        self.fetch_mode = fetch_mode
+        self.requested_families = requested_families
+        self.total_url_count = total_url_count
+        self.transport_counts = {"browserless": 0, "direct": 0}
+        self.processed_urls: set[str] = set()
+        self.processed_count = 0
+        self.scraped_count = 0
+        self.error_count = 0
+
+    def _check_resume_header(self, header: dict[str, Any]) -> None:
+        existing_total = header.get("totalUrlCount")
+        if existing_total not in (None, self.total_url_count):
+            raise RuntimeError(
+                f"Checkpoint totalUrlCount={existing_total} does not match current URL count={self.total_url_count}"
+            )
+        existing_fetch_mode = header.get("fetchMode")
+        if existing_fetch_mode and existing_fetch_mode != self.fetch_mode:
+            raise RuntimeError(
+                f"Checkpoint fetchMode={existing_fetch_mode} does not match requested fetchMode={self.fetch_mode}"
+            )
+
+    @abstractmethod
+    def resume(self) -> bool:
+        """Load an existing checkpoint; returns False when there is none."""
+
+    def record(self, entry: dict[str, Any] | None, error: dict[str, Any] | None, transport: str | None) -> None:
+        if entry is not None:
+            self.transport_counts[transport] = self.transport_counts.get(transport, 0) + 1
+            self.scraped_count += 1
+        else:
+            self.error_count += 1
+        self.processed_count += 1
+
+    @abstractmethod
+    def save(self, status: str) -> None:
+        """Persist progress so far, with the run's status ("in_progress", "interrupted" or "completed")."""
+
+    def close(self) -> None:
+        pass
+
+
+class JsonCheckpoint(ScrapeCheckpoint):
+    """Whole-payload live_scrape_raw.json, rewritten on every save."""
+
+    def __init__(self, output_dir: Path, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = output_dir / RAW_JSON_NAME
+        self.scraped: list[dict[str, Any]] = []
+        self.errors: list[dict[str, Any]] = []
+
+    def resume(self) -> bool:
+        existing_payload = load_payload(self.path)
+        if existing_payload is None:
+            return False
+        self._check_resume_header(existing_payload)
+
+        self.scraped = list(existing_payload.get("products", []))
+        self.errors = list(existing_payload.get("errors", []))
+        existing_transport_counts = existing_payload.get("transportCounts", {})
+        self.transport_counts = {
+            "browserless": int(existing_transport_counts.get("browserless", 0)),
+            "direct": int(existing_transport_counts.get("direct", 0)),
+        }
+        self.processed_urls = {
+            item.get("productUrl")
+            for item in self.scraped + self.errors
+            if isinstance(item, dict) and item.get("productUrl")
+        }
+        self.processed_count = len(self.processed_urls)
+        self.scraped_count = len(self.scraped)
+        self.error_count = len(self.errors)
+        return True
+
+    def record(self, entry: dict[str, Any] | None, error: dict[str, Any] | None, transport: str | None) -> None:
+        super().record(entry, error, transport)
+        if entry is not None:
+            self.scraped.append(entry)
+        else:
+            self.errors.append(error)
+
+    def save(self, status: str) -> None:
+        save_payload(
+            self.path,
+            build_payload(
+                fetch_mode=self.fetch_mode,
+                requested_families=self.requested_families,
+                transport_counts=self.transport_counts,
+                scraped=self.scraped,
+                errors=self.errors,
+                processed_count=self.processed_count,
+                total_url_count=self.total_url_count,
+                status=status,
+            ),
+        )
+
+
+class JsonlCheckpoint(ScrapeCheckpoint):
+    """Append-only live_scrape_raw.jsonl with a live_scrape_raw.summary.json sidecar."""
+
+    def __init__(self, output_dir: Path, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = output_dir / RAW_JSONL_NAME
+        self.summary_path = summary_path_for(self.path)
+        self._handle = None
+        self._append = False  # a fresh run truncates any old log on first write
+
+    def resume(self) -> bool:
+        if not self.path.exists():
+            return False
+        if self.summary_path.exists():
+            self._check_resume_header(json.loads(self.summary_path.read_text(encoding="utf-8")))
+
+        # Counts are rebuilt from the log itself, so a crash between an append
+        # and the next summary write loses nothing.
+        for kind, record in iter_jsonl_log(self.path):
+            url = record.get("productUrl")
+            if not url or url in self.processed_urls:
+                continue
+            self.processed_urls.add(url)
+            if kind == "product":
+                self.scraped_count += 1
+                transport = record.get("fetchTransport")
+                if transport:
+                    self.transport_counts[transport] = self.transport_counts.get(transport, 0) + 1
+            else:
+                self.error_count += 1
+        self.processed_count = len(self.processed_urls)
+        self._drop_torn_tail()
+        self._append = True
+        return True
+
+    def _drop_torn_tail(self) -> None:
+        """Truncate a partial last line so the next append starts on a fresh line."""
+        with self.path.open("rb+") as handle:
+            handle.seek(0, os.SEEK_END)
+            size = handle.tell()
+            if size == 0:
+                return
+            handle.seek(size - 1)
+            if handle.read(1) == b"\n":
+                return
+            # Walk back to the previous newline in small blocks.
+            pos = size
+            while pos > 0:
+                step = min(4096, pos)
+                pos -= step
+                handle.seek(pos)
+                block = handle.read(step)
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    handle.truncate(pos + newline + 1)
+                    return
+            handle.truncate(0)
+
+    def record(self, entry: dict[str, Any] | None, error: dict[str, Any] | None, transport: str | None) -> None:
+        super().record(entry, error, transport)
+        kind, record = ("product", entry) if entry is not None else ("error", error)
+        self._log().write(json.dumps({"kind": kind, "record": record}) + "\n")
+
+    def _log(self):
+        if self._handle is None:
+            self._handle = self.path.open("a" if self._append else "w", encoding="utf-8")
+            self._append = True
+        return self._handle
+
+    def save(self, status: str) -> None:
+        handle = self._log()
+        handle.flush()
+        os.fsync(handle.fileno())
+        summary = {
+            "generatedAt": datetime.now().isoformat(),
+            "source": "bestbottles.com sitemap + product pages",
+            "format": "jsonl",
+            "log": self.path.name,
+            "fetchMode": self.fetch_mode,
+            "families": self.requested_families,
+            "transportCounts": self.transport_counts,
+            "count": self.scraped_count,
+            "errorCount": self.error_count,
+            "processedCount": self.processed_count,
+            "remainingCount": max(self.total_url_count - self.processed_count, 0),
+            "totalUrlCount": self.total_url_count,
+            "status": status,
+            "completed": status == "completed",
+        }
+        save_payload(self.summary_path, summary)
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
@@ -28,15 +28,20 @@ import sys
 from pathlib import Path
 
 try:
+    import bs4  # noqa: F401  (the default --html-parser)
     import requests
-    from bs4 import BeautifulSoup
 except ImportError:
     print("❌ Run with: /tmp/bbvenv/bin/python3 scripts/scrape_crosscheck.py")
     sys.exit(1)
 
+from catalog_loader import load_products
+from fetch_client import get_client
+from html_text import add_html_parser_arg
+from page_cache import add_cache_args, cache_from_args
+from product_page import parse_product_page
+
 # ── Config ────────────────────────────────────────────────────────────────────
 ROOT = Path(__file__).parent.parent
-DATA_FILE = ROOT / "data" / "grace_products_clean.json"
 REPORT_FILE = ROOT / "docs" / "crosscheck_report.json"
 DELAY_SECONDS = 1.2  # polite delay between requests
 
@@ -47,84 +52,25 @@ HEADERS = {
     "Accept-Language": "en-US,en;q=0.9",
 }
 
-# All known spec labels on the website (order matters for regex stop-pattern)
-SPEC_LABELS = [
-    "Item Type",
-    "Item Name",
-    "Item Description",
-    "Item Capacity",
-    "Item Height with Cap",
-    "Item Height without Cap",
-    "Item Diameter",
-    "Item Width",
-    "Item Depth",
-    "Neck Thread Size",
-    "Closure Type",
-]
-
-# Build the alternation stop pattern once
-STOP_PATTERN = "|".join(re.escape(l) for l in SPEC_LABELS)
-
-# Mapping from website label → our Convex field name
-LABEL_TO_FIELD = {
-    "Item Capacity":            "capacity",
-    "Item Height with Cap":     "heightWithCap",
-    "Item Height without Cap":  "heightWithoutCap",
-    "Item Diameter":            "diameter",
-    "Item Width":               "width",
-    "Item Depth":               "depth",
-    "Neck Thread Size":         "neckThreadSize",
-    "Closure Type":             "closureType",
-    "Item Type":                "itemType",
-    "Item Name":                "itemName",
-    "Item Description":         "itemDescription",
-}
-
 
-def extract_specs(full_text: str) -> dict:
-    """Extract all spec fields from raw page text using regex."""
-    data = {}
-    for label in SPEC_LABELS:
-        pattern = (
-            rf'{re.escape(label)}:\s*'
-            rf'(.+?)'
-            rf'(?=(?:{STOP_PATTERN})\:|1\s*pcs?\s*[-–]|\Z)'
-        )
-        m = re.search(pattern, full_text, re.IGNORECASE | re.DOTALL)
-        if m:
-            value = re.sub(r'\s+', ' ', m.group(1)).strip()
-            # Strip trailing "Purchase:" or copyright noise
-            value = re.sub(r'\s*Purchase:.*$', '', value, flags=re.IGNORECASE).strip()
-            value = re.sub(r'\s*Nemat International.*$', '', value, flags=re.IGNORECASE).strip()
-            field = LABEL_TO_FIELD.get(label, label.lower().replace(" ", "_"))
-            if value:
-                data[field] = value
-    return data
-
-
-def scrape_product_page(url: str) -> dict | None:
+def scrape_product_page(url: str, html_parser: str = "bs4") -> dict | None:
     """Scrape a single bestbottles.com product page and return extracted fields."""
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
+        resp = get_client(HEADERS).get_page(url, timeout=10)
         if resp.status_code == 404:
             return {"error": "404 — page not found"}
         if resp.status_code != 200:
             return {"error": f"HTTP {resp.status_code}"}
 
-        soup = BeautifulSoup(resp.text, "html.parser")
-        full_text = soup.get_text(" ")
-
+        page = parse_product_page(url, resp.text, html_parser=html_parser)
         data = {"url": url, "scraped_ok": True}
-        data.update(extract_specs(full_text))
+        data.update(page.specs)
 
         # ── Pricing ───────────────────────────────────────────────────────────
-        price_m = re.search(r'1\s*pcs?\s*[-–]\s*\$([0-9.]+)\s*/\s*pc', full_text, re.I)
-        if price_m:
-            data["webPrice1pc_scraped"] = float(price_m.group(1))
-
-        dozen_m = re.search(r'12\s*pcs?\s*[-–]\s*\$([0-9.]+)\s*/\s*pc', full_text, re.I)
-        if dozen_m:
-            data["webPrice12pc_scraped"] = float(dozen_m.group(1))
+        if page.web_price_1pc is not None:
+            data["webPrice1pc_scraped"] = page.web_price_1pc
+        if page.web_price_12pc is not None:
+            data["webPrice12pc_scraped"] = page.web_price_12pc
 
         return data
 
@@ -173,7 +119,7 @@ COMPARE_MAP = {
 }
 
 
-def run_crosscheck(products: list, limit: int | None = None) -> list:
+def run_crosscheck(products: list, limit: int | None = None, html_parser: str = "bs4") -> list:
     """Cross-check a list of products against the live website."""
     results = []
     total = min(len(products), limit) if limit else len(products)
@@ -191,8 +137,10 @@ def run_crosscheck(products: list, limit: int | None = None) -> list:
                              "status": "no_url", "fields": {}})
             continue
 
-        scraped = scrape_product_page(url)
-        time.sleep(DELAY_SECONDS)
+        cached = get_client(HEADERS).has_fresh(url)
+        scraped = scrape_product_page(url, html_parser)
+        if not cached:
+            time.sleep(DELAY_SECONDS)
 
         if not scraped or scraped.get("error"):
             err = scraped.get("error", "no response") if scraped else "no response"
@@ -302,15 +250,17 @@ def main():
     parser.add_argument("--family", help="Filter by family (e.g. 'Cap')")
     parser.add_argument("--limit", type=int, default=15)
     parser.add_argument("--all-caps", action="store_true")
+    add_cache_args(parser)
+    add_html_parser_arg(parser, default="bs4")
     args = parser.parse_args()
+    get_client(HEADERS).cache = cache_from_args(args)
 
     print("╔══════════════════════════════════════════════════════╗")
     print("║  Best Bottles — Website Cross-Check Scraper  v2     ║")
     print("║  Source of Truth: bestbottles.com                   ║")
     print("╚══════════════════════════════════════════════════════╝")
 
-    with open(DATA_FILE) as f:
-        all_products = json.load(f)
+    all_products = load_products("local", verbose=False)
 
     if args.all_caps:
         products = [p for p in all_products
@@ -325,7 +275,7 @@ def main():
                     and p.get("productUrl")]
         print(f"\n📦 {len(products)} cap products with URLs loaded")
 
-    results = run_crosscheck(products, limit=args.limit)
+    results = run_crosscheck(products, limit=args.limit, html_parser=args.html_parser)
     print_summary(results)
 
     report_path = ROOT / "docs" / f"crosscheck_report_{args.family.replace(' ', '_')}.json" if args.family else REPORT_FILE
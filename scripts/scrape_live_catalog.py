@@ -7,12 +7,19 @@ import argparse
 import json
 import os
 import re
+import threading
 import time
-import urllib.request
 import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
+
+from fetch_client import DEFAULT_POOL_MAXSIZE, FetchClient, get_client
+from html_text import add_html_parser_arg
+from page_cache import add_cache_args, cache_from_args
+from product_page import parse_product_page
+from scrape_checkpoint import JsonCheckpoint, JsonlCheckpoint
 
 
 ROOT = Path(__file__).resolve().parent.parent
@@ -23,34 +30,6 @@ USER_AGENT = (
     "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
 )
 
-SPEC_LABELS = [
-    "Item Type",
-    "Item Name",
-    "Item Description",
-    "Item Capacity",
-    "Item Height with Cap",
-    "Item Height without Cap",
-    "Item Diameter",
-    "Item Width",
-    "Item Depth",
-    "Neck Thread Size",
-    "Closure Type",
-]
-STOP_PATTERN = "|".join(re.escape(label) for label in SPEC_LABELS)
-LABEL_TO_FIELD = {
-    "Item Type": "itemType",
-    "Item Name": "itemName",
-    "Item Description": "itemDescription",
-    "Item Capacity": "capacity",
-    "Item Height with Cap": "heightWithCap",
-    "Item Height without Cap": "heightWithoutCap",
-    "Item Diameter": "diameter",
-    "Item Width": "width",
-    "Item Depth": "depth",
-    "Neck Thread Size": "neckThreadSize",
-    "Closure Type": "closureType",
-}
-
 
 def load_env_local() -> None:
     env_path = ROOT / ".env.local"
@@ -84,10 +63,12 @@ def load_cohort_urls(path: Path) -> list[str]:
     return payload.get("urls", [])
 
 
+def http_client(pool_maxsize: int = DEFAULT_POOL_MAXSIZE) -> FetchClient:
+    return get_client(headers={"User-Agent": USER_AGENT}, pool_maxsize=pool_maxsize)
+
+
 def fetch_text(url: str, timeout: int = 20) -> str:
-    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
-    with urllib.request.urlopen(req, timeout=timeout) as response:
-        return response.read().decode("utf-8", errors="replace")
+    return http_client().get_text(url, timeout=timeout)
 
 
 def fetch_via_browserless(url: str, timeout: int = 45) -> str:
@@ -95,20 +76,30 @@ def fetch_via_browserless(url: str, timeout: int = 45) -> str:
     if not token:
         raise RuntimeError("Missing BROWSERLESS_API_TOKEN")
 
+    # Rendered pages carry no origin validators, so cached copies are TTL-only.
+    cache = http_client().cache
+    entry = cache.lookup(url, variant="browserless") if cache else None
+    if cache and entry and cache.is_fresh(entry):
+        return cache.read_body(entry)
+
     base_url = os.environ.get("BROWSERLESS_BASE_URL", DEFAULT_BROWSERLESS_BASE_URL).rstrip("/")
     endpoint = f"{base_url}/content?token={token}"
-    payload = json.dumps({"url": url}).encode("utf-8")
-    req = urllib.request.Request(
-        endpoint,
-        data=payload,
-        headers={
-            "Content-Type": "application/json",
-            "User-Agent": USER_AGENT,
-        },
-        method="POST",
+    response = http_client().post(endpoint, json={"url": url}, timeout=timeout)
+    response.raise_for_status()
+    html = response.content.decode("utf-8", errors="replace")
+    if cache:
+        cache.store(url, html, variant="browserless")
+    return html
+
+
+def page_is_cached(url: str, fetch_mode: str) -> bool:
+    """True when the page for this fetch mode will be served from the page cache."""
+    client = http_client()
+    if fetch_mode == "direct":
+        return client.has_fresh(url)
+    return client.has_fresh(url, variant="browserless") or (
+        fetch_mode == "auto" and client.has_fresh(url)
     )
-    with urllib.request.urlopen(req, timeout=timeout) as response:
-        return response.read().decode("utf-8", errors="replace")
 
 
 def fetch_product_page(url: str, fetch_mode: str, timeout: int = 45) -> tuple[str, str]:
@@ -133,66 +124,88 @@ def parse_sitemap_urls(xml_text: str) -> list[str]:
     return urls
 
 
-def strip_html_to_text(html: str) -> str:
-    no_script = re.sub(r"<script.*?</script>", " ", html, flags=re.I | re.S)
-    no_style = re.sub(r"<style.*?</style>", " ", no_script, flags=re.I | re.S)
-    text = re.sub(r"<[^>]+>", " ", no_style)
-    return re.sub(r"\s+", " ", text).strip()
-
-
-def extract_specs(page_text: str) -> dict[str, Any]:
-    data: dict[str, Any] = {}
-    for label in SPEC_LABELS:
-        pattern = (
-            rf"{re.escape(label)}:\s*(.+?)(?=(?:{STOP_PATTERN})\:|1\s*pcs?\s*[-–]|\Z)"
-        )
-        match = re.search(pattern, page_text, flags=re.I | re.S)
-        if not match:
-            continue
-        value = re.sub(r"\s+", " ", match.group(1)).strip()
-        value = re.sub(r"\s*Purchase:.*$", "", value, flags=re.I).strip()
-        value = re.sub(r"\s*Nemat International.*$", "", value, flags=re.I).strip()
-        field = LABEL_TO_FIELD[label]
-        if value:
-            data[field] = value
-    return data
-
-
-def extract_prices(page_text: str) -> dict[str, Any]:
-    out: dict[str, Any] = {}
-    one_pc = re.search(r"1\s*pcs?\s*[-–]\s*\$([0-9.]+)\s*/\s*pc", page_text, re.I)
-    ten_pc = re.search(r"10\s*pcs?\s*[-–]\s*\$([0-9.]+)\s*/\s*pc", page_text, re.I)
-    twelve_pc = re.search(r"12\s*pcs?\s*[-–]\s*\$([0-9.]+)\s*/\s*pc", page_text, re.I)
-    if one_pc:
-        out["webPrice1pc"] = float(one_pc.group(1))
-    if ten_pc:
-        out["webPrice10pc"] = float(ten_pc.group(1))
-    if twelve_pc:
-        out["webPrice12pc"] = float(twelve_pc.group(1))
-    return out
-
-
-def extract_website_sku(html: str, page_text: str, url: str) -> tuple[str | None, str | None]:
-    # Most reliable source on these pages is still "Item Name: SKU"
-    sku_match = re.search(r"Item Name:\s*([A-Za-z0-9._-]+)", page_text, re.I)
-    if sku_match:
-        return sku_match.group(1).strip(), "item_name_label"
-
-    image_match = re.search(
-        r"""src=["'][^"']*(?:enlarged_pics|store/capped)/([^"'/]+\.(?:jpg|jpeg|png|webp))["']""",
-        html,
-        re.I,
-    )
-    if image_match:
-        return image_match.group(1).rsplit(".", 1)[0].strip(), "image_filename"
-
-    url_tail = url.rstrip("/").split("/")[-1]
-    if url_tail:
-        cleaned = re.sub(r"[^A-Za-z0-9._-]", "", url_tail) or None
-        if cleaned:
-            return cleaned, "url_tail"
-        return None, None
-    return None, None
+class TokenBucket:
+    """Thread-safe token bucket that caps the global request rate across workers."""
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+def scrape_one(
+    url: str, fetch_mode: str, html_parser: str = "regex"
+) -> tuple[dict[str, Any] | None, dict[str, Any] | None, str | None]:
+    """Fetch and parse a single product page; returns (entry, error, transport)."""
+    try:
+        html, transport = fetch_product_page(url, fetch_mode)
+        page = parse_product_page(url, html, html_parser=html_parser)
+        entry: dict[str, Any] = {"productUrl": url, "fetchTransport": transport}
+        entry.update(page.specs)
+        entry.update(page.web_prices)
+        if page.website_sku:
+            entry["websiteSku"] = page.website_sku
+            entry["websiteSkuSource"] = page.website_sku_source
+        return entry, None, transport
+    except Exception as exc:  # noqa: BLE001
+        return None, {"productUrl": url, "error": str(exc)}, None
+
+
+def iter_scrape_serial(
+    urls: list[str], fetch_mode: str, delay: float, html_parser: str = "regex"
+) -> Iterator[tuple[dict[str, Any] | None, dict[str, Any] | None, str | None]]:
+    for url in urls:
+        cached = page_is_cached(url, fetch_mode)
+        yield scrape_one(url, fetch_mode, html_parser)
+        if not cached:
+            time.sleep(delay)
+
+
+def iter_scrape_concurrent(
+    urls: list[str], fetch_mode: str, concurrency: int, rate: float, html_parser: str = "regex"
+) -> Iterator[tuple[dict[str, Any] | None, dict[str, Any] | None, str | None]]:
+    """Scrape with a worker pool; results are yielded in completion order, not URL order."""
+    bucket = TokenBucket(rate)
+
+    def task(url: str) -> tuple[dict[str, Any] | None, dict[str, Any] | None, str | None]:
+        if not page_is_cached(url, fetch_mode):
+            bucket.acquire()
+        return scrape_one(url, fetch_mode, html_parser)
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="scrape")
+    pending: set[Future] = set()
+    url_iter = iter(urls)
+    try:
+        # Keep a bounded window in flight so an interrupt does not strand thousands of queued tasks.
+        for url in url_iter:
+            pending.add(executor.submit(task, url))
+            if len(pending) >= concurrency * 2:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                next_url = next(url_iter, None)
+                if next_url is not None:
+                    pending.add(executor.submit(task, next_url))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 def get_default_audit_dir() -> Path:
@@ -200,53 +213,24 @@ def get_default_audit_dir() -> Path:
     return ROOT / "data" / "audits" / day
 
 
-def build_payload(
-    *,
-    fetch_mode: str,
-    requested_families: list[str],
-    transport_counts: dict[str, int],
-    scraped: list[dict[str, Any]],
-    errors: list[dict[str, Any]],
-    processed_count: int,
-    total_url_count: int,
-    status: str,
-) -> dict[str, Any]:
-    return {
-        "generatedAt": datetime.now().isoformat(),
-        "source": "bestbottles.com sitemap + product pages",
-        "fetchMode": fetch_mode,
-        "families": requested_families,
-        "transportCounts": transport_counts,
-        "count": len(scraped),
-        "errorCount": len(errors),
-        "processedCount": processed_count,
-        "remainingCount": max(total_url_count - processed_count, 0),
-        "totalUrlCount": total_url_count,
-        "status": status,
-        "completed": status == "completed",
-        "products": scraped,
-        "errors": errors,
-    }
-
-
-def save_payload(output_path: Path, payload: dict[str, Any]) -> None:
-    temp_path = output_path.with_suffix(f"{output_path.suffix}.tmp")
-    temp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
-    temp_path.replace(output_path)
-
-
-def load_payload(output_path: Path) -> dict[str, Any] | None:
-    if not output_path.exists():
-        return None
-    return json.loads(output_path.read_text(encoding="utf-8"))
-
-
 def main() -> None:
     load_env_local()
     parser = argparse.ArgumentParser()
     parser.add_argument("--output-dir", type=Path, default=get_default_audit_dir())
     parser.add_argument("--limit", type=int, default=0, help="Optional URL limit")
     parser.add_argument("--delay", type=float, default=0.8, help="Delay between requests")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of parallel fetch workers (1 = serial with --delay between requests)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0.0,
+        help="Global requests-per-second budget when --concurrency > 1 (default: 1 / --delay)",
+    )
     parser.add_argument(
         "--families",
         type=str,
@@ -268,12 +252,21 @@ def main() -> None:
     parser.add_argument(
         "--resume",
         action="store_true",
-        help="Resume from an existing live_scrape_raw.json checkpoint in the output directory",
+        help="Resume from an existing live_scrape_raw.json(l) checkpoint in the output directory",
+    )
+    parser.add_argument(
+        "--checkpoint-format",
+        choices=["json", "jsonl"],
+        default="json",
+        help="json rewrites live_scrape_raw.json on each checkpoint; jsonl appends to "
+        "live_scrape_raw.jsonl with a live_scrape_raw.summary.json sidecar",
     )
+    add_cache_args(parser)
+    add_html_parser_arg(parser, default="regex")
     args = parser.parse_args()
 
     args.output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = args.output_dir / "live_scrape_raw.json"
+    http_client(pool_maxsize=max(DEFAULT_POOL_MAXSIZE, args.concurrency)).cache = cache_from_args(args)
 
     if args.urls_file and args.urls_file.exists():
         urls = load_cohort_urls(args.urls_file)
@@ -291,142 +284,65 @@ def main() -> None:
         urls = urls[: args.limit]
     print(f"Will scrape {len(urls)} product URLs")
 
+    checkpoint_cls = JsonlCheckpoint if args.checkpoint_format == "jsonl" else JsonCheckpoint
+    checkpoint = checkpoint_cls(
+        args.output_dir,
+        fetch_mode=args.fetch_mode,
+        requested_families=requested_families,
+        total_url_count=len(urls),
+    )
+    output_path = checkpoint.path
     total_url_count = len(urls)
-    scraped: list[dict[str, Any]] = []
-    errors: list[dict[str, Any]] = []
-    transport_counts = {"browserless": 0, "direct": 0}
-    processed_count = 0
     urls_to_process = urls
 
     if args.resume:
-        existing_payload = load_payload(output_path)
-        if existing_payload is None:
+        if not checkpoint.resume():
             print(f"No checkpoint found at {output_path}; starting fresh.")
         else:
-            existing_total = existing_payload.get("totalUrlCount")
-            if existing_total not in (None, total_url_count):
-                raise RuntimeError(
-                    f"Checkpoint totalUrlCount={existing_total} does not match current URL count={total_url_count}"
-                )
-
-            existing_fetch_mode = existing_payload.get("fetchMode")
-            if existing_fetch_mode and existing_fetch_mode != args.fetch_mode:
-                raise RuntimeError(
-                    f"Checkpoint fetchMode={existing_fetch_mode} does not match requested fetchMode={args.fetch_mode}"
-                )
-
-            scraped = list(existing_payload.get("products", []))
-            errors = list(existing_payload.get("errors", []))
-            existing_transport_counts = existing_payload.get("transportCounts", {})
-            transport_counts = {
-                "browserless": int(existing_transport_counts.get("browserless", 0)),
-                "direct": int(existing_transport_counts.get("direct", 0)),
-            }
-
-            processed_urls = {
-                item.get("productUrl")
-                for item in scraped
-                if isinstance(item, dict) and item.get("productUrl")
-            }
-            processed_urls.update(
-                item.get("productUrl")
-                for item in errors
-                if isinstance(item, dict) and item.get("productUrl")
-            )
-            urls_to_process = [url for url in urls if url not in processed_urls]
-            processed_count = len(processed_urls)
-
+            urls_to_process = [url for url in urls if url not in checkpoint.processed_urls]
             print(
                 "Resuming from checkpoint: "
-                f"processed={processed_count} scraped={len(scraped)} errors={len(errors)} "
-                f"remaining={len(urls_to_process)}"
+                f"processed={checkpoint.processed_count} scraped={checkpoint.scraped_count} "
+                f"errors={checkpoint.error_count} remaining={len(urls_to_process)}"
             )
 
-            if processed_count >= total_url_count:
-                save_payload(
-                    output_path,
-                    build_payload(
-                        fetch_mode=args.fetch_mode,
-                        requested_families=requested_families,
-                        transport_counts=transport_counts,
-                        scraped=scraped,
-                        errors=errors,
-                        processed_count=processed_count,
-                        total_url_count=total_url_count,
-                        status="completed",
-                    ),
-                )
+            if checkpoint.processed_count >= total_url_count:
+                checkpoint.save("completed")
+                checkpoint.close()
                 print(f"Checkpoint already covers all URLs: {output_path}")
                 return
 
+    if args.concurrency > 1:
+        rate = args.rate or (1.0 / args.delay if args.delay > 0 else 0.0)
+        print(f"Concurrent mode: workers={args.concurrency} rate={rate:.2f} req/s")
+        results = iter_scrape_concurrent(
+            urls_to_process, args.fetch_mode, args.concurrency, rate, args.html_parser
+        )
+    else:
+        results = iter_scrape_serial(urls_to_process, args.fetch_mode, args.delay, args.html_parser)
+
     try:
-        for url in urls_to_process:
-            try:
-                html, transport = fetch_product_page(url, args.fetch_mode)
-                transport_counts[transport] = transport_counts.get(transport, 0) + 1
-                text = strip_html_to_text(html)
-                entry: dict[str, Any] = {"productUrl": url, "fetchTransport": transport}
-                entry.update(extract_specs(text))
-                entry.update(extract_prices(text))
-                sku, sku_source = extract_website_sku(html, text, url)
-                if sku:
-                    entry["websiteSku"] = sku
-                    entry["websiteSkuSource"] = sku_source
-                scraped.append(entry)
-            except Exception as exc:  # noqa: BLE001
-                errors.append({"productUrl": url, "error": str(exc)})
-
-            processed_count += 1
+        for entry, error, transport in results:
+            checkpoint.record(entry, error, transport)
+            processed_count = checkpoint.processed_count
             if processed_count % 50 == 0 or processed_count == total_url_count:
+                transport_counts = checkpoint.transport_counts
                 print(
-                    f"[{processed_count}/{total_url_count}] scraped={len(scraped)} errors={len(errors)} "
-                    f"browserless={transport_counts.get('browserless', 0)} direct={transport_counts.get('direct', 0)}"
-                )
-                save_payload(
-                    output_path,
-                    build_payload(
-                        fetch_mode=args.fetch_mode,
-                        requested_families=requested_families,
-                        transport_counts=transport_counts,
-                        scraped=scraped,
-                        errors=errors,
-                        processed_count=processed_count,
-                        total_url_count=total_url_count,
-                        status="in_progress",
-                    ),
+                    f"[{processed_count}/{total_url_count}] scraped={checkpoint.scraped_count} "
+                    f"errors={checkpoint.error_count} browserless={transport_counts.get('browserless', 0)} "
+                    f"direct={transport_counts.get('direct', 0)}"
                 )
-            time.sleep(args.delay)
+                checkpoint.save("in_progress")
     except KeyboardInterrupt:
+        results.close()
         print("Interrupted; saving partial scrape output before exit...")
-        save_payload(
-            output_path,
-            build_payload(
-                fetch_mode=args.fetch_mode,
-                requested_families=requested_families,
-                transport_counts=transport_counts,
-                scraped=scraped,
-                errors=errors,
-                processed_count=processed_count,
-                total_url_count=total_url_count,
-                status="interrupted",
-            ),
-        )
+        checkpoint.save("interrupted")
+        checkpoint.close()
         print(f"Saved partial scrape output: {output_path}")
         return
 
-    save_payload(
-        output_path,
-        build_payload(
-            fetch_mode=args.fetch_mode,
-            requested_families=requested_families,
-            transport_counts=transport_counts,
-            scraped=scraped,
-            errors=errors,
-            processed_count=processed_count,
-            total_url_count=total_url_count,
-            status="completed",
-        ),
-    )
+    checkpoint.save("completed")
+    checkpoint.close()
     print(f"Saved scrape output: {output_path}")
 
 
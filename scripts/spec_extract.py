@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Single-pass extraction of the "Item ...:" spec block on bestbottles.com product pages.
+
+The old per-label extractor ran one lazy ``(.+?)`` search per entry in
+``SPEC_LABELS``, each re-checking a large lookahead alternation at every
+character. Here one pass finds every label and price-tier
+boundary up front (plain substring scans over a case-folded copy of the
+text) and values are sliced between those positions.
+The output matches the old extractor: each label takes its first
+occurrence, and its value runs to the next boundary at least one character
+past the value start, or to the end of the text.
+
+Benchmark / equivalence check against the old implementation:
+    python3 scripts/bench_extract_specs.py --cache-dir .cache/pages
+"""
+
+from __future__ import annotations
+
+import bisect
+import re
+from typing import Any
+
+
+SPEC_LABELS = [
+    "Item Type",
+    "Item Name",
+    "Item Description",
+    "Item Capacity",
+    "Item Height with Cap",
+    "Item Height without Cap",
+    "Item Diameter",
+    "Item Width",
+    "Item Depth",
+    "Neck Thread Size",
+    "Closure Type",
+]
+LABEL_TO_FIELD = {
+    "Item Type": "itemType",
+    "Item Name": "itemName",
+    "Item Description": "itemDescription",
+    "Item Capacity": "capacity",
+    "Item Height with Cap": "heightWithCap",
+    "Item Height without Cap": "heightWithoutCap",
+    "Item Diameter": "diameter",
+    "Item Width": "width",
+    "Item Depth": "depth",
+    "Neck Thread Size": "neckThreadSize",
+    "Closure Type": "closureType",
+}
+
+# Case-insensitive matching is done by folding the text once instead of using
+# re.I. str.lower() already keeps length and maps the Kelvin sign to "k"; the
+# only other code points re.I equates with a label letter are handled here
+# (U+0130 is also the one character whose lower() is two characters long).
+# Positions in the folded text are therefore positions in the original.
+EXTRA_FOLD = {0x130: "i", 0x131: "i", 0x17F: "s"}  # İ ı ſ
+LABEL_NEEDLES = [f"{label.lower()}:" for label in SPEC_LABELS]
+PRICE_BOUNDARY_RE = re.compile(r"1\s*pcs?\s*[-–]")
+LEADING_WS_RE = re.compile(r"\s*")
+WHITESPACE_RE = re.compile(r"\s+")
+PURCHASE_TAIL_RE = re.compile(r"\s*Purchase:.*$", re.I)
+COPYRIGHT_TAIL_RE = re.compile(r"\s*Nemat International.*$", re.I)
+
+
+def _find_all(haystack: str, needle: str) -> list[int]:
+    positions = []
+    pos = haystack.find(needle)
+    while pos != -1:
+        positions.append(pos)
+        pos = haystack.find(needle, pos + 1)
+    return positions
+
+
+def clean_value(raw: str) -> str:
+    value = WHITESPACE_RE.sub(" ", raw).strip()
+    value = PURCHASE_TAIL_RE.sub("", value).strip()
+    return COPYRIGHT_TAIL_RE.sub("", value).strip()
+
+
+def extract_specs(page_text: str) -> dict[str, Any]:
+    """Return {field: value} for every spec label present in ``page_text``."""
+    folded = page_text
+    if not folded.isascii() and any(chr(code) in folded for code in EXTRA_FOLD):
+        folded = folded.translate(EXTRA_FOLD)
+    folded = folded.lower()
+    boundaries = [match.start() for match in PRICE_BOUNDARY_RE.finditer(folded)]
+    first_label_end: list[tuple[str, int]] = []
+    for label, needle in zip(SPEC_LABELS, LABEL_NEEDLES):
+        positions = _find_all(folded, needle)
+        if positions:
+            boundaries.extend(positions)
+            first_label_end.append((label, positions[0] + len(needle)))
+    boundaries.sort()
+
+    text_len = len(page_text)
+    data: dict[str, Any] = {}
+    for label, label_end in first_label_end:
+        value_start = LEADING_WS_RE.match(page_text, label_end).end()
+        if value_start >= text_len:
+            continue  # nothing but whitespace after the label
+        # The value is at least one character long, so the boundary that ends
+        # it must start strictly after value_start.
+        idx = bisect.bisect_right(boundaries, value_start)
+        value_end = boundaries[idx] if idx < len(boundaries) else text_len
+        value = clean_value(page_text[value_start:value_end])
+        if value:
+            data[LABEL_TO_FIELD[label]] = value
+    return data
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark canvas normalization (normalize_all, the pipeline's step 5).
+
+Reports images/sec and average output PNG size for each worker count,
+with optimize=True (the default) and with the given zlib compress levels
+(--png-compress-level).
+
+Usage:
+    python bench_normalize.py --input ./processed/03_named --workers 1,4
+    python bench_normalize.py --synthetic 8 --psd-size 2400x4252
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from normalize_canvas import normalize_all
+
+COMPONENTS = ["body", "fitment", "cap"]
+
+
+def synthetic_skus(folder: Path, count: int, psd_size: tuple, seed: int = 0) -> None:
+    """PSD-aligned SKUs: one full-canvas layer per component plus extraction_info.json."""
+    rng = random.Random(seed)
+    width, height = psd_size
+    for i in range(count):
+        sku = folder / f"GBSynth{i:03d}"
+        sku.mkdir(parents=True, exist_ok=True)
+        x, w = rng.randint(width // 4, width // 3), rng.randint(width // 4, width // 3)
+        top = height // 6
+        boxes = {
+            "body": (x, height // 3, x + w, height * 9 // 10),
+            "fitment": (x + w // 3, height // 4, x + 2 * w // 3, height // 3),
+            "cap": (x + w // 4, top, x + 3 * w // 4, height // 4),
+        }
+        layers = []
+        for comp in COMPONENTS:
+            img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+            ImageDraw.Draw(img).rounded_rectangle(
+                boxes[comp], radius=w // 10,
+                fill=(rng.randint(20, 220), rng.randint(20, 220), 160, rng.randint(180, 255)))
+            name = f"{sku.name}-{comp}.png"
+            img.save(sku / name, compress_level=1)
+            layers.append({"filename": name})
+        with open(sku / "extraction_info.json", "w") as f:
+            json.dump({"psd_width": width, "psd_height": height, "layers": layers}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark canvas normalization")
+    parser.add_argument("--input", type=Path, help="SKU-folder image directory (e.g. 03_named)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N synthetic SKUs")
+    parser.add_argument("--psd-size", default="2400x4252", help="Synthetic PSD canvas WxH")
+    parser.add_argument("--compress-levels", default="6,1",
+                        help="zlib levels to compare against optimize=True")
+    parser.add_argument("--workers", default="1", help="Worker counts to compare, e.g. 1,4")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        source = args.input
+        if source is None:
+            if not args.synthetic:
+                raise SystemExit("Pass --input DIR and/or --synthetic N")
+            source = tmp / "source"
+            synthetic_skus(source, args.synthetic,
+                           tuple(int(n) for n in args.psd_size.lower().split("x")))
+
+        levels = [None] + [int(n) for n in args.compress_levels.split(",") if n]
+        rows = []
+        for workers in (int(n) for n in args.workers.split(",")):
+            for level in levels:
+                out = tmp / f"out-{workers}-{level}"
+                best = float("inf")
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    stats = normalize_all(source, out, workers=workers, compress_level=level)
+                    best = min(best, time.perf_counter() - start)
+                if not stats["processed"]:
+                    raise SystemExit(f"No images found under {source}")
+                size = sum(f.stat().st_size for f in out.rglob("*.png")) / stats["processed"]
+                png = "optimize" if level is None else f"level {level}"
+                rows.append((workers, png, stats["processed"] / best, size / 1024))
+
+        print(f"{stats['processed']} images")
+        print(f"  {'workers':>7}  {'png':>8}  {'img/s':>7}  {'avg KB':>7}")
+        for workers, png, rate, kb in rows:
+            print(f"  {workers:>7}  {png:>8}  {rate:>7.2f}  {kb:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
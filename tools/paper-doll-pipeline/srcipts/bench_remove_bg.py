@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark batched vs per-image background removal.
+
+Reports images/sec for batch sizes 1, 4, 8 and 16:
+  - inference: mask prediction only (predict_masks vs session.predict)
+  - end-to-end: read + mask + cutout/alpha matting + PNG write
+    (batch 1 = the per-image rembg.remove() path the pipeline used before)
+
+Usage:
+    python bench_remove_bg.py --input ./processed/01_extracted --limit 64
+    python bench_remove_bg.py --synthetic 48 --model u2netp
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from remove_bg import collect_images, predict_masks, run_batch
+
+
+def synthetic_images(folder: Path, count: int, seed: int = 0) -> None:
+    """Studio-style shots: a bottle-shaped block on a light gray backdrop."""
+    rng = random.Random(seed)
+    skus = ["GBCylClr9", "GBCylFrs9", "GBAtomSl5", "GBBstnAmb30"]
+    for i in range(count):
+        sku = skus[i % len(skus)]
+        img = Image.new("RGB", (600, 1063), (rng.randint(225, 245),) * 3)
+        draw = ImageDraw.Draw(img)
+        x, w = rng.randint(150, 220), rng.randint(160, 240)
+        draw.rectangle((x, 300, x + w, 980), fill=(rng.randint(20, 200), 90, 160))
+        draw.rectangle((x + w // 3, 180, x + 2 * w // 3, 300), fill=(30, 30, 30))
+        (folder / sku).mkdir(parents=True, exist_ok=True)
+        img.save(folder / sku / f"layer_{i:03d}.png")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched background removal")
+    parser.add_argument("--input", type=Path, help="SKU-folder image directory")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N synthetic images")
+    parser.add_argument("--limit", type=int, default=0, help="Use only the first N images (0 = all)")
+    parser.add_argument("--model", default="u2net")
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    from rembg import new_session
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        source = args.input
+        if source is None:
+            if not args.synthetic:
+                raise SystemExit("Pass --input DIR and/or --synthetic N")
+            source = tmp / "source"
+            synthetic_images(source, args.synthetic)
+
+        jobs = collect_images(source, tmp / "out")
+        if args.limit:
+            jobs = jobs[:args.limit]
+        if not jobs:
+            raise SystemExit(f"No images found under {source}")
+
+        session = new_session(args.model)
+        images = [Image.open(img_path).convert("RGB") for _, img_path, _ in jobs]
+        print(f"{len(jobs)} images, model {args.model}")
+        print(f"  {'batch':>5}  {'inference img/s':>16}  {'end-to-end img/s':>17}")
+
+        for size in (int(n) for n in args.batch_sizes.split(",")):
+            infer = end_to_end = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for i in range(0, len(images), size):
+                    group = images[i:i + size]
+                    if size > 1:
+                        predict_masks(session, group)
+                    else:
+                        session.predict(group[0])
+                infer = min(infer, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                for i in range(0, len(jobs), size):
+                    run_batch(jobs[i:i + size], session, batched=size > 1)
+                end_to_end = min(end_to_end, time.perf_counter() - start)
+
+            print(f"  {size:>5}  {len(jobs) / infer:>16.2f}  {len(jobs) / end_to_end:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Build cache for incremental pipeline runs.
+
+Every unit of work a step does (one SKU folder, or one image) is recorded
+in <output>/.build-cache.json under a fingerprint of
+
+  - the SHA-256 of each input file's content, and
+  - the step parameters that affect the output (rembg model + matting
+    params, canvas size, classification threshold, ...).
+
+On the next run the step asks the cache first; if the fingerprint matches
+and every recorded output is still on disk untouched, the work is skipped.
+Because each step's outputs are the next step's inputs, an unchanged SKU
+is skipped all the way down the pipeline, while new or edited SKUs (or a
+changed parameter) are rebuilt.
+
+File hashes are memoized by (size, mtime), so a rerun only re-reads files
+that actually changed. A cache may be shared by threads (the per-SKU
+scheduler's I/O pool); writes are serialized by a lock.
+
+Usage:
+    cache = BuildCache(output / ".build-cache.json")
+    fp = cache.fingerprint([img_path], {"model": "u2net", **params})
+    if cache.hit("remove_bg", key, fp) is None:
+        ...do the work...
+        cache.record("remove_bg", key, fp, [output_path])
+    cache.save()
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+CACHE_FORMAT = 1
+AUTOSAVE_EVERY = 100  # records between saves, so a crash mid-step loses little
+
+
+def _stat_key(path: Path) -> list:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+class BuildCache:
+    """Fingerprint → outputs records for every pipeline step, persisted as JSON."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.root = self.path.parent
+        self.files = {}   # abs path -> [size, mtime_ns, sha256]
+        self.steps = {}   # step -> key -> {"fingerprint", "outputs", "meta"}
+        self._unsaved = 0
+        self._lock = threading.RLock()
+        if self.path.exists():
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                if data.get("format") == CACHE_FORMAT:
+                    self.files = data.get("files", {})
+                    self.steps = data.get("steps", {})
+            except (OSError, ValueError):
+                pass  # unreadable cache = empty cache; everything rebuilds
+
+    # ── Hashing ──────────────────────────────────────────────────────────────
+
+    def file_hash(self, path: Path) -> str:
+        """Content SHA-256 of a file, re-read only when its size or mtime changed."""
+        path = Path(path).resolve()
+        stat = _stat_key(path)
+        memo = self.files.get(str(path))
+        if memo and memo[:2] == stat:
+            return memo[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        with self._lock:
+            self.files[str(path)] = [*stat, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def fingerprint(self, inputs: list, params: dict) -> str:
+        """Hash of the input files' names + contents and the step parameters."""
+        digest = hashlib.sha256()
+        for path in sorted(Path(p) for p in inputs):
+            digest.update(path.name.encode())
+            digest.update(self.file_hash(path).encode())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    # ── Lookup / record ──────────────────────────────────────────────────────
+
+    def _rel(self, path: Path) -> str:
+        path = Path(path).resolve()
+        try:
+            return str(path.relative_to(self.root.resolve()))
+        except ValueError:
+            return str(path)
+
+    def _abs(self, rel: str) -> Path:
+        path = Path(rel)
+        return path if path.is_absolute() else self.root / path
+
+    def hit(self, step: str, key: str, fingerprint: str) -> Optional[dict]:
+        """The recorded entry if the fingerprint matches and its outputs are intact, else None."""
+        entry = self.steps.get(step, {}).get(key)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return None
+        for rel, stat in entry.get("outputs", {}).items():
+            path = self._abs(rel)
+            if not path.exists() or _stat_key(path) != stat:
+                return None
+        return entry
+
+    def record(self, step: str, key: str, fingerprint: str,
+               outputs: list, meta: Optional[dict] = None):
+        """Remember that `fingerprint` produced `outputs` (plus any step-specific meta)."""
+        entry = {
+            "fingerprint": fingerprint,
+            "outputs": {self._rel(p): _stat_key(Path(p)) for p in outputs},
+            "meta": meta or {},
+        }
+        with self._lock:
+            self.steps.setdefault(step, {})[key] = entry
+            self._unsaved += 1
+            if self._unsaved >= AUTOSAVE_EVERY:
+                self.save(prune=False)
+
+    def save(self, prune: bool = True):
+        with self._lock:
+            if prune:
+                # Drop hash memos for files that no longer exist
+                self.files = {p: v for p, v in self.files.items() if os.path.exists(p)}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            with open(temp_path, "w") as f:
+                json.dump({"format": CACHE_FORMAT, "files": self.files, "steps": self.steps}, f)
+            temp_path.replace(self.path)
+            self._unsaved = 0
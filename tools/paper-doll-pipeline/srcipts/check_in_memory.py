@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Check that --in-memory runs produce what the file-by-file run produces.
+
+Runs run_pipeline.py twice on the same source (--scheduler sku, with and
+without --in-memory, build cache off) and compares the classification
+report and the pixels of every final PNG. Any difference is printed and
+makes the script exit non-zero.
+
+Usage:
+    python check_in_memory.py --source ./test_psds
+    python check_in_memory.py --source ./test_psds --args="--crop-layers"
+    python check_in_memory.py --source ./pngs --args="--skip-psd-extraction --skip-bg-removal"
+"""
+
+import argparse
+import json
+import shlex
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from PIL import Image, ImageChops
+
+SCRIPT = Path(__file__).parent / "run_pipeline.py"
+
+
+def run(source: Path, output: Path, steps: str, extra: list) -> None:
+    cmd = [sys.executable, str(SCRIPT), "--source", str(source), "--output", str(output),
+           "--steps", steps, "--scheduler", "sku", "--no-cache"] + extra
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+
+
+def load_report(output: Path) -> dict:
+    path = output / "03_named" / "_classification_report.json"
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return {entry["sku"]: entry for entry in json.load(f)}
+
+
+def final_images(output: Path) -> dict:
+    final = output / "04_final"
+    return {p.relative_to(final): p for p in sorted(final.rglob("*.png"))} if final.is_dir() else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare --in-memory output with the file-by-file run")
+    parser.add_argument("--source", type=Path, required=True, help="SKU folders (PSDs or PNGs)")
+    parser.add_argument("--steps", default="2,3,4,5", help="Pipeline steps to run (default: 2,3,4,5)")
+    parser.add_argument("--args", default="",
+                        help="Extra run_pipeline.py flags for both runs (pass as --args=\"...\")")
+    args = parser.parse_args()
+
+    extra = shlex.split(args.args)
+    with tempfile.TemporaryDirectory() as tmp:
+        files_out, memory_out = Path(tmp) / "files", Path(tmp) / "memory"
+        run(args.source, files_out, args.steps, extra)
+        run(args.source, memory_out, args.steps, extra + ["--in-memory"])
+
+        problems = []
+        expected, actual = load_report(files_out), load_report(memory_out)
+        for sku in sorted(set(expected) | set(actual)):
+            if expected.get(sku) != actual.get(sku):
+                problems.append(f"classification report differs for {sku}")
+
+        expected, actual = final_images(files_out), final_images(memory_out)
+        for name in sorted(set(expected) | set(actual)):
+            if name not in expected or name not in actual:
+                problems.append(f"{name}: only in the {'in-memory' if name in actual else 'file'} run")
+                continue
+            a = Image.open(expected[name]).convert("RGBA")
+            b = Image.open(actual[name]).convert("RGBA")
+            if a.size != b.size or ImageChops.difference(a, b).getbbox() is not None:
+                problems.append(f"{name}: pixels differ")
+
+    for problem in problems:
+        print(f"  MISMATCH {problem}")
+    print(f"{len(problems)} difference(s) between the in-memory and file-by-file runs")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
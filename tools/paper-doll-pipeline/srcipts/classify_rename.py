@@ -12,42 +12,40 @@ from typing import Optional
 
 try:
     from PIL import Image
-    import numpy as np
 except ImportError:
-    print("Error: Pillow/numpy not installed.")
+    print("Error: Pillow not installed.")
     exit(1)
 
 from tqdm import tqdm
 
+from image_metrics import measure_image
+from layer_io import copy_layer, cropped_layer, layer_inputs, open_layer
+
 
 def get_content_bbox(image: Image.Image) -> dict:
     """
     Analyze the non-transparent content of an image.
     Returns bounding box and coverage statistics.
     """
-    if image.mode != "RGBA":
-        image = image.convert("RGBA")
+    return content_analysis(measure_image(image))
 
-    alpha = np.array(image.split()[-1])
-    content_mask = alpha > 20  # Threshold for "visible" pixels
 
-    if not content_mask.any():
+def content_analysis(metrics: dict) -> dict:
+    """get_content_bbox()'s analysis, from the image's image_metrics measurements."""
+    if metrics["bbox"] is None:  # nothing above the "visible" alpha threshold
         return {"empty": True}
 
-    rows = np.any(content_mask, axis=1)
-    cols = np.any(content_mask, axis=0)
-    y_min, y_max = np.where(rows)[0][[0, -1]]
-    x_min, x_max = np.where(cols)[0][[0, -1]]
-
-    h, w = alpha.shape
-    content_pixels = np.sum(content_mask)
+    x_min, y_min, x_max, y_max = metrics["bbox"]
+    x_max, y_max = x_max - 1, y_max - 1  # inclusive bounds
+    h, w = metrics["height"], metrics["width"]
+    content_pixels = metrics["content_pixels"]
 
     return {
         "empty": False,
-        "bbox": {"x_min": int(x_min), "y_min": int(y_min),
-                 "x_max": int(x_max), "y_max": int(y_max)},
-        "bbox_width": int(x_max - x_min),
-        "bbox_height": int(y_max - y_min),
+        "bbox": {"x_min": x_min, "y_min": y_min,
+                 "x_max": x_max, "y_max": y_max},
+        "bbox_width": x_max - x_min,
+        "bbox_height": y_max - y_min,
         "canvas_width": w,
         "canvas_height": h,
         "content_ratio": float(content_pixels / (h * w)),
@@ -128,14 +126,19 @@ def classify_by_vision(image_path: Path) -> tuple:
     
     Returns: (component_type, confidence)
     """
+    with open(image_path, "rb") as f:
+        return classify_png_by_vision(f.read())
+
+
+def classify_png_by_vision(png_data: bytes) -> tuple:
+    """classify_by_vision() for PNG bytes that are not (or not yet) on disk."""
     try:
         import anthropic
         import base64
 
         client = anthropic.Anthropic()
 
-        with open(image_path, "rb") as f:
-            image_data = base64.standard_b64encode(f.read()).decode("utf-8")
+        image_data = base64.standard_b64encode(png_data).decode("utf-8")
 
         response = client.messages.create(
             model="claude-sonnet-4-20250514",
@@ -181,96 +184,180 @@ def classify_by_vision(image_path: Path) -> tuple:
         return ("unknown", 0.0)
 
 
+def classify_layers(sku: str, layers: list, use_vision: bool,
+                    confidence_threshold: float) -> dict:
+    """
+    Classify one product's layers, given as (filename, metrics, png_data) in
+    stacking order: metrics are the layer's image_metrics measurements, and
+    png_data() returns its PNG bytes for a vision call.
+
+    Returns the classification report entry (with each layer's new name
+    under "renamed") and the classified / ambiguous / vision_calls counts.
+    """
+    total = len(layers)
+    counts = {"classified": 0, "ambiguous": 0, "vision_calls": 0}
+    product_classifications = []
+    used_types = set()
+
+    for idx, (filename, metrics, png_data) in enumerate(layers):
+        analysis = content_analysis(metrics)
+
+        comp_type, confidence = classify_by_heuristic(analysis, idx, total)
+
+        # If low confidence and vision is enabled, use Claude Vision
+        if confidence < confidence_threshold and use_vision:
+            comp_type_v, confidence_v = classify_png_by_vision(png_data())
+            counts["vision_calls"] += 1
+            if confidence_v > confidence:
+                comp_type = comp_type_v
+                confidence = confidence_v
+                method = "vision"
+            else:
+                method = "heuristic"
+        else:
+            method = "heuristic"
+
+        # Handle duplicate component types within same product
+        if comp_type in used_types:
+            # Append numeric suffix for duplicates
+            count = sum(1 for c in product_classifications if c["type"] == comp_type)
+            output_name = f"{sku}-{comp_type}{count + 1}.png"
+        else:
+            output_name = f"{sku}-{comp_type}.png"
+
+        used_types.add(comp_type)
+
+        classification = {
+            "sku": sku,
+            "original": filename,
+            "renamed": output_name,
+            "type": comp_type,
+            "confidence": round(confidence, 3),
+            "method": method,
+            "analysis": {k: v for k, v in analysis.items()
+                         if k not in ("bbox",)} if not analysis.get("empty") else {},
+        }
+        product_classifications.append(classification)
+
+        if confidence < confidence_threshold:
+            counts["ambiguous"] += 1
+        else:
+            counts["classified"] += 1
+
+    return {
+        "report": {
+            "sku": sku,
+            "layer_count": total,
+            "classifications": product_classifications,
+        },
+        "counts": counts,
+    }
+
+
+def classify_product(sku_folder: Path, out_dir: Path, use_vision: bool,
+                     confidence_threshold: float, metrics=None) -> dict:
+    """
+    Classify and rename one SKU folder's layers into out_dir.
+
+    With a MetricsIndex, layers measured before are not decoded again, and
+    the renamed copies are recorded as sharing their originals' metrics.
+    Returns the folder's classification report entry plus its counts
+    (classified / ambiguous / vision_calls), or None if it has no layers.
+    """
+    sku = sku_folder.name
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # Gather all image layers (sorted by name for consistent ordering)
+    layers = sorted([
+        f for f in sku_folder.iterdir()
+        if f.suffix.lower() == ".png" and not f.name.startswith(".")
+        and f.name != "extraction_info.json"
+    ])
+
+    if not layers:
+        return None
+
+    measured = [metrics.measure(f) if metrics is not None else measure_image(open_layer(f))
+                for f in layers]
+    result = classify_layers(
+        sku, [(f.name, m, f.read_bytes) for f, m in zip(layers, measured)],
+        use_vision, confidence_threshold)
+
+    # Copy and rename
+    for layer_path, classification in zip(layers, result["report"]["classifications"]):
+        renamed = out_dir / classification["renamed"]
+        copy_layer(layer_path, renamed)
+        if metrics is not None and cropped_layer(layer_path) is None:
+            metrics.alias(renamed, layer_path)
+
+    return result
+
+
+def classify_folder(sku_folder: Path, out_dir: Path, stats: dict,
+                    use_vision: bool = False, confidence_threshold: float = 0.6,
+                    cache=None, metrics=None) -> Optional[dict]:
+    """
+    classify_product() behind the build cache: a folder whose layers and
+    settings are unchanged reuses its recorded report entry and counts.
+    Updates stats; returns the folder's report entry (None if no layers).
+    """
+    sku = sku_folder.name
+    params = {"use_vision": use_vision, "threshold": confidence_threshold}
+
+    if cache is not None:
+        layers = [f for f in sku_folder.iterdir()
+                  if f.suffix.lower() == ".png" and not f.name.startswith(".")]
+        fp = cache.fingerprint([p for f in layers for p in layer_inputs(f)], params)
+        entry = cache.hit("classify_rename", sku, fp)
+        if entry is not None:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            stats["cached"] += 1
+            if not entry["meta"]:
+                return None
+            for key in ("classified", "ambiguous"):
+                stats[key] += entry["meta"]["counts"][key]
+            return entry["meta"]["report"]
+
+    result = classify_product(sku_folder, out_dir, use_vision, confidence_threshold, metrics)
+    if result is not None:
+        for key, value in result["counts"].items():
+            stats[key] += value
+
+    if cache is not None:
+        if result is None:
+            cache.record("classify_rename", sku, fp, [])
+        else:
+            outputs = [out_dir / c["renamed"] for c in result["report"]["classifications"]]
+            cache.record("classify_rename", sku, fp, outputs,
+                         {"report": result["report"], "counts": result["counts"]})
+
+    return result["report"] if result is not None else None
+
+
 def classify_and_rename_all(input_dir: Path, output_dir: Path,
                              use_vision: bool = False,
-                             confidence_threshold: float = 0.6) -> dict:
+                             confidence_threshold: float = 0.6,
+                             cache=None, metrics=None) -> dict:
     """
     Classify all component images and rename per SKU convention.
     
     Input:  input_dir/SKU_FOLDER/layer_000.png
     Output: output_dir/SKU_FOLDER/SKU-body.png, SKU-fitment.png, SKU-cap.png
-    """
-    import shutil
 
-    stats = {"classified": 0, "ambiguous": 0, "vision_calls": 0, "errors": 0}
+    With a BuildCache, a folder whose layers and settings are unchanged is
+    skipped and its recorded report entry and counts are reused. With a
+    MetricsIndex, layer measurements are shared with later steps.
+    """
+    stats = {"classified": 0, "ambiguous": 0, "vision_calls": 0, "cached": 0, "errors": 0}
     classification_report = []
 
     for sku_folder in tqdm(sorted(input_dir.iterdir()), desc="Classifying"):
         if not sku_folder.is_dir():
             continue
-
-        sku = sku_folder.name
-        out_dir = output_dir / sku
-        out_dir.mkdir(parents=True, exist_ok=True)
-
-        # Gather all image layers (sorted by name for consistent ordering)
-        layers = sorted([
-            f for f in sku_folder.iterdir()
-            if f.suffix.lower() == ".png" and not f.name.startswith(".")
-            and f.name != "extraction_info.json"
-        ])
-
-        total = len(layers)
-        if total == 0:
-            continue
-
-        product_classifications = []
-        used_types = set()
-
-        for idx, layer_path in enumerate(layers):
-            img = Image.open(layer_path)
-            analysis = get_content_bbox(img)
-
-            comp_type, confidence = classify_by_heuristic(analysis, idx, total)
-
-            # If low confidence and vision is enabled, use Claude Vision
-            if confidence < confidence_threshold and use_vision:
-                comp_type_v, confidence_v = classify_by_vision(layer_path)
-                stats["vision_calls"] += 1
-                if confidence_v > confidence:
-                    comp_type = comp_type_v
-                    confidence = confidence_v
-                    method = "vision"
-                else:
-                    method = "heuristic"
-            else:
-                method = "heuristic"
-
-            # Handle duplicate component types within same product
-            if comp_type in used_types:
-                # Append numeric suffix for duplicates
-                count = sum(1 for c in product_classifications if c["type"] == comp_type)
-                output_name = f"{sku}-{comp_type}{count + 1}.png"
-            else:
-                output_name = f"{sku}-{comp_type}.png"
-
-            used_types.add(comp_type)
-
-            # Copy and rename
-            shutil.copy2(str(layer_path), str(out_dir / output_name))
-
-            classification = {
-                "sku": sku,
-                "original": layer_path.name,
-                "renamed": output_name,
-                "type": comp_type,
-                "confidence": round(confidence, 3),
-                "method": method,
-                "analysis": {k: v for k, v in analysis.items()
-                             if k not in ("bbox",)} if not analysis.get("empty") else {},
-            }
-            product_classifications.append(classification)
-
-            if confidence < confidence_threshold:
-                stats["ambiguous"] += 1
-            else:
-                stats["classified"] += 1
-
-        classification_report.append({
-            "sku": sku,
-            "layer_count": total,
-            "classifications": product_classifications,
-        })
+        report = classify_folder(sku_folder, output_dir / sku_folder.name, stats,
+                                 use_vision, confidence_threshold, cache, metrics)
+        if report is not None:
+            classification_report.append(report)
 
     # Save classification report
     report_path = output_dir / "_classification_report.json"
@@ -5,7 +5,11 @@ Extracts individual layers from PSD files as transparent PNGs,
 preserving layer positioning for pixel-perfect alignment.
 """
 
+import multiprocessing
 import os
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional
 
@@ -32,16 +36,59 @@ def extract_psd_layers(psd_path: Path, output_dir: Path, preserve_alignment: boo
         psd_path: Path to the PSD file
         output_dir: Directory to write extracted PNGs
         preserve_alignment: If True, place each layer on a canvas matching PSD dimensions
-                           so all layers align when stacked. If False, crop to layer bounds.
+                           so all layers align when stacked. If False, crop to layer bounds
+                           (offsets are in the returned layer info; see layer_io).
     
     Returns:
         Dict with extraction stats and layer info
     """
     psd = PSDImage.open(str(psd_path))
-    layers_info = []
-    
     output_dir.mkdir(parents=True, exist_ok=True)
-    
+
+    # One layer in memory at a time: composite, save, drop
+    layers_info = []
+    for image, info in iter_psd_layers(psd, preserve_alignment):
+        try:
+            image.save(str(output_dir / info["filename"]), "PNG", optimize=True)
+            layers_info.append(info)
+        except Exception as e:
+            print(f"  Warning: Could not extract layer {info['filename']} ({info['layer_name']}): {e}")
+
+    return _extraction_result(psd_path, psd, preserve_alignment, layers_info)
+
+
+def composite_psd_layers(psd_path: Path, preserve_alignment: bool = True) -> dict:
+    """
+    Composite a PSD's visible layers in memory, without writing anything.
+
+    Returns the same dict as extract_psd_layers(), plus "images": the RGBA
+    image of every extracted layer, keyed by its layer_NNN.png filename.
+    """
+    psd = PSDImage.open(str(psd_path))
+    layers_info = []
+    images = {}
+    for image, info in iter_psd_layers(psd, preserve_alignment):
+        images[info["filename"]] = image
+        layers_info.append(info)
+
+    result = _extraction_result(psd_path, psd, preserve_alignment, layers_info)
+    result["images"] = images
+    return result
+
+
+def _extraction_result(psd_path: Path, psd, preserve_alignment: bool, layers_info: list) -> dict:
+    return {
+        "psd_file": str(psd_path),
+        "psd_width": psd.width,
+        "psd_height": psd.height,
+        "cropped": not preserve_alignment,
+        "layers_extracted": len(layers_info),
+        "layers": layers_info
+    }
+
+
+def iter_psd_layers(psd, preserve_alignment: bool = True):
+    """Yield (RGBA image, layer info) for each visible layer, compositing one at a time."""
     layer_idx = 0
     for layer in psd:
         # Skip invisible layers, adjustment layers, and groups
@@ -51,34 +98,23 @@ def extract_psd_layers(psd_path: Path, output_dir: Path, preserve_alignment: boo
             # Recursively handle groups — flatten to individual layers
             for sublayer in layer:
                 if sublayer.is_visible() and not sublayer.is_group():
-                    _extract_single_layer(
-                        sublayer, psd, layer_idx, output_dir,
-                        preserve_alignment, layers_info
-                    )
+                    extracted = _extract_single_layer(sublayer, psd, layer_idx, preserve_alignment)
+                    if extracted is not None:
+                        yield extracted
                     layer_idx += 1
         else:
-            _extract_single_layer(
-                layer, psd, layer_idx, output_dir,
-                preserve_alignment, layers_info
-            )
+            extracted = _extract_single_layer(layer, psd, layer_idx, preserve_alignment)
+            if extracted is not None:
+                yield extracted
             layer_idx += 1
-    
-    return {
-        "psd_file": str(psd_path),
-        "psd_width": psd.width,
-        "psd_height": psd.height,
-        "layers_extracted": len(layers_info),
-        "layers": layers_info
-    }
 
 
-def _extract_single_layer(layer, psd, idx: int, output_dir: Path,
-                           preserve_alignment: bool, layers_info: list):
-    """Extract a single layer and save as PNG."""
+def _extract_single_layer(layer, psd, idx: int, preserve_alignment: bool) -> Optional[tuple]:
+    """Composite a single layer: (image, layer info), or None if it has no pixels."""
     try:
         layer_image = layer.composite()
         if layer_image is None:
-            return
+            return None
         
         # Ensure RGBA
         if layer_image.mode != "RGBA":
@@ -94,13 +130,8 @@ def _extract_single_layer(layer, psd, idx: int, output_dir: Path,
         else:
             save_image = layer_image
         
-        # Save
-        filename = f"layer_{idx:03d}.png"
-        save_path = output_dir / filename
-        save_image.save(str(save_path), "PNG", optimize=True)
-        
-        layers_info.append({
-            "filename": filename,
+        return save_image, {
+            "filename": f"layer_{idx:03d}.png",
             "layer_name": layer.name,
             "offset_x": layer.offset[0],
             "offset_y": layer.offset[1],
@@ -108,12 +139,138 @@ def _extract_single_layer(layer, psd, idx: int, output_dir: Path,
             "layer_height": layer_image.height,
             "opacity": getattr(layer, 'opacity', 255),
             "blend_mode": str(getattr(layer, 'blend_mode', 'normal')),
-        })
+        }
     except Exception as e:
         print(f"  Warning: Could not extract layer {idx} ({layer.name}): {e}")
+        return None
+
+
+# ── Memory budget for parallel extraction ────────────────────────────────────
+
+def estimate_psd_memory(psd_path: Path, preserve_alignment: bool = True) -> int:
+    """
+    Rough peak bytes to extract one PSD: the parsed file and its decoded
+    channel data (~3× file size), one full-size layer composite (psd_tools
+    composites in float32, 16 bytes/pixel), and the padded RGBA canvas +
+    its PNG encode unless layers are cropped.
+    Canvas size comes from the 26-byte PSD header, so nothing is decoded.
+    """
+    file_size = psd_path.stat().st_size
+    try:
+        with open(psd_path, "rb") as f:
+            header = f.read(26)
+        if header[:4] != b"8BPS":
+            raise ValueError("not a PSD header")
+        height, width = struct.unpack(">II", header[14:22])
+    except (OSError, ValueError, struct.error):
+        return file_size * 4  # unreadable header: scale with file size alone
+    pixels = width * height
+    canvas = 0 if not preserve_alignment else pixels * 4 * 2
+    return file_size * 3 + pixels * 16 + canvas
+
+
+def default_memory_budget() -> int:
+    """Half of physical memory (4 GB if it cannot be determined)."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2
+    except (ValueError, OSError, AttributeError):
+        return 4 << 30
+
+
+class MemoryBudget:
+    """
+    Admits work while the estimated memory of everything in flight fits in
+    `limit` bytes. Something is always admitted when nothing else is
+    running, so a PSD larger than the whole budget still runs, alone.
+    Thread-safe; callers block in acquire() until their share fits.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, amount: int):
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_use == 0 or self.in_use + amount <= self.limit)
+            self.in_use += amount
+
+    def release(self, amount: int):
+        with self._cond:
+            self.in_use -= amount
+            self._cond.notify_all()
+
+
+def extract_folder(folder: Path, out_dir: Path, stats: dict, cache=None, executor=None,
+                   budget: Optional[MemoryBudget] = None, preserve_alignment: bool = True):
+    """
+    Extract one SKU folder's PSD (or copy through its PNGs) into out_dir.
+
+    Updates stats in place. The PSD decode runs on executor when one is
+    given (e.g. the pipeline's process pool), otherwise inline; with a
+    budget it first waits until the PSD's estimated memory fits.
+    """
+    import json
+
+    psd_files = list(folder.glob("*.psd")) + list(folder.glob("*.psb"))
+
+    if not psd_files:
+        # No PSD files — check if PNGs already exist and copy them
+        png_files = list(folder.glob("*.png"))
+        if png_files:
+            if cache is not None:
+                fp = cache.fingerprint(png_files, {"mode": "copy"})
+                if cache.hit("extract_psd", folder.name, fp) is not None:
+                    stats["cached"] += 1
+                    return
+            out_dir.mkdir(parents=True, exist_ok=True)
+            for png in sorted(png_files):
+                import shutil
+                shutil.copy2(str(png), str(out_dir / png.name))
+            if cache is not None:
+                cache.record("extract_psd", folder.name, fp,
+                             [out_dir / png.name for png in png_files])
+        return
+
+    # Process first PSD found (typically one per folder)
+    psd_path = psd_files[0]
+
+    if cache is not None:
+        fp = cache.fingerprint([psd_path], {"mode": "psd", "preserve_alignment": preserve_alignment})
+        if cache.hit("extract_psd", folder.name, fp) is not None:
+            stats["cached"] += 1
+            return
+
+    reserved = estimate_psd_memory(psd_path, preserve_alignment) if budget is not None else 0
+    try:
+        if budget is not None:
+            budget.acquire(reserved)
+        if executor is not None:
+            result = executor.submit(extract_psd_layers, psd_path, out_dir, preserve_alignment).result()
+        else:
+            result = extract_psd_layers(psd_path, out_dir, preserve_alignment=preserve_alignment)
+        stats["psds_processed"] += 1
+        stats["layers_extracted"] += result["layers_extracted"]
+
+        # Save extraction metadata
+        info_path = out_dir / "extraction_info.json"
+        with open(info_path, "w") as f:
+            json.dump(result, f, indent=2)
 
+        if cache is not None:
+            outputs = [out_dir / layer["filename"] for layer in result["layers"]]
+            cache.record("extract_psd", folder.name, fp, outputs + [info_path])
 
-def extract_all_psds(source: Path, output: Path) -> dict:
+    except Exception as e:
+        stats["errors"].append({"sku": folder.name, "error": str(e)})
+        print(f"  Error processing {folder.name}: {e}")
+    finally:
+        if budget is not None:
+            budget.release(reserved)
+
+
+def extract_all_psds(source: Path, output: Path, cache=None, workers: int = 1,
+                     memory_budget: Optional[int] = None, crop_layers: bool = False) -> dict:
     """
     Extract all PSDs in SKU-organized source directory.
     
@@ -129,44 +286,44 @@ def extract_all_psds(source: Path, output: Path) -> dict:
             layer_001.png
             ...
             extraction_info.json
+
+    With a BuildCache, folders whose PSD (or PNGs) are byte-identical to
+    the last run and whose outputs are intact are skipped.
+
+    workers > 1 extracts PSDs in that many processes, admitting each one
+    only while the estimated memory of the PSDs in flight stays within
+    memory_budget bytes (default: half of RAM), so a run of huge PSDs
+    narrows to fewer at a time instead of exhausting memory.
+    crop_layers writes each layer cropped to its bounds, with offsets in
+    extraction_info.json, instead of padded to the full PSD canvas.
     """
-    import json
-    
-    stats = {"psds_processed": 0, "layers_extracted": 0, "errors": []}
+    stats = {"psds_processed": 0, "layers_extracted": 0, "cached": 0, "errors": []}
+    preserve_alignment = not crop_layers
     
     sku_folders = sorted([d for d in source.iterdir() if d.is_dir()])
-    
-    for folder in tqdm(sku_folders, desc="Extracting PSDs"):
-        psd_files = list(folder.glob("*.psd")) + list(folder.glob("*.psb"))
-        
-        if not psd_files:
-            # No PSD files — check if PNGs already exist and copy them
-            png_files = list(folder.glob("*.png"))
-            if png_files:
-                out_dir = output / folder.name
-                out_dir.mkdir(parents=True, exist_ok=True)
-                for png in sorted(png_files):
-                    import shutil
-                    shutil.copy2(str(png), str(out_dir / png.name))
-            continue
-        
-        # Process first PSD found (typically one per folder)
-        psd_path = psd_files[0]
-        out_dir = output / folder.name
-        
-        try:
-            result = extract_psd_layers(psd_path, out_dir, preserve_alignment=True)
-            stats["psds_processed"] += 1
-            stats["layers_extracted"] += result["layers_extracted"]
-            
-            # Save extraction metadata
-            info_path = out_dir / "extraction_info.json"
-            with open(info_path, "w") as f:
-                json.dump(result, f, indent=2)
-                
-        except Exception as e:
-            stats["errors"].append({"sku": folder.name, "error": str(e)})
-            print(f"  Error processing {folder.name}: {e}")
+
+    if workers <= 1:
+        for folder in tqdm(sku_folders, desc="Extracting PSDs"):
+            extract_folder(folder, output / folder.name, stats, cache,
+                           preserve_alignment=preserve_alignment)
+        return stats
+
+    # One driver thread per worker process: each handles a folder's cache
+    # check and copies, waits on the budget, then hands the decode to the pool.
+    budget = MemoryBudget(memory_budget or default_memory_budget())
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool, \
+            ThreadPoolExecutor(max_workers=workers) as drivers:
+        futures = {}
+        for folder in sku_folders:
+            folder_stats = {"psds_processed": 0, "layers_extracted": 0, "cached": 0, "errors": []}
+            future = drivers.submit(extract_folder, folder, output / folder.name, folder_stats,
+                                    cache, pool, budget, preserve_alignment)
+            futures[future] = folder_stats
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Extracting PSDs"):
+            future.result()
+            for key, value in futures[future].items():
+                stats[key] += value
     
     return stats
 
@@ -176,9 +333,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract PSD layers to transparent PNGs")
     parser.add_argument("--source", type=Path, required=True)
     parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Extract PSDs in N processes (default: 1)")
+    parser.add_argument("--memory-budget", type=int, default=0,
+                        help="MB of estimated PSD memory in flight with --workers (default: half of RAM)")
+    parser.add_argument("--crop-layers", action="store_true",
+                        help="Write layers cropped to their bounds (offsets in extraction_info.json)")
     args = parser.parse_args()
     
-    stats = extract_all_psds(args.source, args.output)
+    stats = extract_all_psds(args.source, args.output, workers=args.workers,
+                             memory_budget=args.memory_budget << 20 or None,
+                             crop_layers=args.crop_layers)
     print(f"\nExtracted {stats['layers_extracted']} layers from {stats['psds_processed']} PSDs")
     if stats["errors"]:
         print(f"Errors: {len(stats['errors'])}")
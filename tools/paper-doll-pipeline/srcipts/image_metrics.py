@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Image metrics index shared by the pipeline steps.
+
+Classification, normalization, QA and the manifest all need the same
+facts about an image: its size and mode, how much of it is content, the
+content's bounding box and (for QA) how white the fringe around it is.
+measure_image() computes them from one decode; MetricsIndex stores them
+in SQLite (<output>/.image-metrics.sqlite) keyed by the file's content
+hash, so whichever step sees an image first measures it and every later
+step just looks it up:
+
+  - classify measures the cleaned layers, and its renamed copies share
+    their hashes (alias), so normalize reads its bounding boxes for free
+  - normalize measures each final canvas it writes, edge counts included,
+    so QA and the manifest never decode 04_final
+
+Because entries are keyed by content, a stale entry is never returned:
+a changed file simply hashes to a new key. Path → hash lookups are
+memoized by (size, mtime) like the build cache's. The index can be
+passed to worker processes; each process opens its own connection.
+
+Query it for debugging:
+    sqlite3 processed/.image-metrics.sqlite \
+        "SELECT path, content_pixels * 1.0 / (width * height) FROM image_metrics"
+    python image_metrics.py processed/.image-metrics.sqlite --path '%GBCylClr9%'
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from layer_io import cropped_layer, open_layer
+
+METRICS_FORMAT = 1
+CONTENT_ALPHA = 20   # alpha above this counts as visible content
+EDGE_MARGIN = 2      # fringe width (px) examined by the halo check
+WHITE_LEVEL = 200    # an edge pixel is "white" when R, G and B are all above this
+
+_COLUMNS = ["width", "height", "mode", "content_pixels",
+            "bbox_x0", "bbox_y0", "bbox_x1", "bbox_y1",
+            "alpha_x0", "alpha_y0", "alpha_x1", "alpha_y1",
+            "edge_pixels", "white_edge_pixels"]
+
+_COLUMN_DEFS = ", ".join(f"{c} {'TEXT' if c == 'mode' else 'INTEGER'}" for c in _COLUMNS)
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT);
+CREATE TABLE IF NOT EXISTS metrics (sha256 TEXT PRIMARY KEY, {_COLUMN_DEFS});
+CREATE VIEW IF NOT EXISTS image_metrics AS
+    SELECT files.path, metrics.* FROM files JOIN metrics USING (sha256);
+PRAGMA user_version = {METRICS_FORMAT};
+"""
+_SELECT = f"SELECT {', '.join(_COLUMNS)} FROM metrics WHERE sha256 = ?"
+_INSERT = f"INSERT OR REPLACE INTO metrics VALUES (?, {', '.join('?' * len(_COLUMNS))})"
+
+_connections = {}  # (db path, pid) -> (connection, lock)
+_connections_lock = threading.Lock()
+
+
+def _edge_counts(pixels: np.ndarray, content_mask: np.ndarray) -> Optional[tuple]:
+    """(edge pixels, white edge pixels) of the fringe around the content, or None without scipy."""
+    try:
+        from scipy import ndimage
+    except ImportError:
+        return None
+
+    if not content_mask.any():
+        return 0, 0
+    # Edge pixels are within EDGE_MARGIN px of content, so only dilate the content's bbox plus that
+    rows = np.flatnonzero(content_mask.any(axis=1))
+    cols = np.flatnonzero(content_mask.any(axis=0))
+    y0, y1 = max(rows[0] - EDGE_MARGIN, 0), rows[-1] + EDGE_MARGIN + 1
+    x0, x1 = max(cols[0] - EDGE_MARGIN, 0), cols[-1] + EDGE_MARGIN + 1
+    content = content_mask[y0:y1, x0:x1]
+
+    dilated = ndimage.binary_dilation(content, iterations=EDGE_MARGIN)
+    edge_mask = dilated & ~content
+    edge_rgb = pixels[y0:y1, x0:x1, :3][edge_mask]
+    return len(edge_rgb), int(np.count_nonzero((edge_rgb > WHITE_LEVEL).all(axis=1)))
+
+
+def measure_image(img: Image.Image, edges: bool = False) -> dict:
+    """
+    Metrics of one image, from a single RGBA decode:
+
+      width, height, mode     -- as opened (alpha metrics use its RGBA conversion)
+      content_pixels          -- pixels with alpha > CONTENT_ALPHA
+      bbox                    -- their (left, top, right, bottom) box, or None
+      alpha_bbox              -- the same for alpha > 0 (Image.getbbox of the alpha)
+      edge_pixels, white_edge_pixels
+                              -- the halo check's fringe counts; None unless
+                                 edges=True (and scipy is installed)
+    """
+    rgba = img if img.mode == "RGBA" else img.convert("RGBA")
+    pixels = np.asarray(rgba)
+    content_mask = pixels[..., 3] > CONTENT_ALPHA
+
+    bbox = None
+    if content_mask.any():
+        rows = np.flatnonzero(content_mask.any(axis=1))
+        cols = np.flatnonzero(content_mask.any(axis=0))
+        bbox = (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+
+    counts = _edge_counts(pixels, content_mask) if edges else None
+    return {
+        "width": img.width,
+        "height": img.height,
+        "mode": img.mode,
+        "content_pixels": int(np.count_nonzero(content_mask)),
+        "bbox": bbox,
+        "alpha_bbox": rgba.getchannel("A").getbbox(),
+        "edge_pixels": counts[0] if counts else None,
+        "white_edge_pixels": counts[1] if counts else None,
+    }
+
+
+def _to_row(metrics: dict) -> list:
+    bbox = metrics["bbox"] or (None,) * 4
+    alpha_bbox = metrics["alpha_bbox"] or (None,) * 4
+    return [metrics["width"], metrics["height"], metrics["mode"], metrics["content_pixels"],
+            *bbox, *alpha_bbox, metrics["edge_pixels"], metrics["white_edge_pixels"]]
+
+
+def _from_row(row) -> dict:
+    values = dict(zip(_COLUMNS, row))
+    bbox = tuple(values[f"bbox_{k}"] for k in ("x0", "y0", "x1", "y1"))
+    alpha_bbox = tuple(values[f"alpha_{k}"] for k in ("x0", "y0", "x1", "y1"))
+    return {
+        "width": values["width"],
+        "height": values["height"],
+        "mode": values["mode"],
+        "content_pixels": values["content_pixels"],
+        "bbox": bbox if bbox[0] is not None else None,
+        "alpha_bbox": alpha_bbox if alpha_bbox[0] is not None else None,
+        "edge_pixels": values["edge_pixels"],
+        "white_edge_pixels": values["white_edge_pixels"],
+    }
+
+
+class MetricsIndex:
+    """measure_image() results by file content hash, persisted in SQLite."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def _db(self) -> tuple:
+        """This process's (connection, lock) for the index, opened on first use."""
+        key = (str(self.path.resolve()), os.getpid())
+        with _connections_lock:
+            if key not in _connections:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None,
+                                       check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                if conn.execute("PRAGMA user_version").fetchone()[0] not in (0, METRICS_FORMAT):
+                    # Another format version: metrics are cheap to rebuild
+                    conn.executescript("DROP VIEW IF EXISTS image_metrics;"
+                                       " DROP TABLE IF EXISTS metrics; DROP TABLE IF EXISTS files;")
+                conn.executescript(_SCHEMA)
+                _connections[key] = (conn, threading.Lock())
+            return _connections[key]
+
+    def file_hash(self, path: Path) -> str:
+        """Content SHA-256 of a file, re-read only when its size or mtime changed."""
+        path = Path(path).resolve()
+        st = path.stat()
+        conn, lock = self._db()
+        with lock:
+            row = conn.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?",
+                               (str(path),)).fetchone()
+        if row and row[:2] == (st.st_size, st.st_mtime_ns):
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        with lock:
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                         (str(path), st.st_size, st.st_mtime_ns, digest.hexdigest()))
+        return digest.hexdigest()
+
+    def get(self, path: Path) -> Optional[dict]:
+        """The recorded metrics of path's current content, or None."""
+        if cropped_layer(path) is not None:
+            return None  # its pixels depend on extraction_info.json too; not indexed
+        sha = self.file_hash(path)
+        conn, lock = self._db()
+        with lock:
+            row = conn.execute(_SELECT, (sha,)).fetchone()
+        return _from_row(row) if row else None
+
+    def measure(self, path: Path, image: Optional[Image.Image] = None,
+                edges: bool = False) -> dict:
+        """
+        path's metrics from the index, or measured and recorded. image is
+        path's already-decoded pixels, if the caller has them; otherwise
+        the file is opened (through layer_io) only on a miss.
+        """
+        metrics = self.get(path)
+        if metrics is not None and (not edges or metrics["edge_pixels"] is not None):
+            return metrics
+
+        metrics = measure_image(image if image is not None else open_layer(path), edges)
+        if cropped_layer(path) is None:
+            conn, lock = self._db()
+            sha = self.file_hash(path)
+            with lock:
+                conn.execute(_INSERT, (sha, *_to_row(metrics)))
+        return metrics
+
+    def alias(self, copy: Path, original: Path):
+        """Record that copy is a byte-for-byte copy of original (shares its hash)."""
+        sha = self.file_hash(original)
+        copy = Path(copy).resolve()
+        st = copy.stat()
+        conn, lock = self._db()
+        with lock:
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                         (str(copy), st.st_size, st.st_mtime_ns, sha))
+
+    def prune(self):
+        """Forget files that no longer exist, and metrics no file refers to."""
+        conn, lock = self._db()
+        with lock:
+            gone = [(p,) for (p,) in conn.execute("SELECT path FROM files")
+                    if not os.path.exists(p)]
+            conn.executemany("DELETE FROM files WHERE path = ?", gone)
+            conn.execute("DELETE FROM metrics WHERE sha256 NOT IN (SELECT sha256 FROM files)")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Show recorded image metrics")
+    parser.add_argument("index", type=Path, help="Path to .image-metrics.sqlite")
+    parser.add_argument("--path", default="%", help="SQL LIKE pattern for image paths")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(str(args.index))
+    rows = conn.execute("SELECT path, width, height, mode, content_pixels, bbox_x0, bbox_y0,"
+                        " bbox_x1, bbox_y1, edge_pixels, white_edge_pixels FROM image_metrics"
+                        " WHERE path LIKE ? ORDER BY path", (args.path,)).fetchall()
+    for path, w, h, mode, content, x0, y0, x1, y1, edge, white in rows:
+        bbox = f"({x0}, {y0}, {x1}, {y1})" if x0 is not None else "empty"
+        halo = f"{white / edge:.0%} white edge" if edge else "-"
+        print(f"{path}  {w}x{h} {mode}  content {content / (w * h):.1%}  bbox {bbox}  {halo}")
+    print(f"{len(rows)} images")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Reading extracted layers, full-canvas or cropped.
+
+extract_psd normally writes every layer as a PSD-sized canvas (mostly
+transparent padding) so layers line up by simply stacking them. With
+--crop-layers it writes each layer cropped to its own bounds instead and
+records the offsets in extraction_info.json ("cropped": true), which is
+far less memory and disk for large PSDs.
+
+Steps that read extracted layers open them through here. A cropped layer
+is pasted back onto its PSD canvas exactly as extraction would have done,
+so every later step sees the same pixels either way.
+"""
+
+import json
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+
+INFO_NAME = "extraction_info.json"
+
+_info_cache = {}  # info path -> (mtime_ns, {filename: layer entry} or None)
+
+
+def _cropped_layers(folder: Path) -> Optional[dict]:
+    """filename → (info, layer entry) for a folder of cropped layers, else None."""
+    info_path = folder / INFO_NAME
+    try:
+        mtime = info_path.stat().st_mtime_ns
+    except OSError:
+        return None
+    cached = _info_cache.get(info_path)
+    if cached is None or cached[0] != mtime:
+        with open(info_path) as f:
+            info = json.load(f)
+        layers = None
+        if info.get("cropped"):
+            layers = {layer["filename"]: (info, layer) for layer in info.get("layers", [])}
+        cached = _info_cache[info_path] = (mtime, layers)
+    return cached[1]
+
+
+def cropped_layer(path: Path) -> Optional[tuple]:
+    """(extraction info, layer entry) if path is a cropped extracted layer, else None."""
+    layers = _cropped_layers(Path(path).parent)
+    return layers.get(Path(path).name) if layers else None
+
+
+def pad_layer(img: Image.Image, psd_width: int, psd_height: int,
+              offset_x: int, offset_y: int) -> Image.Image:
+    """Place a cropped layer on a transparent PSD-sized canvas (as extract_psd does)."""
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    canvas = Image.new("RGBA", (psd_width, psd_height), (0, 0, 0, 0))
+    canvas.paste(img, (offset_x, offset_y), img)
+    return canvas
+
+
+def open_layer(path: Path) -> Image.Image:
+    """Image.open(), except that a cropped layer comes back on its full PSD canvas."""
+    img = Image.open(path)
+    found = cropped_layer(path)
+    if found is None:
+        return img
+    info, layer = found
+    return pad_layer(img, info["psd_width"], info["psd_height"],
+                     layer["offset_x"], layer["offset_y"])
+
+
+def copy_layer(src: Path, dst: Path):
+    """shutil.copy2(), writing a cropped layer out as its full-canvas PNG."""
+    if cropped_layer(src) is None:
+        shutil.copy2(str(src), str(dst))
+    else:
+        open_layer(src).save(str(dst), "PNG", optimize=True)
+
+
+def layer_inputs(path: Path) -> list:
+    """Files a layer's pixels depend on, for build-cache fingerprints."""
+    if cropped_layer(path) is None:
+        return [path]
+    return [path, Path(path).parent / INFO_NAME]
@@ -36,11 +36,12 @@ def parse_component_from_filename(filename: str) -> tuple:
     return ("unknown", None)
 
 
-def generate_manifest(input_dir: Path) -> dict:
+def generate_manifest(input_dir: Path, metrics=None) -> dict:
     """
     Generate Sanity-ready manifest from processed image directory.
     
     Reads: input_dir/SKU_FOLDER/SKU-body.png, SKU-cap.png, etc.
+    With a MetricsIndex, image sizes recorded by earlier steps are reused.
     """
     products = []
 
@@ -60,11 +61,15 @@ def generate_manifest(input_dir: Path) -> dict:
                 continue
 
             # Get image metadata
-            try:
-                img = Image.open(img_file)
-                width, height = img.size
-            except:
-                width, height = 0, 0
+            measured = metrics.get(img_file) if metrics is not None else None
+            if measured is not None:
+                width, height = measured["width"], measured["height"]
+            else:
+                try:
+                    img = Image.open(img_file)
+                    width, height = img.size
+                except:
+                    width, height = 0, 0
 
             key = comp_type if index is None else f"{comp_type}{index}"
             layers[key] = {
@@ -6,25 +6,39 @@ Preserves relative layer alignment from PSD extraction when available.
 """
 
 import json
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Optional
 
 try:
     from PIL import Image
-    import numpy as np
 except ImportError:
-    print("Error: Pillow/numpy not installed.")
+    print("Error: Pillow not installed.")
     exit(1)
 
 from tqdm import tqdm
 
+from image_metrics import CONTENT_ALPHA
+from layer_io import layer_inputs, open_layer
+
 CANVAS_WIDTH = 600
 CANVAS_HEIGHT = 1063
 PADDING_RATIO = 0.05  # 5% padding on each side
 
 
+def png_save_args(compress_level: Optional[int] = None) -> dict:
+    """PIL save() arguments: optimize=True (smallest, slowest) unless a zlib level 0-9 is given."""
+    if compress_level is None:
+        return {"optimize": True}
+    return {"compress_level": compress_level}
+
+
 def normalize_single(image_path: Path, output_path: Path,
                      component_type: str = "body",
-                     psd_alignment: dict = None) -> dict:
+                     psd_alignment: dict = None,
+                     compress_level: Optional[int] = None) -> dict:
     """
     Normalize a single image to the standard Paper Doll canvas.
     
@@ -32,11 +46,67 @@ def normalize_single(image_path: Path, output_path: Path,
     coordinates for pixel-perfect layer stacking. Otherwise, uses
     heuristic positioning based on component type.
     """
-    img = Image.open(image_path)
+    img = open_layer(image_path)
+    original_size = img.size
+    canvas = normalize_image(img, component_type, psd_alignment)
+
+    # Save
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    canvas.save(str(output_path), "PNG", **png_save_args(compress_level))
+
+    return {
+        "original_size": original_size,
+        "output_size": (CANVAS_WIDTH, CANVAS_HEIGHT),
+        "component_type": component_type,
+        "used_psd_alignment": psd_alignment is not None,
+    }
+
+
+def content_bbox(img: Image.Image, threshold: int = 0) -> Optional[tuple]:
+    """(left, top, right, bottom) of the pixels with alpha > threshold, or None if there are none."""
+    alpha = img.getchannel("A")
+    if threshold:
+        alpha = alpha.point(lambda a: 255 if a > threshold else 0)
+    return alpha.getbbox()
+
+
+def resize_region(img: Image.Image, size: tuple, box: tuple) -> tuple:
+    """
+    The part of img.resize(size, LANCZOS) that source pixels inside box can
+    reach, and its (x, y) offset in the full resized image. Everything
+    outside it is fully transparent in the full resize, so pasting just
+    the region costs a fraction of resizing a mostly empty PSD canvas.
+
+    Sampling positions are the full resize's up to float rounding, which
+    can move an odd edge pixel by a level or two.
+    """
+    width, height = size
+    sx, sy = img.width / width, img.height / height  # source px per output px
+    # LANCZOS reaches 3 source px (3 output px when downscaling) from each sample
+    reach_x, reach_y = 3.0 * max(sx, 1.0), 3.0 * max(sy, 1.0)
+    x0 = max(0, math.floor((box[0] - reach_x) / sx) - 1)
+    y0 = max(0, math.floor((box[1] - reach_y) / sy) - 1)
+    x1 = min(width, math.ceil((box[2] + reach_x) / sx) + 1)
+    y1 = min(height, math.ceil((box[3] + reach_y) / sy) + 1)
+    region = img.resize((x1 - x0, y1 - y0), Image.LANCZOS,
+                        box=(x0 * sx, y0 * sy, x1 * sx, y1 * sy))
+    return region, (x0, y0)
+
+
+def normalize_image(img: Image.Image, component_type: str = "body",
+                    psd_alignment: dict = None, measured: Optional[dict] = None) -> Image.Image:
+    """
+    The standard-canvas RGBA image for img (see normalize_single).
+
+    With PSD alignment only the region around img's own content is
+    resampled (resize_region); its placement on the canvas is the SKU's
+    shared PSD-to-canvas mapping, so layers still stack in register.
+    measured (img's image_metrics measurements, if known) supplies the
+    content boxes instead of scanning the alpha channel.
+    """
     if img.mode != "RGBA":
         img = img.convert("RGBA")
 
-    original_size = img.size
     canvas = Image.new("RGBA", (CANVAS_WIDTH, CANVAS_HEIGHT), (0, 0, 0, 0))
 
     if psd_alignment:
@@ -45,34 +115,22 @@ def normalize_single(image_path: Path, output_path: Path,
         psd_h = psd_alignment.get("psd_height", img.height)
         scale = min(CANVAS_WIDTH / psd_w, CANVAS_HEIGHT / psd_h)
 
-        # The image was already placed on PSD-sized canvas during extraction
-        # Just resize the whole thing to our target
-        resized = img.resize(
-            (int(img.width * scale), int(img.height * scale)),
-            Image.LANCZOS
-        )
+        # The image was already placed on PSD-sized canvas during extraction:
+        # scale the whole thing to our target, centered on our canvas
+        size = (int(img.width * scale), int(img.height * scale))
+        x = (CANVAS_WIDTH - size[0]) // 2
+        y = (CANVAS_HEIGHT - size[1]) // 2
 
-        # Center on our canvas
-        x = (CANVAS_WIDTH - resized.width) // 2
-        y = (CANVAS_HEIGHT - resized.height) // 2
-        canvas.paste(resized, (x, y), resized)
+        box = measured["alpha_bbox"] if measured else content_bbox(img)
+        if box is not None:  # a fully transparent layer pastes nothing
+            region, (rx, ry) = resize_region(img, size, box)
+            canvas.paste(region, (x + rx, y + ry), region)
 
     else:
         # Heuristic positioning based on component type
-        # First, find the content bounding box (ignore transparent pixels)
-        alpha = np.array(img.split()[-1])
-        content_mask = alpha > 20
-
-        if content_mask.any():
-            rows = np.any(content_mask, axis=1)
-            cols = np.any(content_mask, axis=0)
-            y_min, y_max = np.where(rows)[0][[0, -1]]
-            x_min, x_max = np.where(cols)[0][[0, -1]]
-
-            # Crop to content
-            cropped = img.crop((x_min, y_min, x_max + 1, y_max + 1))
-        else:
-            cropped = img
+        # First, crop to the content bounding box (ignore transparent pixels)
+        box = measured["bbox"] if measured else content_bbox(img, threshold=CONTENT_ALPHA)
+        cropped = img.crop(box) if box else img
 
         # Scale to fit within padded canvas
         max_w = int(CANVAS_WIDTH * (1 - 2 * PADDING_RATIO))
@@ -99,16 +157,34 @@ def normalize_single(image_path: Path, output_path: Path,
 
         canvas.paste(resized, (x, y), resized)
 
-    # Save
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    canvas.save(str(output_path), "PNG", optimize=True)
+    return canvas
 
-    return {
-        "original_size": original_size,
-        "output_size": (CANVAS_WIDTH, CANVAS_HEIGHT),
-        "component_type": component_type,
-        "used_psd_alignment": psd_alignment is not None,
-    }
+
+def normalize_files(jobs: list, psd_alignment: dict = None,
+                    compress_level: Optional[int] = None, metrics=None) -> list:
+    """
+    Normalize all of one SKU's (source, output, component type) jobs as one
+    unit of work (one worker-pool task per SKU rather than per image).
+
+    With a MetricsIndex, sources measured by an earlier step skip the
+    content-box scan, and every output canvas is measured (halo edge
+    counts included) for QA and the manifest to look up.
+    Returns None (success) or an error message per job.
+    """
+    results = []
+    for image_path, output_path, component_type in jobs:
+        try:
+            measured = metrics.get(image_path) if metrics is not None else None
+            canvas = normalize_image(open_layer(image_path), component_type, psd_alignment,
+                                     measured)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            canvas.save(str(output_path), "PNG", **png_save_args(compress_level))
+            if metrics is not None:
+                metrics.measure(output_path, canvas, edges=True)
+            results.append(None)
+        except Exception as e:
+            results.append(str(e))
+    return results
 
 
 def infer_component_type(filename: str) -> str:
@@ -133,45 +209,109 @@ def load_psd_alignment(sku_folder: Path) -> dict:
     return None
 
 
-def normalize_all(input_dir: Path, output_dir: Path) -> dict:
+def normalize_folder(sku_folder: Path, out_dir: Path, stats: dict, cache=None, executor=None,
+                     compress_level: Optional[int] = None, metrics=None):
     """
-    Normalize all images in SKU-organized directory to standard canvas.
-    
-    Input:  input_dir/SKU_FOLDER/SKU-body.png, SKU-cap.png, etc.
-    Output: output_dir/SKU_FOLDER/SKU-body.png, SKU-cap.png (all 600x1063)
-    """
-    stats = {"processed": 0, "errors": 0}
+    Normalize one SKU folder's images into out_dir, updating stats.
 
-    for sku_folder in tqdm(sorted(input_dir.iterdir()), desc="Normalizing canvas"):
-        if not sku_folder.is_dir():
+    The folder's images are normalized together (normalize_files), on
+    executor when one is given (e.g. the pipeline's process pool),
+    otherwise inline.
+    """
+    sku = sku_folder.name
+    psd_info = load_psd_alignment(sku_folder)
+
+    psd_align = None
+    if psd_info:
+        psd_align = {
+            "psd_width": psd_info.get("psd_width"),
+            "psd_height": psd_info.get("psd_height"),
+        }
+
+    jobs, pending = [], []  # (source, output, component type); (cache key, fingerprint)
+    for img_file in sorted(sku_folder.iterdir()):
+        if img_file.suffix.lower() != ".png":
+            continue
+        if img_file.name.startswith("_") or img_file.name == "extraction_info.json":
             continue
 
-        sku = sku_folder.name
-        out_dir = output_dir / sku
-        psd_info = load_psd_alignment(sku_folder)
-
-        for img_file in sorted(sku_folder.iterdir()):
-            if img_file.suffix.lower() != ".png":
-                continue
-            if img_file.name.startswith("_") or img_file.name == "extraction_info.json":
+        comp_type = infer_component_type(img_file.name)
+        output_path = out_dir / img_file.name
+
+        key = fp = None
+        if cache is not None:
+            params = {
+                "canvas": [CANVAS_WIDTH, CANVAS_HEIGHT],
+                "padding": PADDING_RATIO,
+                "component_type": comp_type,
+                "psd_alignment": psd_align,
+            }
+            if compress_level is not None:  # default (optimize) keeps existing fingerprints
+                params["png_compress_level"] = compress_level
+            fp = cache.fingerprint(layer_inputs(img_file), params)
+            key = f"{sku}/{img_file.name}"
+            if cache.hit("normalize_canvas", key, fp) is not None:
+                stats["cached"] += 1
                 continue
 
-            comp_type = infer_component_type(img_file.name)
-            output_path = out_dir / img_file.name
+        jobs.append((img_file, output_path, comp_type))
+        pending.append((key, fp))
+
+    if not jobs:
+        return
+    if executor is not None:
+        errors = executor.submit(normalize_files, jobs, psd_align, compress_level,
+                                 metrics).result()
+    else:
+        errors = normalize_files(jobs, psd_align, compress_level, metrics)
+
+    for (img_file, output_path, _), (key, fp), error in zip(jobs, pending, errors):
+        if error is None:
+            stats["processed"] += 1
+            if cache is not None:
+                cache.record("normalize_canvas", key, fp, [output_path])
+        else:
+            stats["errors"] += 1
+            print(f"  Error normalizing {img_file}: {error}")
+
 
-            psd_align = None
-            if psd_info:
-                psd_align = {
-                    "psd_width": psd_info.get("psd_width"),
-                    "psd_height": psd_info.get("psd_height"),
-                }
+def normalize_all(input_dir: Path, output_dir: Path, cache=None, workers: int = 1,
+                  compress_level: Optional[int] = None, metrics=None) -> dict:
+    """
+    Normalize all images in SKU-organized directory to standard canvas.
+    
+    Input:  input_dir/SKU_FOLDER/SKU-body.png, SKU-cap.png, etc.
+    Output: output_dir/SKU_FOLDER/SKU-body.png, SKU-cap.png (all 600x1063)
 
-            try:
-                normalize_single(img_file, output_path, comp_type, psd_align)
-                stats["processed"] += 1
-            except Exception as e:
-                stats["errors"] += 1
-                print(f"  Error normalizing {img_file}: {e}")
+    With a BuildCache, images whose content, component type, PSD alignment
+    and canvas settings are unchanged (and whose output is intact) are skipped.
+    workers > 1 normalizes that many SKU folders at once in worker
+    processes. compress_level (0-9) replaces the slow optimize=True PNG
+    encode with a plain zlib level. With a MetricsIndex, see normalize_files.
+    """
+    stats = {"processed": 0, "cached": 0, "errors": 0}
+    sku_folders = [d for d in sorted(input_dir.iterdir()) if d.is_dir()]
+
+    if workers <= 1:
+        for sku_folder in tqdm(sku_folders, desc="Normalizing canvas"):
+            normalize_folder(sku_folder, output_dir / sku_folder.name, stats, cache,
+                             compress_level=compress_level, metrics=metrics)
+        return stats
+
+    # Driver threads do each folder's cache checks and hand the pixels to the pool
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool, \
+            ThreadPoolExecutor(max_workers=workers) as drivers:
+        futures = {}
+        for sku_folder in sku_folders:
+            folder_stats = {"processed": 0, "cached": 0, "errors": 0}
+            future = drivers.submit(normalize_folder, sku_folder, output_dir / sku_folder.name,
+                                    folder_stats, cache, pool, compress_level, metrics)
+            futures[future] = folder_stats
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Normalizing canvas"):
+            future.result()
+            for key, value in futures[future].items():
+                stats[key] += value
 
     return stats
 
@@ -181,7 +321,13 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Normalize images to 600x1063 Paper Doll canvas")
     parser.add_argument("--input", type=Path, required=True)
     parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Normalize N SKU folders at once in worker processes (default: 1)")
+    parser.add_argument("--png-compress-level", type=int, default=None, choices=range(10),
+                        metavar="0-9",
+                        help="zlib level instead of optimize=True: faster saves, larger files")
     args = parser.parse_args()
 
-    stats = normalize_all(args.input, args.output)
+    stats = normalize_all(args.input, args.output, workers=args.workers,
+                          compress_level=args.png_compress_level)
     print(f"\nNormalized: {stats['processed']}, Errors: {stats['errors']}")
@@ -5,27 +5,36 @@ Runs automated quality checks on processed images and generates an HTML report.
 """
 
 import json
+import multiprocessing
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 
 try:
     from PIL import Image
-    import numpy as np
 except ImportError:
-    print("Error: Pillow/numpy not installed.")
+    print("Error: Pillow not installed.")
     exit(1)
 
 from tqdm import tqdm
 
+from image_metrics import measure_image
+
 CANVAS_WIDTH = 600
 CANVAS_HEIGHT = 1063
 VALID_COMPONENTS = {"body", "fitment", "roller", "cap", "shadow", "lighting"}
 
 
-def check_single_image(image_path: Path) -> list:
-    """Run all QA checks on a single image. Returns list of issues."""
+def check_single_image(image_path: Path, metrics=None) -> list:
+    """
+    Run all QA checks on a single image. Returns list of issues.
+
+    Every pixel check reads the image's image_metrics measurements, taken
+    from one decode, or looked up in the MetricsIndex when normalization
+    already measured this exact file.
+    """
     issues = []
     filename = image_path.name
     file_size = image_path.stat().st_size
@@ -40,27 +49,29 @@ def check_single_image(image_path: Path) -> list:
 
     # Open and check image properties
     try:
-        img = Image.open(image_path)
+        if metrics is not None:
+            measured = metrics.measure(image_path, edges=True)
+        else:
+            measured = measure_image(Image.open(image_path), edges=True)
     except Exception as e:
         issues.append({"check": "readable", "severity": "CRITICAL",
                        "msg": f"Cannot open image: {e}"})
         return issues
 
     # Check color mode
-    if img.mode != "RGBA":
+    if measured["mode"] != "RGBA":
         issues.append({"check": "color_mode", "severity": "CRITICAL",
-                       "msg": f"Expected RGBA, got {img.mode}"})
+                       "msg": f"Expected RGBA, got {measured['mode']}"})
         return issues
 
     # Check dimensions
-    if img.size != (CANVAS_WIDTH, CANVAS_HEIGHT):
+    width, height = measured["width"], measured["height"]
+    if (width, height) != (CANVAS_WIDTH, CANVAS_HEIGHT):
         issues.append({"check": "dimensions", "severity": "CRITICAL",
-                       "msg": f"Expected {CANVAS_WIDTH}x{CANVAS_HEIGHT}, got {img.size[0]}x{img.size[1]}"})
+                       "msg": f"Expected {CANVAS_WIDTH}x{CANVAS_HEIGHT}, got {width}x{height}"})
 
     # Check alpha integrity
-    alpha = np.array(img.split()[-1])
-    transparent_ratio = np.sum(alpha == 0) / alpha.size
-    content_ratio = np.sum(alpha > 20) / alpha.size
+    content_ratio = measured["content_pixels"] / (width * height)
 
     if content_ratio < 0.02:
         issues.append({"check": "min_content", "severity": "HIGH",
@@ -72,7 +83,7 @@ def check_single_image(image_path: Path) -> list:
 
     # Check for edge halos (white fringe around content)
     if content_ratio > 0.02:
-        _check_edge_halo(img, alpha, issues)
+        _check_edge_halo(measured, issues)
 
     # Check naming convention
     stem = image_path.stem
@@ -85,34 +96,19 @@ def check_single_image(image_path: Path) -> list:
     return issues
 
 
-def _check_edge_halo(img: Image.Image, alpha: np.ndarray, issues: list):
-    """Detect white/gray fringe around content edges."""
-    # Find edge pixels (where alpha transitions from 0 to >0)
-    from scipy import ndimage
-    try:
-        content_mask = alpha > 20
-        dilated = ndimage.binary_dilation(content_mask, iterations=2)
-        edge_mask = dilated & ~content_mask
-
-        if np.sum(edge_mask) == 0:
-            return
-
-        # Check RGB values at edge pixels
-        rgb = np.array(img.convert("RGB"))
-        edge_r = rgb[edge_mask, 0]
-        edge_g = rgb[edge_mask, 1]
-        edge_b = rgb[edge_mask, 2]
+def _check_edge_halo(measured: dict, issues: list):
+    """Detect white/gray fringe around content edges (pixels within 2px of content)."""
+    if not measured["edge_pixels"]:
+        return  # no edge, or scipy not available to find it
 
-        # White halo: high RGB values at edges
-        white_edge_ratio = np.sum((edge_r > 200) & (edge_g > 200) & (edge_b > 200)) / len(edge_r)
-        if white_edge_ratio > 0.3:
-            issues.append({"check": "edge_halo", "severity": "HIGH",
-                           "msg": f"{white_edge_ratio:.0%} of edge pixels are white — likely halo"})
-    except ImportError:
-        pass  # scipy not available, skip this check
+    # White halo: high RGB values at edges
+    white_edge_ratio = measured["white_edge_pixels"] / measured["edge_pixels"]
+    if white_edge_ratio > 0.3:
+        issues.append({"check": "edge_halo", "severity": "HIGH",
+                       "msg": f"{white_edge_ratio:.0%} of edge pixels are white — likely halo"})
 
 
-def check_product(sku_folder: Path) -> dict:
+def check_product(sku_folder: Path, metrics=None) -> dict:
     """Run QA on all images for a single product."""
     sku = sku_folder.name
     images = sorted([f for f in sku_folder.iterdir() if f.suffix.lower() == ".png"])
@@ -137,7 +133,7 @@ def check_product(sku_folder: Path) -> dict:
     has_body = False
     has_cap = False
     for img_path in images:
-        img_issues = check_single_image(img_path)
+        img_issues = check_single_image(img_path, metrics)
         img_result = {
             "filename": img_path.name,
             "filesize": img_path.stat().st_size,
@@ -223,16 +219,32 @@ tr:hover {{ background: #f9f9f6; }}
     return html
 
 
-def run_qa_audit(input_dir: Path, manifest_path: Path = None) -> dict:
-    """Run full QA audit on processed image directory."""
-    results = []
+def audit_folder(sku_folder: Path, cache=None, executor=None, metrics=None) -> dict:
+    """
+    check_product() behind the build cache: a product whose images are
+    byte-identical to the last audit reuses its recorded result instead of
+    re-decoding every image. The check runs on executor when one is given
+    (e.g. a process pool), otherwise inline.
+    """
+    def check():
+        if executor is None:
+            return check_product(sku_folder, metrics)
+        return executor.submit(check_product, sku_folder, metrics).result()
+
+    if cache is None:
+        return check()
+    images = [f for f in sku_folder.iterdir() if f.suffix.lower() == ".png"]
+    fp = cache.fingerprint(images, {"canvas": [CANVAS_WIDTH, CANVAS_HEIGHT]})
+    entry = cache.hit("qa_audit", sku_folder.name, fp)
+    if entry is not None:
+        return entry["meta"]
+    result = check()
+    cache.record("qa_audit", sku_folder.name, fp, [], result)
+    return result
 
-    for sku_folder in tqdm(sorted(input_dir.iterdir()), desc="QA Audit"):
-        if not sku_folder.is_dir():
-            continue
-        result = check_product(sku_folder)
-        results.append(result)
 
+def build_report(results: list) -> dict:
+    """Summary stats + HTML for a list of per-product results."""
     stats = {
         "generated_at": datetime.now().isoformat(),
         "total_products": len(results),
@@ -250,15 +262,44 @@ def run_qa_audit(input_dir: Path, manifest_path: Path = None) -> dict:
     }
 
 
+def run_qa_audit(input_dir: Path, manifest_path: Path = None, cache=None,
+                 workers: int = 1, metrics=None) -> dict:
+    """
+    Run full QA audit on processed image directory (see audit_folder for caching).
+    workers > 1 audits that many products at once in worker processes. With
+    a MetricsIndex, images measured during normalization are not decoded.
+    """
+    sku_folders = [d for d in sorted(input_dir.iterdir()) if d.is_dir()]
+
+    if workers <= 1:
+        results = [audit_folder(sku_folder, cache, metrics=metrics)
+                   for sku_folder in tqdm(sku_folders, desc="QA Audit")]
+        return build_report(results)
+
+    # Driver threads do each product's cache check and hand the decoding to the pool
+    ctx = multiprocessing.get_context("spawn")
+    by_sku = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool, \
+            ThreadPoolExecutor(max_workers=workers) as drivers:
+        futures = {drivers.submit(audit_folder, sku_folder, cache, pool, metrics): sku_folder.name
+                   for sku_folder in sku_folders}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="QA Audit"):
+            by_sku[futures[future]] = future.result()
+
+    return build_report([by_sku[sku_folder.name] for sku_folder in sku_folders])
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="QA audit for processed Paper Doll images")
     parser.add_argument("--input", type=Path, required=True)
     parser.add_argument("--manifest", type=Path, default=None)
     parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Audit N products at once in worker processes (default: 1)")
     args = parser.parse_args()
 
-    report = run_qa_audit(args.input, args.manifest)
+    report = run_qa_audit(args.input, args.manifest, workers=args.workers)
     
     out_dir = args.output or args.input.parent
     html_path = out_dir / "qa-report.html"
@@ -5,7 +5,9 @@ Batch removes backgrounds using rembg (U²-Net model).
 Handles glass transparency with alpha matting for clean edges.
 """
 
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional
 
@@ -18,10 +20,15 @@ except ImportError:
 
 from tqdm import tqdm
 
+from layer_io import copy_layer, layer_inputs, open_layer
+
 
 def has_transparency(image_path: Path, threshold: float = 0.1) -> bool:
     """Check if an image already has significant transparency."""
-    img = Image.open(image_path)
+    return image_is_transparent(open_layer(image_path), threshold)
+
+
+def image_is_transparent(img: "Image.Image", threshold: float = 0.1) -> bool:
     if img.mode != "RGBA":
         return False
     alpha = np.array(img.split()[-1])
@@ -67,21 +74,17 @@ def remove_background_single(image_path: Path, output_path: Path,
     """Remove background from a single image."""
     from rembg import remove
 
-    with open(image_path, "rb") as f:
-        input_data = f.read()
-
     params = get_rembg_params(sku)
 
     try:
-        output_data = remove(
-            input_data,
+        cutout = remove(
+            open_layer(image_path),
             session=session,
             **params
         )
 
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "wb") as f:
-            f.write(output_data)
+        cutout.save(output_path, "PNG")
 
         return {"status": "processed", "params": params}
 
@@ -89,13 +92,260 @@ def remove_background_single(image_path: Path, output_path: Path,
         return {"status": "error", "error": str(e)}
 
 
+# ── Batched inference ─────────────────────────────────────────────────────────
+# Model input preprocessing (mean, std, size), as in each rembg session's
+# predict(). Models not listed fall back to one session.predict() per image.
+MODEL_INPUTS = {
+    "u2net":             ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2netp":            ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2net_human_seg":   ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "isnet-general-use": ((0.5, 0.5, 0.5), (1.0, 1.0, 1.0), (1024, 1024)),
+}
+
+
+class PrecomputedMask:
+    """Session stand-in that hands rembg.remove() a mask computed in a batch,
+    so cutout / alpha matting / PNG output stay exactly rembg's own code."""
+
+    def __init__(self, mask):
+        self.mask = mask
+
+    def predict(self, img, *args, **kwargs):
+        return [self.mask]
+
+
+def session_batch_limit(session) -> Optional[int]:
+    """Fixed batch size baked into the ONNX graph, or None if the batch axis is dynamic."""
+    dim = session.inner_session.get_inputs()[0].shape[0]
+    return dim if isinstance(dim, int) and dim > 0 else None
+
+
+def predict_masks(session, images: list) -> list:
+    """Masks for a list of (already oriented) PIL images, one inner_session.run() per batch."""
+    spec = MODEL_INPUTS.get(getattr(session, "model_name", ""))
+    if spec is None:
+        return [session.predict(img)[0] for img in images]
+
+    mean, std, size = spec
+    step = session_batch_limit(session) or len(images)
+    masks = []
+    for start in range(0, len(images), step):
+        group = images[start:start + step]
+        feeds = [session.normalize(img, mean, std, size) for img in group]
+        input_name = next(iter(feeds[0]))
+        batch = np.concatenate([feed[input_name] for feed in feeds], axis=0)
+        preds = session.inner_session.run(None, {input_name: batch})[0][:, 0, :, :]
+
+        # Per-image min/max scaling and resize, as in the sessions' predict()
+        for img, pred in zip(group, preds):
+            ma, mi = np.max(pred), np.min(pred)
+            pred = (pred - mi) / (ma - mi)
+            mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
+            masks.append(mask.resize(img.size, Image.Resampling.LANCZOS))
+    return masks
+
+
+def cutout_images(items: list, session, batched: bool) -> list:
+    """
+    Background-removed RGBA images for (sku, PIL image) pairs, in order,
+    with the exception in place of any image that failed.
+
+    batched=True predicts every mask in one inference call; cutout / alpha
+    matting always runs per image with that image's SKU-specific parameters.
+    """
+    from rembg import remove
+    from rembg.bg import fix_image_orientation
+
+    if not items:
+        return []
+    items = [(sku, fix_image_orientation(img)) for sku, img in items]
+    if batched:
+        try:
+            masks = predict_masks(session, [img for _, img in items])
+        except Exception as e:
+            return [e] * len(items)
+        sessions = [PrecomputedMask(mask) for mask in masks]
+    else:
+        sessions = [session] * len(items)
+
+    cutouts = []
+    for (sku, img), item_session in zip(items, sessions):
+        try:
+            cutouts.append(remove(img, session=item_session, **get_rembg_params(sku)))
+        except Exception as e:
+            cutouts.append(e)
+    return cutouts
+
+
+def process_batch(jobs: list, session) -> list:
+    """
+    Batched process_image() over (sku, source, output) jobs, results in job order.
+
+    Each file is read and decoded once; the images that need removal get
+    their masks from batched inference (see cutout_images).
+    """
+    results = [None] * len(jobs)
+    pending = []  # (job index, sku, output path, image)
+    for i, (sku, img_path, output_path) in enumerate(jobs):
+        try:
+            img = open_layer(img_path)
+            img.load()
+        except Exception as e:
+            results[i] = {"status": "error", "error": str(e)}
+            continue
+        if img_path.suffix.lower() == ".png" and image_is_transparent(img):
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            copy_layer(img_path, output_path)
+            results[i] = {"status": "skipped"}
+            continue
+        pending.append((i, sku, output_path, img))
+
+    cutouts = cutout_images([(sku, img) for _, sku, _, img in pending], session, batched=True)
+    for (i, sku, output_path, _), cutout in zip(pending, cutouts):
+        if isinstance(cutout, Exception):
+            results[i] = {"status": "error", "error": str(cutout)}
+            continue
+        try:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            cutout.save(output_path, "PNG")
+            results[i] = {"status": "processed", "params": get_rembg_params(sku)}
+        except Exception as e:
+            results[i] = {"status": "error", "error": str(e)}
+    return results
+
+
+def process_image(sku: str, img_path: Path, output_path: Path, session) -> dict:
+    """Background-remove one image, or copy it through if it is already transparent."""
+    if img_path.suffix.lower() == ".png" and has_transparency(img_path):
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        copy_layer(img_path, output_path)
+        return {"status": "skipped"}
+    return remove_background_single(img_path, output_path, session, sku=sku)
+
+
+def run_batch(jobs: list, session, batched: bool) -> list:
+    """Results for a group of jobs: one batched inference, or one rembg.remove() each."""
+    if batched:
+        return process_batch(jobs, session)
+    return [process_image(sku, img_path, output_path, session)
+            for sku, img_path, output_path in jobs]
+
+
+def default_intra_op_threads(workers: int) -> int:
+    """ONNX intra-op threads per worker so that workers × threads ≈ CPU cores."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+# ── Worker process state (one ONNX session per process) ──────────────────────
+_worker_session = None
+
+
+def _init_worker(model_name: Optional[str], intra_op_threads: int):
+    """Process-pool initializer: pin thread counts, then load this worker's session
+    (none when model_name is None, for pools that never remove backgrounds)."""
+    global _worker_session
+    # rembg's new_session() sizes the ONNX Runtime pools from OMP_NUM_THREADS;
+    # set it before rembg/onnxruntime are imported in this (spawned) process.
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(intra_op_threads)
+    if model_name is not None:
+        from rembg import new_session
+        _worker_session = new_session(model_name)
+
+
+def _worker_run_batch(jobs: list, batched: bool) -> list:
+    return run_batch(jobs, _worker_session, batched)
+
+
+def collect_sku_images(sku_folder: Path, output_dir: Path) -> list:
+    """(sku, source image, output path) for one SKU folder's images, in sorted order."""
+    image_extensions = {".png", ".jpg", ".jpeg", ".tif", ".tiff"}
+    jobs = []
+    for img_file in sorted(sku_folder.iterdir()):
+        if img_file.suffix.lower() in image_extensions:
+            # Ensure output is PNG regardless of input format
+            output_path = (output_dir / sku_folder.name / img_file.name).with_suffix(".png")
+            jobs.append((sku_folder.name, img_file, output_path))
+    return jobs
+
+
+def collect_images(input_dir: Path, output_dir: Path) -> list:
+    """(sku, source image, output path) for every image, in sorted folder/file order."""
+    jobs = []
+    for sku_folder in sorted(input_dir.iterdir()):
+        if sku_folder.is_dir():
+            jobs.extend(collect_sku_images(sku_folder, output_dir))
+    return jobs
+
+
+def skip_cached(jobs: list, model_name: str, cache, stats: dict) -> tuple:
+    """Drop jobs the build cache says are up to date; returns (remaining jobs, fingerprints)."""
+    if cache is None:
+        return jobs, {}
+    todo, fingerprints = [], {}
+    for sku, img_path, output_path in jobs:
+        params = {"model": model_name, "rembg": get_rembg_params(sku)}
+        fp = cache.fingerprint(layer_inputs(img_path), params)
+        if cache.hit("remove_bg", f"{sku}/{img_path.name}", fp) is None:
+            fingerprints[img_path] = fp
+            todo.append((sku, img_path, output_path))
+        else:
+            stats["cached"] += 1
+    return todo, fingerprints
+
+
+def tally_results(jobs: list, results: list, stats: dict, cache=None, fingerprints=None):
+    """Add job results to stats (in job order) and record successes in the build cache."""
+    for (sku, img_path, output_path), result in zip(jobs, results):
+        if result["status"] in ("processed", "skipped"):
+            stats[result["status"]] += 1
+            if cache is not None:
+                cache.record("remove_bg", f"{sku}/{img_path.name}", fingerprints[img_path], [output_path])
+        else:
+            stats["errors"] += 1
+            stats["error_details"].append({"sku": sku, "file": img_path.name, "error": result.get("error")})
+
+
+def remove_sku_backgrounds(sku_folder: Path, output_dir: Path, model_name: str, stats: dict,
+                           executor, batch_size: int = 1, cache=None):
+    """
+    Background-remove one SKU folder on a process pool started with
+    _init_worker(model_name, ...), waiting for its results. Updates stats.
+    """
+    jobs, fingerprints = skip_cached(collect_sku_images(sku_folder, output_dir),
+                                     model_name, cache, stats)
+    step = max(1, batch_size)
+    batches = [jobs[start:start + step] for start in range(0, len(jobs), step)]
+    futures = [executor.submit(_worker_run_batch, batch, batch_size > 1) for batch in batches]
+    results = []
+    for batch, future in zip(batches, futures):
+        try:
+            results.extend(future.result())
+        except Exception as e:  # worker crashed (e.g. out of memory)
+            results.extend([{"status": "error", "error": str(e)}] * len(batch))
+    tally_results(jobs, results, stats, cache, fingerprints)
+
+
 def batch_remove_backgrounds(input_dir: Path, output_dir: Path,
-                              model_name: str = "u2net") -> dict:
+                              model_name: str = "u2net", workers: int = 1,
+                              intra_op_threads: Optional[int] = None,
+                              batch_size: int = 1, cache=None) -> dict:
     """
     Process all images in SKU-organized directory structure.
     
     Input:  input_dir/SKU_FOLDER/layer_000.png
     Output: output_dir/SKU_FOLDER/layer_000.png (background removed)
+
+    workers > 1 starts that many processes, each with its own ONNX session,
+    pulling images from the pool's shared queue. intra_op_threads (default:
+    CPU cores / workers) caps each session's threads so the workers do not
+    oversubscribe the machine. Output paths and stats are the same either way.
+
+    batch_size > 1 runs inference on groups of that many images as one
+    tensor batch (see process_batch); with workers, each task is one batch.
+
+    With a BuildCache, images whose content, model and matting params are
+    unchanged since the last run (and whose output is intact) are skipped.
     """
     try:
         from rembg import new_session
@@ -104,47 +354,56 @@ def batch_remove_backgrounds(input_dir: Path, output_dir: Path,
         print("  or for CPU only: pip install rembg[cpu]")
         exit(1)
 
-    # Initialize model session once (reuse across all images)
+    stats = {"processed": 0, "skipped": 0, "cached": 0, "errors": 0, "error_details": []}
+    jobs, fingerprints = skip_cached(collect_images(input_dir, output_dir), model_name, cache, stats)
+    if not jobs:
+        return stats
+
+    step = max(1, batch_size)
+    batches = {start: jobs[start:start + step] for start in range(0, len(jobs), step)}
+    results = [None] * len(jobs)
+
+    # Initialize model session once (reuse across all images). With workers
+    # this also downloads the model before they start and race for it.
     print(f"Loading {model_name} model (first run downloads ~170MB)...")
     session = new_session(model_name)
     print("Model loaded.")
-
-    stats = {"processed": 0, "skipped": 0, "errors": 0, "error_details": []}
-    image_extensions = {".png", ".jpg", ".jpeg", ".tif", ".tiff"}
-
-    # Collect all image files
-    all_images = []
-    for sku_folder in sorted(input_dir.iterdir()):
-        if not sku_folder.is_dir():
-            continue
-        for img_file in sorted(sku_folder.iterdir()):
-            if img_file.suffix.lower() in image_extensions:
-                all_images.append((sku_folder.name, img_file))
-
-    for sku, img_path in tqdm(all_images, desc="Removing backgrounds"):
-        output_path = output_dir / sku / img_path.name
-        
-        # Ensure output is PNG regardless of input format
-        if output_path.suffix.lower() != ".png":
-            output_path = output_path.with_suffix(".png")
-
-        # Skip if already transparent
-        if img_path.suffix.lower() == ".png" and has_transparency(img_path):
-            # Copy as-is
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            import shutil
-            shutil.copy2(str(img_path), str(output_path))
-            stats["skipped"] += 1
-            continue
-
-        result = remove_background_single(img_path, output_path, session, sku=sku)
-
-        if result["status"] == "processed":
-            stats["processed"] += 1
+    if batch_size > 1:
+        limit = session_batch_limit(session)
+        if limit is not None and limit < batch_size:
+            print(f"Note: this model's ONNX graph has a fixed batch size of {limit}; batches of "
+                  f"{batch_size} run in groups of {limit} (files are still decoded once).")
+
+    if workers > 1:
+        del session
+        threads = intra_op_threads or default_intra_op_threads(workers)
+        print(f"Starting {workers} workers × {threads} ONNX threads.")
+
+    with tqdm(total=len(jobs), desc="Removing backgrounds") as bar:
+        if workers <= 1:
+            for start, batch in batches.items():
+                results[start:start + len(batch)] = run_batch(batch, session, batch_size > 1)
+                bar.update(len(batch))
         else:
-            stats["errors"] += 1
-            stats["error_details"].append({"sku": sku, "file": img_path.name, "error": result.get("error")})
-
+            # spawn, not fork: ONNX Runtime thread pools do not survive a fork.
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                     initializer=_init_worker,
+                                     initargs=(model_name, threads)) as pool:
+                futures = {pool.submit(_worker_run_batch, batch, batch_size > 1): start
+                           for start, batch in batches.items()}
+                for future in as_completed(futures):
+                    start = futures[future]
+                    batch = batches[start]
+                    try:
+                        done = future.result()
+                    except Exception as e:  # worker crashed (e.g. out of memory)
+                        done = [{"status": "error", "error": str(e)}] * len(batch)
+                    results[start:start + len(batch)] = done
+                    bar.update(len(batch))
+
+    # Tally in input order so error_details matches the serial run
+    tally_results(jobs, results, stats, cache, fingerprints)
     return stats
 
 
@@ -154,7 +413,16 @@ if __name__ == "__main__":
     parser.add_argument("--input", type=Path, required=True)
     parser.add_argument("--output", type=Path, required=True)
     parser.add_argument("--model", default="u2net", help="rembg model name")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes, each with its own ONNX session (default: 1)")
+    parser.add_argument("--intra-op-threads", type=int, default=None,
+                        help="ONNX threads per worker (default: CPU cores / workers)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Images per batched inference call (default: 1 = per-image rembg.remove)")
     args = parser.parse_args()
 
-    stats = batch_remove_backgrounds(args.input, args.output, args.model)
+    stats = batch_remove_backgrounds(args.input, args.output, args.model,
+                                     workers=args.workers,
+                                     intra_op_threads=args.intra_op_threads,
+                                     batch_size=args.batch_size)
     print(f"\nProcessed: {stats['processed']}, Skipped: {stats['skipped']}, Errors: {stats['errors']}")
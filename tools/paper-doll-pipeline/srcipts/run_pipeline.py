@@ -7,6 +7,21 @@ Usage:
     python run_pipeline.py --source ./source-images --output ./processed --master-excel ./master_v8.3.xlsx
     python run_pipeline.py --source ./source-images --output ./processed --skip-psd-extraction
     python run_pipeline.py --source ./source-images --output ./processed --steps 3,4,5  # Run specific steps only
+    python run_pipeline.py --source ./source-images --output ./processed --no-cache  # Rebuild everything
+    python run_pipeline.py --source ./source-images --output ./processed --scheduler steps  # One step at a time
+    python run_pipeline.py --source ./source-images --output ./processed --in-memory  # Write only 04_final
+
+By default steps 2-6 run per SKU (see sku_scheduler.py): each SKU folder
+moves on to its next step as soon as its previous one is done, with
+CPU-heavy work on a process pool and the rest on I/O threads.
+--scheduler steps runs each step over every SKU before starting the next.
+
+Runs are incremental: <output>/.build-cache.json records the input content
+hash and step parameters behind every output (see build_cache.py), so work
+whose inputs are unchanged is skipped. <output>/.image-metrics.sqlite holds
+each image's measurements (size, content bbox, halo edges) by content hash,
+so classification, normalization, QA and the manifest measure an image
+once between them (see image_metrics.py).
 """
 
 import argparse
@@ -58,51 +73,66 @@ def step_discover(source: Path, output: Path, master_excel: Path = None):
     return inventory
 
 
-def step_extract_psd(source: Path, output: Path):
+def step_extract_psd(source: Path, output: Path, workers: int = 1, memory_budget: int = None,
+                     crop_layers: bool = False, cache=None):
     """Step 2: Extract PSD layers to transparent PNGs."""
     from extract_psd import extract_all_psds
     extracted = output / "01_extracted"
     extracted.mkdir(parents=True, exist_ok=True)
-    stats = extract_all_psds(source, extracted)
-    log(f"Extracted {stats['layers_extracted']} layers from {stats['psds_processed']} PSDs")
+    stats = extract_all_psds(source, extracted, cache=cache, workers=workers,
+                             memory_budget=memory_budget, crop_layers=crop_layers)
+    log(f"Extracted {stats['layers_extracted']} layers from {stats['psds_processed']} PSDs"
+        f" ({stats['cached']} folders unchanged)")
     return stats
 
 
-def step_remove_bg(input_dir: Path, output: Path, model: str = "u2net"):
+def step_remove_bg(input_dir: Path, output: Path, model: str = "u2net", workers: int = 1,
+                   batch_size: int = 1, cache=None):
     """Step 3: Background removal via rembg."""
     from remove_bg import batch_remove_backgrounds
     clean_dir = output / "02_clean"
     clean_dir.mkdir(parents=True, exist_ok=True)
-    stats = batch_remove_backgrounds(input_dir, clean_dir, model_name=model)
-    log(f"Processed {stats['processed']} images, {stats['skipped']} skipped (already transparent)")
+    stats = batch_remove_backgrounds(input_dir, clean_dir, model_name=model, workers=workers,
+                                     batch_size=batch_size, cache=cache)
+    log(f"Processed {stats['processed']} images, {stats['skipped']} skipped (already transparent),"
+        f" {stats['cached']} unchanged")
     return stats
 
 
-def step_classify_rename(input_dir: Path, output: Path, use_vision: bool = False):
+def step_classify_rename(input_dir: Path, output: Path, use_vision: bool = False, cache=None,
+                         metrics=None):
     """Step 4: Classify components and rename files."""
     from classify_rename import classify_and_rename_all
     named_dir = output / "03_named"
     named_dir.mkdir(parents=True, exist_ok=True)
-    stats = classify_and_rename_all(input_dir, named_dir, use_vision=use_vision)
-    log(f"Classified {stats['classified']} images, {stats['ambiguous']} flagged for review")
+    stats = classify_and_rename_all(input_dir, named_dir, use_vision=use_vision, cache=cache,
+                                    metrics=metrics)
+    log(f"Classified {stats['classified']} images, {stats['ambiguous']} flagged for review"
+        f" ({stats['cached']} folders unchanged)")
     return stats
 
 
-def step_normalize_canvas(input_dir: Path, output: Path):
+def step_normalize_canvas(input_dir: Path, output: Path, workers: int = 1,
+                          compress_level: int = None, cache=None, metrics=None):
     """Step 5: Resize all images to 600x1063 standard canvas."""
     from normalize_canvas import normalize_all
     final_dir = output / "04_final"
     final_dir.mkdir(parents=True, exist_ok=True)
-    stats = normalize_all(input_dir, final_dir)
-    log(f"Normalized {stats['processed']} images to 600x1063")
+    stats = normalize_all(input_dir, final_dir, cache=cache, workers=workers,
+                          compress_level=compress_level, metrics=metrics)
+    log(f"Normalized {stats['processed']} images to 600x1063 ({stats['cached']} unchanged)")
     return stats
 
 
-def step_qa_audit(input_dir: Path, output: Path, manifest_path: Path = None):
+def step_qa_audit(input_dir: Path, output: Path, manifest_path: Path = None, workers: int = 1,
+                  cache=None, metrics=None):
     """Step 6: Run QA checks and generate report."""
     from qa_audit import run_qa_audit
-    report = run_qa_audit(input_dir, manifest_path)
+    report = run_qa_audit(input_dir, manifest_path, cache=cache, workers=workers, metrics=metrics)
+    return write_qa_report(report, output)
 
+
+def write_qa_report(report: dict, output: Path) -> dict:
     report_path = output / "qa-report.html"
     with open(report_path, "w") as f:
         f.write(report["html"])
@@ -116,10 +146,64 @@ def step_qa_audit(input_dir: Path, output: Path, manifest_path: Path = None):
     return report["data"]
 
 
-def step_manifest(input_dir: Path, output: Path):
+def step_sku_pipeline(stages: list, output: Path, model: str = "u2net", use_vision: bool = False,
+                      batch_size: int = 1, cpu_workers: int = None, io_workers: int = None,
+                      cache=None, in_memory: bool = False, snapshot_intermediates: bool = False,
+                      crop_layers: bool = False, memory_budget: int = None,
+                      png_compress_level: int = None, metrics=None):
+    """Steps 2-6 streamed per SKU: every SKU runs its own chain of the given stages."""
+    from sku_scheduler import SkuScheduler
+    scheduler = SkuScheduler(stages, model_name=model, use_vision=use_vision,
+                             batch_size=batch_size, cpu_workers=cpu_workers,
+                             io_workers=io_workers, cache=cache, in_memory=in_memory,
+                             snapshot_intermediates=snapshot_intermediates,
+                             crop_layers=crop_layers, memory_budget=memory_budget,
+                             png_compress_level=png_compress_level, metrics=metrics)
+    log(f"Stages: {' → '.join(stage.name for stage in stages)}"
+        f" ({scheduler.cpu_workers} CPU workers, {scheduler.io_workers} I/O threads"
+        f"{', in memory' if in_memory else ''})")
+    producing = [stage for stage in stages if stage.output_dir is not None]
+    for stage in producing:
+        # In memory, intermediate folders are only written as snapshots
+        if not in_memory or snapshot_intermediates or stage is producing[-1]:
+            stage.output_dir.mkdir(parents=True, exist_ok=True)
+
+    result = scheduler.run()
+    stats = result["stats"]
+
+    if result["first_done_s"] is not None:
+        log(f"First SKU finished after {result['first_done_s']:.1f}s;"
+            f" {result['skus']} SKUs in {result['elapsed_s']:.1f}s")
+    if "extract" in stats:
+        s = stats["extract"]
+        log(f"Extracted {s['layers_extracted']} layers from {s['psds_processed']} PSDs"
+            f" ({s['cached']} folders unchanged)")
+    if "remove_bg" in stats:
+        s = stats["remove_bg"]
+        log(f"Processed {s['processed']} images, {s['skipped']} skipped (already transparent),"
+            f" {s['cached']} unchanged")
+    if "classify" in stats:
+        s = stats["classify"]
+        log(f"Classified {s['classified']} images, {s['ambiguous']} flagged for review"
+            f" ({s['cached']} folders unchanged)")
+    if "normalize" in stats:
+        s = stats["normalize"]
+        log(f"Normalized {s['processed']} images to 600x1063 ({s['cached']} unchanged)")
+    if "qa" in stats:
+        from qa_audit import build_report
+        write_qa_report(build_report(result["qa_results"]), output)
+
+    for failure in result["failed"]:
+        log(f"SKU {failure['sku']} failed: {failure['error']}", "ERROR")
+    if result["failed"]:
+        raise RuntimeError(f"{len(result['failed'])} of {result['skus']} SKUs failed")
+    return result
+
+
+def step_manifest(input_dir: Path, output: Path, metrics=None):
     """Step 7: Generate Sanity-ready manifest JSON."""
     from manifest import generate_manifest
-    manifest = generate_manifest(input_dir)
+    manifest = generate_manifest(input_dir, metrics)
 
     manifest_path = output / "manifest.json"
     with open(manifest_path, "w") as f:
@@ -144,23 +228,65 @@ def main():
                         help="Skip PSD extraction (source already has PNGs)")
     parser.add_argument("--skip-bg-removal", action="store_true",
                         help="Skip background removal (images already transparent)")
+    parser.add_argument("--psd-workers", type=int, default=1,
+                        help="--scheduler steps: PSD extraction processes (default: 1)")
+    parser.add_argument("--psd-memory-budget", type=int, default=0,
+                        help="MB of estimated PSD memory in flight during parallel extraction"
+                             " (default: half of RAM)")
+    parser.add_argument("--crop-layers", action="store_true",
+                        help="Extract layers cropped to their bounds, offsets in extraction_info.json")
     parser.add_argument("--use-vision", action="store_true",
                         help="Use Claude Vision API for ambiguous component classification")
     parser.add_argument("--bg-model", default="u2net",
                         choices=["u2net", "u2netp", "u2net_human_seg", "isnet-general-use"],
                         help="rembg model to use for background removal")
+    parser.add_argument("--bg-workers", type=int, default=None,
+                        help="--scheduler steps: background-removal worker processes, one ONNX"
+                             " session each (default: 1)")
+    parser.add_argument("--bg-batch-size", type=int, default=1,
+                        help="Images per batched U²-Net inference call (default: 1)")
+    parser.add_argument("--scheduler", choices=["sku", "steps"], default="sku",
+                        help="sku: stream each SKU through steps 2-6 independently (default);"
+                             " steps: finish each step for every SKU before the next")
+    parser.add_argument("--cpu-workers", type=int, default=None,
+                        help="--scheduler sku: worker processes for PSD decode, background"
+                             " removal and resizing (default: CPU count)")
+    parser.add_argument("--io-workers", type=int, default=None,
+                        help="--scheduler sku: SKUs in flight at once (default: 2 × CPU workers + 2)")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="--scheduler sku: pass decoded images between steps and write only"
+                             " the final PNGs (no 01_extracted/02_clean/03_named)")
+    parser.add_argument("--snapshot-intermediates", action="store_true",
+                        help="--in-memory: also write fast-compressed intermediate folders for debugging")
+    parser.add_argument("--normalize-workers", type=int, default=1,
+                        help="--scheduler steps: SKU folders normalized at once (default: 1)")
+    parser.add_argument("--qa-workers", type=int, default=1,
+                        help="--scheduler steps: products audited at once (default: 1)")
+    parser.add_argument("--png-compress-level", type=int, default=None, choices=range(10),
+                        metavar="0-9",
+                        help="zlib level for the final PNGs instead of optimize=True"
+                             " (faster saves, larger files)")
     parser.add_argument("--steps", type=str, default=None,
                         help="Comma-separated list of step numbers to run (e.g., '3,4,5')")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore the build cache and reprocess everything (the cache is rewritten)")
     parser.add_argument("--batch-size", type=int, default=0,
                         help="Process only N products (0 = all, useful for test runs)")
 
     args = parser.parse_args()
+    if args.in_memory and args.scheduler != "sku":
+        parser.error("--in-memory requires --scheduler sku")
+    if args.bg_workers is not None and args.scheduler == "sku":
+        log("--bg-workers only applies to --scheduler steps; background removal runs on"
+            " the --cpu-workers pool", "WARN")
 
     # Validate source
     if not args.source.exists():
         log(f"Source directory not found: {args.source}", "ERROR")
         sys.exit(1)
 
+    memory_budget = args.psd_memory_budget << 20 or None
+
     # Create output directory
     args.output.mkdir(parents=True, exist_ok=True)
 
@@ -180,6 +306,15 @@ def main():
     log(f"Steps: {sorted(steps_to_run)}")
     pipeline_start = time.time()
 
+    from build_cache import BuildCache
+    cache = BuildCache(args.output / ".build-cache.json")
+    if args.no_cache:
+        cache.steps.clear()
+
+    # Image measurements (bbox, content ratio, halo edges) shared by steps 4-7
+    from image_metrics import MetricsIndex
+    metrics = MetricsIndex(args.output / ".image-metrics.sqlite")
+
     # Determine working directories
     # After PSD extraction, subsequent steps read from the extracted dir
     # After bg removal, from the clean dir, etc.
@@ -194,44 +329,84 @@ def main():
                                 output=args.output,
                                 master_excel=args.master_excel)
 
-        # Step 2: PSD Extraction
-        if 2 in steps_to_run and not args.skip_psd_extraction:
-            run_step(2, "PSD Layer Extraction",
-                     step_extract_psd,
-                     source=args.source,
-                     output=args.output)
-            current_input = args.output / "01_extracted"
-        elif args.skip_psd_extraction:
-            log("Skipping PSD extraction (--skip-psd-extraction)")
-            current_input = args.source
-
-        # Step 3: Background Removal
-        if 3 in steps_to_run and not args.skip_bg_removal:
-            run_step(3, "Background Removal",
-                     step_remove_bg,
-                     input_dir=current_input,
-                     output=args.output,
-                     model=args.bg_model)
-            current_input = args.output / "02_clean"
-        elif args.skip_bg_removal:
-            log("Skipping background removal (--skip-bg-removal)")
-
-        # Step 4: Classification & Renaming
-        if 4 in steps_to_run:
-            run_step(4, "Component Classification & Renaming",
-                     step_classify_rename,
-                     input_dir=current_input,
-                     output=args.output,
-                     use_vision=args.use_vision)
-            current_input = args.output / "03_named"
-
-        # Step 5: Canvas Normalization
-        if 5 in steps_to_run:
-            run_step(5, "Canvas Normalization (600×1063)",
-                     step_normalize_canvas,
-                     input_dir=current_input,
-                     output=args.output)
-            current_input = args.output / "04_final"
+        if args.scheduler == "sku":
+            # Steps 2-6, streamed per SKU
+            from sku_scheduler import plan_stages
+            if args.skip_psd_extraction:
+                log("Skipping PSD extraction (--skip-psd-extraction)")
+            if args.skip_bg_removal:
+                log("Skipping background removal (--skip-bg-removal)")
+            stages, current_input = plan_stages(args.source, args.output, steps_to_run,
+                                                args.skip_psd_extraction, args.skip_bg_removal)
+            if stages:
+                run_step("2-6", "Per-SKU Pipeline",
+                         step_sku_pipeline,
+                         stages=stages,
+                         output=args.output,
+                         model=args.bg_model,
+                         use_vision=args.use_vision,
+                         batch_size=args.bg_batch_size,
+                         cpu_workers=args.cpu_workers,
+                         io_workers=args.io_workers,
+                         cache=cache,
+                         in_memory=args.in_memory,
+                         snapshot_intermediates=args.snapshot_intermediates,
+                         crop_layers=args.crop_layers,
+                         memory_budget=memory_budget,
+                         png_compress_level=args.png_compress_level,
+                         metrics=metrics)
+        else:
+            # Step 2: PSD Extraction
+            if 2 in steps_to_run and not args.skip_psd_extraction:
+                run_step(2, "PSD Layer Extraction",
+                         step_extract_psd,
+                         source=args.source,
+                         output=args.output,
+                         workers=args.psd_workers,
+                         memory_budget=memory_budget,
+                         crop_layers=args.crop_layers,
+                         cache=cache)
+                current_input = args.output / "01_extracted"
+            elif args.skip_psd_extraction:
+                log("Skipping PSD extraction (--skip-psd-extraction)")
+                current_input = args.source
+
+            # Step 3: Background Removal
+            if 3 in steps_to_run and not args.skip_bg_removal:
+                run_step(3, "Background Removal",
+                         step_remove_bg,
+                         input_dir=current_input,
+                         output=args.output,
+                         model=args.bg_model,
+                         workers=args.bg_workers or 1,
+                         batch_size=args.bg_batch_size,
+                         cache=cache)
+                current_input = args.output / "02_clean"
+            elif args.skip_bg_removal:
+                log("Skipping background removal (--skip-bg-removal)")
+
+            # Step 4: Classification & Renaming
+            if 4 in steps_to_run:
+                run_step(4, "Component Classification & Renaming",
+                         step_classify_rename,
+                         input_dir=current_input,
+                         output=args.output,
+                         use_vision=args.use_vision,
+                         cache=cache,
+                         metrics=metrics)
+                current_input = args.output / "03_named"
+
+            # Step 5: Canvas Normalization
+            if 5 in steps_to_run:
+                run_step(5, "Canvas Normalization (600×1063)",
+                         step_normalize_canvas,
+                         input_dir=current_input,
+                         output=args.output,
+                         workers=args.normalize_workers,
+                         compress_level=args.png_compress_level,
+                         cache=cache,
+                         metrics=metrics)
+                current_input = args.output / "04_final"
 
         # Step 7: Manifest (before QA so QA can reference it)
         manifest_path = None
@@ -239,19 +414,27 @@ def main():
             manifest_path = run_step(7, "Manifest Generation",
                                      step_manifest,
                                      input_dir=current_input,
-                                     output=args.output)
+                                     output=args.output,
+                                     metrics=metrics)
 
-        # Step 6: QA Audit
-        if 6 in steps_to_run:
+        # Step 6: QA Audit (already done per SKU with --scheduler sku)
+        if 6 in steps_to_run and args.scheduler == "steps":
             run_step(6, "QA Audit",
                      step_qa_audit,
                      input_dir=current_input,
                      output=args.output,
-                     manifest_path=manifest_path)
+                     manifest_path=manifest_path,
+                     workers=args.qa_workers,
+                     cache=cache,
+                     metrics=metrics)
 
     except Exception as e:
         log(f"Pipeline failed: {e}", "FATAL")
         sys.exit(1)
+    finally:
+        # Keep what finished, even on failure, so the rerun resumes from there
+        cache.save()
+        metrics.prune()
 
     total_time = time.time() - pipeline_start
     log(f"{'='*60}")
@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+"""
+Per-SKU streaming scheduler for the paper-doll pipeline.
+
+The step-by-step run treats every step as a global barrier: all PSDs are
+extracted, then all backgrounds removed, then everything classified, and
+so on, so no SKU is finished until the last step starts. Here each SKU
+folder moves through its own chain
+
+    extract → remove_bg → classify → normalize → qa
+
+as soon as its previous stage is done, while other SKUs are at other
+stages. Two pools do the work:
+
+  - CPU pool: spawned processes for PSD decoding, U²-Net inference +
+    alpha matting, and canvas resizing. Each worker loads one ONNX session
+    and pins its thread count to cores ÷ workers (see remove_bg).
+  - I/O pool: threads that drive the SKU chains. They run the light,
+    I/O-bound parts inline (build-cache hashing, copies, classification,
+    QA decoding) and hand CPU-heavy work to the CPU pool. The number of
+    I/O threads bounds how many SKUs are in flight.
+
+The on-disk layout (01_extracted/, 02_clean/, 03_named/, 04_final/),
+build-cache entries, classification report and QA results are the same
+as the step-by-step run, so either mode can pick up after the other.
+
+In-memory mode (in_memory=True) runs a SKU's whole chain in one CPU
+worker and hands decoded RGBA images from stage to stage instead of
+writing and re-reading a PNG after every step. Only the last stage's
+images are written (04_final/ in a full run), plus fast-compressed
+snapshots of the intermediate folders when snapshot_intermediates=True.
+Its build-cache entry covers the whole chain: one per SKU, keyed on the
+source folder's files and every stage's settings.
+"""
+
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from PIL import Image
+from tqdm import tqdm
+
+from layer_io import copy_layer, open_layer, pad_layer
+
+
+@dataclass
+class Stage:
+    """One per-SKU stage: reads input_dir/SKU, writes output_dir/SKU (QA writes nothing)."""
+    name: str
+    input_dir: Path
+    output_dir: Optional[Path] = None
+
+
+def plan_stages(source: Path, output: Path, steps: set,
+                skip_psd_extraction: bool = False, skip_bg_removal: bool = False) -> tuple:
+    """
+    Stages to run and the directory the final SKU folders end up in, chained
+    exactly as run_pipeline's step-by-step mode chains its inputs.
+    """
+    stages = []
+    current = source
+    if 2 in steps and not skip_psd_extraction:
+        stages.append(Stage("extract", current, output / "01_extracted"))
+        current = output / "01_extracted"
+    if 3 in steps and not skip_bg_removal:
+        stages.append(Stage("remove_bg", current, output / "02_clean"))
+        current = output / "02_clean"
+    if 4 in steps:
+        stages.append(Stage("classify", current, output / "03_named"))
+        current = output / "03_named"
+    if 5 in steps:
+        stages.append(Stage("normalize", current, output / "04_final"))
+        current = output / "04_final"
+    if 6 in steps:
+        stages.append(Stage("qa", current))
+    return stages, current
+
+
+def _new_stats(stage: str) -> dict:
+    return {
+        "extract": lambda: {"psds_processed": 0, "layers_extracted": 0, "cached": 0, "errors": []},
+        "remove_bg": lambda: {"processed": 0, "skipped": 0, "cached": 0, "errors": 0, "error_details": []},
+        "classify": lambda: {"classified": 0, "ambiguous": 0, "vision_calls": 0, "cached": 0, "errors": 0},
+        "normalize": lambda: {"processed": 0, "cached": 0, "errors": 0},
+        "qa": lambda: {},
+    }[stage]()
+
+
+def _cached_stats(stage: str, run_stats: dict) -> dict:
+    """Stats for a stage skipped by an in-memory cache hit, from the run that built it."""
+    stats = _new_stats(stage)
+    if stage in ("extract", "classify"):
+        stats["cached"] = 1  # folders
+    elif stage == "remove_bg":
+        stats["cached"] = run_stats["processed"] + run_stats["skipped"]
+    elif stage == "normalize":
+        stats["cached"] = run_stats["processed"]
+    if stage == "classify":
+        stats["classified"] = run_stats["classified"]
+        stats["ambiguous"] = run_stats["ambiguous"]
+    return stats
+
+
+def _merge_stats(total: dict, part: dict):
+    for key, value in part.items():
+        if isinstance(value, list):
+            total[key].extend(value)
+        else:
+            total[key] += value
+
+
+class SkuScheduler:
+    """Runs a list of Stages for every SKU folder as independent, streaming chains."""
+
+    def __init__(self, stages: list, *, model_name: str = "u2net", use_vision: bool = False,
+                 confidence_threshold: float = 0.6, batch_size: int = 1,
+                 cpu_workers: Optional[int] = None, io_workers: Optional[int] = None,
+                 cache=None, in_memory: bool = False, snapshot_intermediates: bool = False,
+                 crop_layers: bool = False, memory_budget: Optional[int] = None,
+                 png_compress_level: Optional[int] = None, metrics=None):
+        self.stages = stages
+        self.model_name = model_name
+        self.use_vision = use_vision
+        self.confidence_threshold = confidence_threshold
+        self.batch_size = batch_size
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        # Enough drivers that the CPU pool always has queued work while
+        # other SKUs are in their I/O stages.
+        self.io_workers = io_workers or 2 * self.cpu_workers + 2
+        self.cache = cache
+        self.metrics = metrics
+        self.in_memory = in_memory
+        self.snapshot_intermediates = snapshot_intermediates
+        self.crop_layers = crop_layers
+        self.png_compress_level = png_compress_level
+        self.cpu_pool = None
+
+        # Import stage modules up front (each exits with an install hint if
+        # its dependencies are missing), only for the stages that will run.
+        names = {stage.name for stage in stages}
+        if "extract" in names:
+            import extract_psd
+            self._extract = extract_psd
+            # PSD decodes wait here until their estimated memory fits
+            self._psd_budget = extract_psd.MemoryBudget(
+                memory_budget or extract_psd.default_memory_budget())
+        if "remove_bg" in names:
+            import remove_bg
+            self._remove_bg = remove_bg
+        if "classify" in names:
+            import classify_rename
+            self._classify = classify_rename
+        if "normalize" in names:
+            import normalize_canvas
+            self._normalize = normalize_canvas
+        if "qa" in names:
+            import qa_audit
+            self._qa = qa_audit
+
+    def run_sku(self, sku: str) -> dict:
+        """Drive one SKU through every stage; runs on an I/O thread."""
+        out = {"sku": sku, "stats": {}, "report": None, "qa": None}
+        stages = self.stages
+        if self.in_memory:
+            producing = [stage for stage in stages if stage.output_dir is not None]
+            if producing:
+                if not self.run_sku_in_memory(sku, producing, out):
+                    return out
+                stages = [stage for stage in stages if stage.output_dir is None]
+
+        for stage in stages:
+            folder = stage.input_dir / sku
+            if not folder.is_dir():
+                break  # the previous stage produced nothing for this SKU
+            stats = out["stats"][stage.name] = _new_stats(stage.name)
+
+            if stage.name == "extract":
+                self._extract.extract_folder(folder, stage.output_dir / sku, stats,
+                                             self.cache, self.cpu_pool, self._psd_budget,
+                                             preserve_alignment=not self.crop_layers)
+            elif stage.name == "remove_bg":
+                self._remove_bg.remove_sku_backgrounds(folder, stage.output_dir, self.model_name,
+                                                       stats, self.cpu_pool, self.batch_size,
+                                                       self.cache)
+            elif stage.name == "classify":
+                out["report"] = self._classify.classify_folder(
+                    folder, stage.output_dir / sku, stats,
+                    self.use_vision, self.confidence_threshold, self.cache, self.metrics)
+            elif stage.name == "normalize":
+                self._normalize.normalize_folder(folder, stage.output_dir / sku, stats,
+                                                 self.cache, self.cpu_pool,
+                                                 self.png_compress_level, self.metrics)
+            elif stage.name == "qa":
+                out["qa"] = self._qa.audit_folder(folder, self.cache, self.cpu_pool, self.metrics)
+        return out
+
+    def memory_params(self, sku: str, stages: list) -> dict:
+        """Every setting that affects an in-memory chain's output, for its cache fingerprint."""
+        params = {"stages": [stage.name for stage in stages]}
+        names = set(params["stages"])
+        if "extract" in names:
+            params["preserve_alignment"] = not self.crop_layers
+        if "remove_bg" in names:
+            params["model"] = self.model_name
+            params["rembg"] = self._remove_bg.get_rembg_params(sku)
+        if "classify" in names:
+            params["use_vision"] = self.use_vision
+            params["threshold"] = self.confidence_threshold
+        if "normalize" in names:
+            params["canvas"] = [self._normalize.CANVAS_WIDTH, self._normalize.CANVAS_HEIGHT]
+            params["padding"] = self._normalize.PADDING_RATIO
+            if self.png_compress_level is not None:
+                params["png_compress_level"] = self.png_compress_level
+        return params
+
+    def run_sku_in_memory(self, sku: str, stages: list, out: dict) -> bool:
+        """
+        Run the file-producing stages for one SKU as a single in-memory chain
+        on the CPU pool (or reuse the cached result). Fills out; returns
+        False if the SKU has no input folder.
+        """
+        folder = stages[0].input_dir / sku
+        if not folder.is_dir():
+            return False
+
+        fp = None
+        if self.cache is not None:
+            inputs = [f for f in folder.iterdir() if f.is_file()]
+            fp = self.cache.fingerprint(inputs, self.memory_params(sku, stages))
+            entry = self.cache.hit("in_memory", sku, fp)
+            if entry is not None:
+                for stage in stages:
+                    if stage.name in entry["meta"]["stats"]:
+                        out["stats"][stage.name] = _cached_stats(stage.name,
+                                                                 entry["meta"]["stats"][stage.name])
+                out["report"] = entry["meta"]["report"]
+                return True
+
+        options = {
+            "model_name": self.model_name,
+            "batch_size": self.batch_size,
+            "use_vision": self.use_vision,
+            "confidence_threshold": self.confidence_threshold,
+            "png_compress_level": self.png_compress_level,
+            "preserve_alignment": not self.crop_layers,
+            "metrics": self.metrics,
+        }
+        # The chain decodes the SKU's PSD in the worker, so it waits for the
+        # same memory budget as a step-by-step extraction would
+        reserved = 0
+        if stages[0].name == "extract":
+            psd_files = list(folder.glob("*.psd")) + list(folder.glob("*.psb"))
+            if psd_files:
+                reserved = self._extract.estimate_psd_memory(psd_files[0],
+                                                             options["preserve_alignment"])
+        if reserved:
+            self._psd_budget.acquire(reserved)
+        try:
+            result = self.cpu_pool.submit(process_sku_in_memory, folder, stages, options,
+                                          self.snapshot_intermediates).result()
+        finally:
+            if reserved:
+                self._psd_budget.release(reserved)
+        out["stats"].update(result["stats"])
+        out["report"] = result["report"]
+        if self.cache is not None:
+            self.cache.record("in_memory", sku, fp, result["outputs"],
+                              {"report": result["report"], "stats": result["stats"]})
+        return True
+
+    def run(self, on_sku_done: Optional[Callable[[dict], None]] = None) -> dict:
+        """
+        Run every SKU found in the first stage's input directory.
+
+        Returns per-stage stats, the classification report and QA results
+        (both in SKU order, like the step-by-step run), failed SKUs, and
+        the seconds until the first SKU finished.
+        """
+        if not self.stages:
+            return {"skus": 0, "stats": {}, "failed": []}
+        skus = sorted(d.name for d in self.stages[0].input_dir.iterdir() if d.is_dir())
+
+        start = time.time()
+        first_done = None
+        stats = {stage.name: _new_stats(stage.name) for stage in self.stages}
+        reports, qa_results, failed = {}, {}, []
+
+        needs_model = any(stage.name == "remove_bg" for stage in self.stages)
+        if needs_model:
+            # Load once here so the model is downloaded before the workers
+            # start and race each other for it.
+            from rembg import new_session
+            new_session(self.model_name)
+            threads = self._remove_bg.default_intra_op_threads(self.cpu_workers)
+            init = self._remove_bg._init_worker
+            initargs = (self.model_name, threads)
+        else:
+            init, initargs = None, ()
+
+        # spawn, not fork: ONNX Runtime thread pools do not survive a fork.
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=ctx,
+                                 initializer=init, initargs=initargs) as cpu_pool, \
+                ThreadPoolExecutor(max_workers=self.io_workers,
+                                   thread_name_prefix="sku") as io_pool:
+            self.cpu_pool = cpu_pool
+            futures = {io_pool.submit(self.run_sku, sku): sku for sku in skus}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="SKUs"):
+                sku = futures[future]
+                try:
+                    out = future.result()
+                except Exception as e:
+                    failed.append({"sku": sku, "error": str(e)})
+                    continue
+                for name, part in out["stats"].items():
+                    _merge_stats(stats[name], part)
+                if out["report"] is not None:
+                    reports[sku] = out["report"]
+                if out["qa"] is not None:
+                    qa_results[sku] = out["qa"]
+                if first_done is None:
+                    first_done = time.time() - start
+                if on_sku_done is not None:
+                    on_sku_done(out)
+            self.cpu_pool = None
+
+        for stage in self.stages:
+            if stage.name == "classify":
+                # Same place as the step-by-step run (the only file there in memory mode)
+                stage.output_dir.mkdir(parents=True, exist_ok=True)
+                with open(stage.output_dir / "_classification_report.json", "w") as f:
+                    json.dump([reports[sku] for sku in skus if sku in reports], f, indent=2)
+
+        return {
+            "skus": len(skus),
+            "stats": stats,
+            "qa_results": [qa_results[sku] for sku in skus if sku in qa_results],
+            "failed": failed,
+            "first_done_s": first_done,
+            "elapsed_s": time.time() - start,
+        }
+
+
+# ── In-memory chain (runs inside a CPU pool worker) ──────────────────────────
+
+@dataclass
+class Layer:
+    """
+    One layer image between stages. path is kept while the pixels are still
+    exactly that file's, so writing the layer out is a copy, not a re-encode.
+    stored is what gets written instead of image when the two differ: a
+    cropped extracted layer, which the later stages see padded to its PSD
+    canvas (as layer_io.open_layer would give them in file mode).
+    """
+    name: str
+    path: Optional[Path] = None
+    image: Optional[Image.Image] = None
+    stored: Optional[Image.Image] = None
+
+    def load(self):
+        if self.image is None:
+            self.image = open_layer(self.path)
+            self.image.load()
+        return self.image
+
+    def png_data(self) -> bytes:
+        if self.path is not None and self.path.suffix.lower() == ".png":
+            return self.path.read_bytes()
+        buffer = io.BytesIO()
+        self.load().save(buffer, "PNG")
+        return buffer.getvalue()
+
+    def write(self, path: Path, **save_args):
+        if self.path is not None:
+            copy_layer(self.path, path)
+        else:
+            (self.stored or self.image).save(str(path), "PNG", **save_args)
+
+
+def _extract_in_memory(folder: Path, stats: dict, preserve_alignment: bool = True) -> tuple:
+    """extract_psd.extract_folder() without the writes: (layers, extraction info)."""
+    from extract_psd import composite_psd_layers
+
+    psd_files = list(folder.glob("*.psd")) + list(folder.glob("*.psb"))
+    if not psd_files:
+        return {png.name: Layer(png.name, path=png) for png in sorted(folder.glob("*.png"))}, None
+
+    try:
+        result = composite_psd_layers(psd_files[0], preserve_alignment=preserve_alignment)
+    except Exception as e:
+        stats["errors"].append({"sku": folder.name, "error": str(e)})
+        print(f"  Error processing {folder.name}: {e}")
+        return {}, None
+    images = result.pop("images")
+    stats["psds_processed"] += 1
+    stats["layers_extracted"] += result["layers_extracted"]
+    if not result["cropped"]:
+        return {name: Layer(name, image=img) for name, img in images.items()}, result
+    layers = {}
+    for info in result["layers"]:
+        img = images[info["filename"]]
+        padded = pad_layer(img, result["psd_width"], result["psd_height"],
+                           info["offset_x"], info["offset_y"])
+        layers[info["filename"]] = Layer(info["filename"], image=padded, stored=img)
+    return layers, result
+
+
+def _remove_bg_in_memory(sku: str, layers: dict, batch_size: int, stats: dict) -> dict:
+    """remove_bg.remove_sku_backgrounds() on decoded images."""
+    import remove_bg
+
+    image_extensions = {".png", ".jpg", ".jpeg", ".tif", ".tiff"}
+    results = {}  # source name -> output Layer or error message
+    pending = []  # (source name, output name, image)
+    for name in sorted(layers):
+        if Path(name).suffix.lower() not in image_extensions:
+            continue
+        out_name = Path(name).with_suffix(".png").name
+        try:
+            img = layers[name].load()
+        except Exception as e:
+            results[name] = str(e)
+            continue
+        if name.lower().endswith(".png") and remove_bg.image_is_transparent(img):
+            results[name] = Layer(out_name, path=layers[name].path, image=img)
+            stats["skipped"] += 1
+            continue
+        pending.append((name, out_name, img))
+
+    step = max(1, batch_size)
+    for start in range(0, len(pending), step):
+        group = pending[start:start + step]
+        cutouts = remove_bg.cutout_images([(sku, img) for _, _, img in group],
+                                          remove_bg._worker_session, batched=batch_size > 1)
+        for (name, out_name, _), cutout in zip(group, cutouts):
+            if isinstance(cutout, Exception):
+                results[name] = str(cutout)
+            else:
+                results[name] = Layer(out_name, image=cutout)
+                stats["processed"] += 1
+
+    output = {}
+    for name in sorted(results):
+        if isinstance(results[name], Layer):
+            output[results[name].name] = results[name]
+        else:
+            stats["errors"] += 1
+            stats["error_details"].append({"sku": sku, "file": name, "error": results[name]})
+    return output
+
+
+def _classify_in_memory(sku: str, layers: dict, options: dict, stats: dict) -> tuple:
+    """classify_rename.classify_folder() on decoded images: (renamed layers, report entry)."""
+    from classify_rename import classify_layers
+    from image_metrics import measure_image
+
+    names = sorted(name for name in layers
+                   if Path(name).suffix.lower() == ".png" and not name.startswith(".")
+                   and name != "extraction_info.json")
+    if not names:
+        return {}, None
+
+    metrics = options["metrics"]
+    measured = [metrics.measure(layers[name].path)
+                if metrics is not None and layers[name].path is not None
+                else measure_image(layers[name].load()) for name in names]
+    result = classify_layers(sku, [(name, m, layers[name].png_data)
+                                   for name, m in zip(names, measured)],
+                             options["use_vision"], options["confidence_threshold"])
+    for key, value in result["counts"].items():
+        stats[key] += value
+
+    renamed = {}
+    for name, classification in zip(names, result["report"]["classifications"]):
+        layer = layers[name]
+        renamed[classification["renamed"]] = Layer(classification["renamed"], layer.path, layer.image)
+    return renamed, result["report"]
+
+
+def _normalize_in_memory(layers: dict, psd_info: Optional[dict], stats: dict) -> dict:
+    """normalize_canvas.normalize_folder() on decoded images."""
+    from normalize_canvas import infer_component_type, normalize_image
+
+    psd_align = None
+    if psd_info:
+        psd_align = {"psd_width": psd_info.get("psd_width"),
+                     "psd_height": psd_info.get("psd_height")}
+
+    output = {}
+    for name in sorted(layers):
+        if Path(name).suffix.lower() != ".png":
+            continue
+        if name.startswith("_") or name == "extraction_info.json":
+            continue
+        try:
+            canvas = normalize_image(layers[name].load(), infer_component_type(name), psd_align)
+            output[name] = Layer(name, image=canvas)
+            stats["processed"] += 1
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"  Error normalizing {name}: {e}")
+    return output
+
+
+def process_sku_in_memory(folder: Path, stages: list, options: dict,
+                          snapshot_intermediates: bool = False) -> dict:
+    """
+    Run the file-producing stages for one SKU folder in this process,
+    passing decoded images between them. Writes only the last stage's
+    images (after normalize, encoded as normalize_files encodes them),
+    plus compress_level=1 snapshots of the other stages' folders
+    when snapshot_intermediates is set.
+
+    Returns {"outputs": written paths, "report": classification entry,
+    "stats": per-stage stats}.
+    """
+    sku = folder.name
+    layers = {f.name: Layer(f.name, path=f) for f in sorted(folder.iterdir()) if f.is_file()}
+    psd_info = None
+    info_path = folder / "extraction_info.json"
+    if info_path.exists():
+        with open(info_path) as f:
+            psd_info = json.load(f)
+
+    result = {"outputs": [], "report": None, "stats": {}}
+    for stage in stages:
+        stats = result["stats"][stage.name] = _new_stats(stage.name)
+        if stage.name == "extract":
+            layers, psd_info = _extract_in_memory(folder, stats,
+                                                  options.get("preserve_alignment", True))
+        elif stage.name == "remove_bg":
+            layers = _remove_bg_in_memory(sku, layers, options["batch_size"], stats)
+            psd_info = None  # extraction_info.json is not carried past extraction
+        elif stage.name == "classify":
+            layers, result["report"] = _classify_in_memory(sku, layers, options, stats)
+            psd_info = None
+        elif stage.name == "normalize":
+            layers = _normalize_in_memory(layers, psd_info, stats)
+
+        out_dir = stage.output_dir / sku
+        if stage is stages[-1]:
+            # classify_folder creates the SKU folder even when it has no layers
+            if layers or stage.name == "classify":
+                out_dir.mkdir(parents=True, exist_ok=True)
+            for name, layer in sorted(layers.items()):
+                if stage.name == "normalize":
+                    from normalize_canvas import png_save_args
+                    layer.write(out_dir / name, **png_save_args(options["png_compress_level"]))
+                    if options["metrics"] is not None:  # for QA and the manifest
+                        options["metrics"].measure(out_dir / name, layer.image, edges=True)
+                else:
+                    layer.write(out_dir / name)
+                result["outputs"].append(out_dir / name)
+        elif snapshot_intermediates and layers:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            for name, layer in sorted(layers.items()):
+                layer.write(out_dir / name, compress_level=1)
+        # Cropped layers on disk are only usable with their offsets
+        if stage.name == "extract" and psd_info is not None and out_dir.is_dir() \
+                and (stage is stages[-1] or snapshot_intermediates):
+            info_path = out_dir / "extraction_info.json"
+            with open(info_path, "w") as f:
+                json.dump(psd_info, f, indent=2)
+            if stage is stages[-1]:
+                result["outputs"].append(info_path)
+
+        if not layers:
+            break  # nothing for the next stage, as with an absent folder on disk
+    return result